@@ -196,7 +196,8 @@ class Task(object):
         benchmark_engine.validate()
 
     @classmethod
-    def start(cls, deployment, config, task=None, abort_on_sla_failure=False):
+    def start(cls, deployment, config, task=None, abort_on_sla_failure=False,
+              max_parallel_subtasks=None):
         """Start a task.
 
         Task is a list of benchmarks that will be called one by one, results of
@@ -208,6 +209,9 @@ class Task(object):
         :param abort_on_sla_failure: if True, the execution of a benchmark
                                      scenario will stop when any SLA check
                                      for it fails
+        :param max_parallel_subtasks: max number of subtasks marked as
+                                      "parallel" in the config which are run
+                                      at the same time
         """
         deployment = objects.Deployment.get(deployment)
         task = task or objects.Task(deployment_uuid=deployment["uuid"])
@@ -215,7 +219,8 @@ class Task(object):
                                                          deployment["uuid"]))
         benchmark_engine = engine.BenchmarkEngine(
             config, task, admin=deployment["admin"], users=deployment["users"],
-            abort_on_sla_failure=abort_on_sla_failure)
+            abort_on_sla_failure=abort_on_sla_failure,
+            max_parallel_subtasks=max_parallel_subtasks)
 
         try:
             benchmark_engine.validate()
@@ -42,6 +42,22 @@ from rally.task.processing import plot
 from rally.task.processing import utils
 
 
+def _format_task_result(result):
+    """Convert the task result from the DB to the format of "task results".
+
+    Summary is included if it was saved, so it doesn't have to be computed
+    again from the raw results while building the report.
+    """
+    formatted = {"key": result["key"],
+                 "sla": result["data"]["sla"],
+                 "result": result["data"].get("raw", []),
+                 "load_duration": result["data"]["load_duration"],
+                 "full_duration": result["data"]["full_duration"]}
+    if result["data"].get("summary"):
+        formatted["summary"] = result["data"]["summary"]
+    return formatted
+
+
 class FailedToLoadTask(exceptions.RallyException):
     msg_fmt = _("Failed to load task")
 
@@ -179,10 +195,15 @@ class TaskCommands(object):
                    dest="abort_on_sla_failure",
                    help="Abort the execution of a benchmark scenario when"
                         "any SLA check for it fails")
+    @cliutils.args("--max-parallel-subtasks", type=int,
+                   dest="max_parallel_subtasks",
+                   help="Max number of subtasks marked with "
+                        "\"parallel\": true which are run at the same time")
     @envutils.with_default_deployment(cli_arg_name="deployment")
     @plugins.ensure_plugins_are_loaded
     def start(self, task, deployment=None, task_args=None, task_args_file=None,
-              tag=None, do_use=False, abort_on_sla_failure=False):
+              tag=None, do_use=False, abort_on_sla_failure=False,
+              max_parallel_subtasks=None):
         """Start benchmark task.
 
         :param task: a file with yaml/json task
@@ -198,7 +219,15 @@ class TaskCommands(object):
         :param abort_on_sla_failure: if True, the execution of a benchmark
                                      scenario will stop when any SLA check
                                      for it fails
+        :param max_parallel_subtasks: max number of subtasks marked as
+                                      "parallel" which are run at the same
+                                      time
         """
+        if max_parallel_subtasks is not None and max_parallel_subtasks < 1:
+            print(_("--max-parallel-subtasks should be positive, got %s")
+                  % max_parallel_subtasks)
+            return(1)
+
         try:
             input_task = self._load_task(task, task_args, task_args_file)
         except FailedToLoadTask:
@@ -215,7 +244,8 @@ class TaskCommands(object):
             if do_use:
                 self.use(task["uuid"])
             api.Task.start(deployment, input_task, task=task,
-                           abort_on_sla_failure=abort_on_sla_failure)
+                           abort_on_sla_failure=abort_on_sla_failure,
+                           max_parallel_subtasks=max_parallel_subtasks)
             self.detailed(task_id=task["uuid"])
         except exceptions.InvalidConfigException:
             return(1)
@@ -289,7 +319,65 @@ class TaskCommands(object):
                                 formatters=formatters)
             print()
 
-        task = db.task_get_detailed(task_id)
+        def _get_summary_row(name, row):
+            if row["min"] is None:
+                return [name, None, None, None, None, None, None,
+                        "0.0%", row["count"]]
+            return [name,
+                    round(row["min"], 3),
+                    round(row["median"], 3),
+                    round(row["90%ile"], 3),
+                    round(row["95%ile"], 3),
+                    round(row["max"], 3),
+                    round(row["avg"], 3),
+                    "%.1f%%" % (row["success"] * 100.0 / row["count"]),
+                    row["count"]]
+
+        def _print_running_scenarios(results):
+            # NOTE: Results of the scenarios are saved when they finish.
+            #       Statistics of the running ones are computed by the
+            #       database from the iterations saved so far.
+            finished = set((r["key"]["name"], r["key"]["pos"])
+                           for r in results)
+            actions = {}
+            for row in db.task_atomic_action_stats(task["uuid"]):
+                actions.setdefault((row["scenario"], row["pos"]),
+                                   []).append(row)
+            table_cols = ["action", "min", "avg", "max", "success"]
+            formatters = dict(
+                (col, cliutils.pretty_float_formatter(col, 3))
+                for col in ("min", "avg", "max"))
+            for stats in db.task_iteration_stats(task["uuid"]):
+                key = (stats["scenario"], stats["pos"])
+                if key in finished:
+                    continue
+                print("-" * 80)
+                print()
+                print(_("test scenario %s (running)") % stats["scenario"])
+                print("args position %s" % stats["pos"])
+                table_rows = [
+                    [row["name"], row["min"], row["avg"], row["max"],
+                     row["count"]] for row in actions.get(key, [])]
+                table_rows.append(
+                    ["total", stats["min"], stats["avg"], stats["max"],
+                     stats["iterations"] - stats["errors"]])
+                cliutils.print_list(
+                    [rutils.Struct(**dict(zip(table_cols, row)))
+                     for row in table_rows],
+                    fields=table_cols, formatters=formatters,
+                    table_label="Response Times so far (sec)",
+                    sortby_index=None)
+                print(_("Iterations done: %(iterations)d, "
+                        "errors: %(errors)d") % stats)
+
+        def _get_raw(result):
+            # NOTE: Raw results stored in chunks are loaded only if they
+            #       are needed and iterated without keeping them in memory.
+            if "raw" in result["data"]:
+                return result["data"]["raw"]
+            return objects.Task(task=task).iter_raw_results(result["key"])
+
+        task = db.task_get_detailed(task_id, load_raw=iterations_data)
 
         if task is None:
             print("The task %s can not be found" % task_id)
@@ -323,7 +411,8 @@ class TaskCommands(object):
             print("args values:")
             print(json.dumps(key["kw"], indent=2))
 
-            raw = result["data"]["raw"]
+            summary = (result["data"].get("summary") or
+                       utils.get_results_summary(_get_raw(result)))
             table_cols = ["action", "min", "median",
                           "90%ile", "95%ile", "max",
                           "avg", "success", "count"]
@@ -333,47 +422,48 @@ class TaskCommands(object):
             formatters = dict(zip(float_cols,
                                   [cliutils.pretty_float_formatter(col, 3)
                                    for col in float_cols]))
-            table_rows = []
-
-            actions_data = utils.get_atomic_actions_data(raw)
-            for action in actions_data:
-                durations = actions_data[action]
-                if durations:
-                    data = [action,
-                            round(min(durations), 3),
-                            round(utils.median(durations), 3),
-                            round(utils.percentile(durations, 0.90), 3),
-                            round(utils.percentile(durations, 0.95), 3),
-                            round(max(durations), 3),
-                            round(utils.mean(durations), 3),
-                            "%.1f%%" % (len(durations) * 100.0 / len(raw)),
-                            len(raw)]
-                else:
-                    data = [action, None, None, None, None, None, None,
-                            "0.0%", len(raw)]
-                table_rows.append(rutils.Struct(**dict(zip(table_cols, data))))
+            table_rows = [
+                rutils.Struct(**dict(zip(table_cols,
+                                         _get_summary_row(row["name"], row))))
+                for row in summary["atomic"]]
 
             cliutils.print_list(table_rows, fields=table_cols,
                                 formatters=formatters,
                                 table_label="Response Times (sec)",
                                 sortby_index=None)
 
+            if summary["stages"]:
+                stage_cols = ["stage"] + table_cols[1:]
+                table_rows = [
+                    rutils.Struct(**dict(zip(
+                        stage_cols, _get_summary_row(row["name"] + 1, row))))
+                    for row in summary["stages"]]
+                cliutils.print_list(table_rows, fields=stage_cols,
+                                    formatters=formatters,
+                                    table_label="Response Times by Stage "
+                                                "(sec)",
+                                    sortby_index=None)
+
             if iterations_data:
-                _print_iterations_data(raw)
+                _print_iterations_data(_get_raw(result))
 
             print(_("Load duration: %s") % result["data"]["load_duration"])
             print(_("Full duration: %s") % result["data"]["full_duration"])
 
+            runner_info = result["data"].get("runner") or {}
+            if "max_sustainable" in runner_info:
+                best = runner_info["max_sustainable"]
+                if best:
+                    print(_("Max sustainable throughput: %(thr).2f "
+                            "iterations/s at concurrency %(conc)d")
+                          % {"thr": best["throughput"],
+                             "conc": best["concurrency"]})
+                else:
+                    print(_("Max sustainable throughput: SLA failed at "
+                            "any concurrency"))
+
             # NOTE(hughsaunders): ssrs=scenario specific results
-            ssrs = []
-            for result in raw:
-                data = result["scenario_output"].get("data")
-                if data:
-                    ssrs.append(data)
-            if ssrs:
-                keys = set()
-                for ssr in ssrs:
-                    keys.update(ssr.keys())
+            if summary["output"]:
                 headers = ["key", "min", "median",
                            "90%ile", "95%ile", "max",
                            "avg"]
@@ -382,32 +472,25 @@ class TaskCommands(object):
                 formatters = dict(zip(float_cols,
                                   [cliutils.pretty_float_formatter(col, 3)
                                    for col in float_cols]))
-                table_rows = []
-                for key in keys:
-                    values = [float(ssr[key]) for ssr in ssrs if key in ssr]
-
-                    if values:
-                        row = [str(key),
-                               round(min(values), 3),
-                               round(utils.median(values), 3),
-                               round(utils.percentile(values, 0.90), 3),
-                               round(utils.percentile(values, 0.95), 3),
-                               round(max(values), 3),
-                               round(utils.mean(values), 3)]
-                    else:
-                        row = [str(key)] + ["n/a"] * 6
-                    table_rows.append(rutils.Struct(**dict(zip(headers, row))))
+                table_rows = [
+                    rutils.Struct(**dict(zip(
+                        headers, _get_summary_row(str(row["name"]),
+                                                  row)[:-2])))
+                    for row in summary["output"]]
                 print("\nScenario Specific Results\n")
                 cliutils.print_list(table_rows,
                                     fields=headers,
                                     formatters=formatters,
                                     table_label="Response Times (sec)")
 
-                for result in raw:
-                    errors = result["scenario_output"].get("errors")
+                for raw in _get_raw(result):
+                    errors = raw["scenario_output"].get("errors")
                     if errors:
                         print(errors)
 
+        if task["status"] == consts.TaskStatus.RUNNING:
+            _print_running_scenarios(task["results"])
+
         print()
         print("HINTS:")
         print(_("* To plot HTML graphics with this data, run:"))
@@ -430,10 +513,7 @@ class TaskCommands(object):
 
         :param task_id: Task uuid
         """
-        results = [{"key": x["key"], "result": x["data"]["raw"],
-                    "sla": x["data"]["sla"],
-                    "load_duration": x["data"]["load_duration"],
-                    "full_duration": x["data"]["full_duration"]}
+        results = [_format_task_result(x)
                    for x in objects.Task.get(task_id).get_results()]
 
         if results:
@@ -557,13 +637,11 @@ class TaskCommands(object):
                             return 1
 
             elif uuidutils.is_uuid_like(task_file_or_uuid):
+                # NOTE: JUnit report doesn't need raw results
                 tasks_results = map(
-                    lambda x: {"key": x["key"],
-                               "sla": x["data"]["sla"],
-                               "result": x["data"]["raw"],
-                               "load_duration": x["data"]["load_duration"],
-                               "full_duration": x["data"]["full_duration"]},
-                    objects.Task.get(task_file_or_uuid).get_results())
+                    _format_task_result,
+                    objects.Task.get(task_file_or_uuid).get_results(
+                        load_raw=out_format != "junit"))
             else:
                 print(_("ERROR: Invalid UUID or file name passed: %s"
                         ) % task_file_or_uuid,
@@ -643,7 +721,7 @@ class TaskCommands(object):
         :param task_id: Task uuid.
         :returns: Number of failed criteria.
         """
-        results = objects.Task.get(task_id).get_results()
+        results = objects.Task.get(task_id).get_results(load_raw=False)
         failed_criteria = 0
         data = []
         STATUS_PASS = "PASS"
@@ -665,6 +743,77 @@ class TaskCommands(object):
                                        "status", "detail"))
         return failed_criteria
 
+    @cliutils.args("--scenario", type=str, dest="scenario", required=True,
+                   help="Name of the scenario, "
+                        "e.g. NovaServers.boot_and_delete_server")
+    @cliutils.args("--action", type=str, dest="action",
+                   help="Atomic action to show durations of, "
+                        "e.g. nova.boot_server. By default total "
+                        "durations of iterations are shown.")
+    @cliutils.args("--limit", type=int, dest="limit",
+                   help="Number of the most recent tasks to show "
+                        "(default: 60)")
+    @cliutils.args("--deployment", type=str, dest="deployment",
+                   help="Show tasks of the specified deployment only. "
+                        "By default tasks of all deployments are shown.")
+    @cliutils.args("--status", type=str, dest="status",
+                   help="Show tasks with the specified status only."
+                   " Available statuses: %s" % ", ".join(consts.TaskStatus))
+    @cliutils.args("--json", dest="tojson",
+                   action="store_true",
+                   help="output in json format")
+    def trends(self, scenario, action=None, limit=None, deployment=None,
+               status=None, tojson=False):
+        """Display durations of the scenario across the recent tasks.
+
+        Statistics are taken from the summaries saved with the task
+        results, so the results themselves are not loaded.
+
+        :param scenario: Name of the scenario
+        :param action: Name of the atomic action, "total" by default
+        :param limit: Number of the most recent tasks, 60 by default
+        :param deployment: UUID or name of the deployment
+        :param status: Task status to filter by
+        :param tojson: Output in json format
+        """
+        action = action or "total"
+        if status and status not in consts.TaskStatus:
+            print(_("Error: Invalid task status '%s'.\n"
+                    "Available statuses: %s") % (
+                  status, ", ".join(consts.TaskStatus)),
+                  file=sys.stderr)
+            return(1)
+
+        rows = db.task_trends(scenario, action=action, limit=limit or 60,
+                              status=status, deployment=deployment)
+        if not rows:
+            print(_("There are no results of %(action)s of %(scenario)s")
+                  % {"action": action, "scenario": scenario})
+            return(1)
+
+        for row in rows:
+            row["created_at"] = str(row["created_at"])
+            if row["count"]:
+                row["success"] = "%.1f%%" % (row["success"] * 100.0 /
+                                             row["count"])
+            else:
+                row["success"] = "0.0%"
+        if tojson:
+            print(json.dumps(rows, sort_keys=True, indent=4))
+            return
+
+        headers = ["task_uuid", "created_at", "pos", "min", "median",
+                   "90%ile", "95%ile", "max", "avg", "success", "count"]
+        float_cols = ["min", "median", "90%ile", "95%ile", "max", "avg"]
+        formatters = dict(zip(float_cols,
+                              [cliutils.pretty_float_formatter(col, 3)
+                               for col in float_cols]))
+        cliutils.print_list([rutils.Struct(**row) for row in rows],
+                            fields=headers, formatters=formatters,
+                            table_label="%s of %s (sec)" % (action,
+                                                            scenario),
+                            sortby_index=None)
+
     @cliutils.args("--task", type=str, dest="task", required=False,
                    help="UUID of the task")
     def use(self, task):
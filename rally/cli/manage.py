@@ -23,6 +23,9 @@ from rally import api
 from rally.cli import cliutils
 from rally.cli import envutils
 from rally.common import db
+from rally.common.i18n import _
+from rally.task import agent
+from rally.task.processing import utils as putils
 
 
 class DBCommands(object):
@@ -33,6 +36,12 @@ class DBCommands(object):
         db.db_create()
         envutils.clear_env()
 
+    def upgrade(self):
+        """Create missing tables and move old task results into them."""
+        db.db_create()
+        migrated = db.task_result_migrate(putils.get_results_summary)
+        print(_("%d task results migrated.") % migrated)
+
 
 class TempestCommands(object):
     """Commands for Tempest management."""
@@ -68,8 +77,27 @@ class TempestCommands(object):
         api.Verification.reinstall_tempest(deployment, tempest_config, source)
 
 
+class AgentCommands(object):
+    """Commands for agents of the distributed runner."""
+
+    @cliutils.args("--host", type=str, dest="host", required=False,
+                   default="0.0.0.0",
+                   help="Address to listen for the coordinator on")
+    @cliutils.args("--port", type=int, dest="port", required=True,
+                   help="Port to listen for the coordinator on")
+    @cliutils.args("--name", type=str, dest="name", required=False,
+                   help="Host name the coordinator connects to, it is "
+                        "registered in the database. Defaults to --host, "
+                        "or to the name of this machine if --host is "
+                        "0.0.0.0.")
+    def start(self, port, host="0.0.0.0", name=None):
+        """Start an agent that runs load for the distributed runner."""
+        agent.Agent(host, port, name=name).serve()
+
+
 def main():
-    categories = {"db": DBCommands,
+    categories = {"agent": AgentCommands,
+                  "db": DBCommands,
                   "tempest": TempestCommands}
     cliutils.run(sys.argv, categories)
 
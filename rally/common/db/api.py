@@ -90,18 +90,23 @@ def task_get(uuid):
     return get_impl().task_get(uuid)
 
 
-def task_get_detailed_last():
-    """Returns the most recently created task."""
-    return get_impl().task_get_detailed_last()
+def task_get_detailed_last(load_raw=True):
+    """Returns the most recently created task.
+
+    :param load_raw: if False, raw results stored in chunks are not loaded.
+    """
+    return get_impl().task_get_detailed_last(load_raw=load_raw)
 
 
-def task_get_detailed(uuid):
+def task_get_detailed(uuid, load_raw=True):
     """Returns task with results by uuid.
 
     :param uuid: UUID of the task.
+    :param load_raw: if False, raw results stored in chunks are not loaded,
+                     so the results contain only their summary.
     :returns: task dict with data on the task and its results.
     """
-    return get_impl().task_get_detailed(uuid)
+    return get_impl().task_get_detailed(uuid, load_raw=load_raw)
 
 
 def task_create(values):
@@ -152,13 +157,32 @@ def task_delete(uuid, status=None):
     return get_impl().task_delete(uuid, status=status)
 
 
-def task_result_get_all_by_uuid(task_uuid):
+def task_result_get_all_by_uuid(task_uuid, load_raw=True):
     """Get list of task results.
 
+    Raw results of the task results saved without them are taken from
+    the task result chunks with the same key.
+
     :param task_uuid: string with UUID of Task instance.
+    :param load_raw: if False, raw results stored in chunks are not loaded,
+                     so the results contain only their summary.
     :returns: list instances of TaskResult.
     """
-    return get_impl().task_result_get_all_by_uuid(task_uuid)
+    return get_impl().task_result_get_all_by_uuid(task_uuid,
+                                                  load_raw=load_raw)
+
+
+def task_result_raw_iter(task_uuid, key):
+    """Iterate over raw results of the task result.
+
+    Chunks of raw results are loaded one at a time, so the raw results
+    of big tasks are never kept in memory at once.
+
+    :param task_uuid: string with UUID of Task instance.
+    :param key: key of the task result.
+    :returns: iterator over raw results of scenario iterations.
+    """
+    return get_impl().task_result_raw_iter(task_uuid, key)
 
 
 def task_result_create(task_uuid, key, data):
@@ -172,6 +196,107 @@ def task_result_create(task_uuid, key, data):
     return get_impl().task_result_create(task_uuid, key, data)
 
 
+def task_result_bulk_create(task_uuid, results):
+    """Append several result records to task in one transaction.
+
+    :param task_uuid: string with UUID of Task instance.
+    :param results: list of dicts with "key" and "data" of task results.
+    :returns: number of task results created.
+    """
+    return get_impl().task_result_bulk_create(task_uuid, results)
+
+
+def task_result_chunk_create(task_uuid, key, data):
+    """Save a chunk of raw results of the task.
+
+    Every iteration of the chunk is also saved with its atomic actions
+    into separate tables, which are used to calculate statistics of the
+    task without loading raw results.
+
+    :param task_uuid: string with UUID of Task instance.
+    :param key: key of the task result the chunk belongs to.
+    :param data: list of raw results of scenario iterations.
+    :returns: TaskResultChunk instance created.
+    """
+    return get_impl().task_result_chunk_create(task_uuid, key, data)
+
+
+def task_iteration_stats(task_uuid):
+    """Get statistics of the iterations of each scenario of the task.
+
+    Durations are calculated by the database using successful
+    iterations only.
+
+    :param task_uuid: string with UUID of Task instance.
+    :returns: list of dicts with "scenario" name and "pos", the numbers of
+              "iterations" and "errors" and "min", "avg" and "max"
+              durations, ordered by "scenario" and "pos".
+    """
+    return get_impl().task_iteration_stats(task_uuid)
+
+
+def task_atomic_action_stats(task_uuid):
+    """Get statistics of the atomic actions of each scenario of the task.
+
+    Durations are calculated by the database using successful
+    iterations only.
+
+    :param task_uuid: string with UUID of Task instance.
+    :returns: list of dicts with "scenario" name and "pos", "name" of the
+              atomic action, "count" of its runs and "min", "avg" and
+              "max" durations, ordered by "scenario", "pos" and "name".
+    """
+    return get_impl().task_atomic_action_stats(task_uuid)
+
+
+def task_result_migrate(summarize):
+    """Move raw results stored in the task results into chunks.
+
+    Raw results of the tasks saved before the results were stored in
+    chunks are moved into chunks and iteration tables, so they are
+    available for the statistics queries. The summary is computed for
+    the results saved without it and copied into the duration stats
+    table used by task_trends().
+
+    :param summarize: function which takes the list of raw results of a
+                      task result and returns its summary.
+    :returns: number of the migrated task results.
+    """
+    return get_impl().task_result_migrate(summarize)
+
+
+def task_trends(scenario, action="total", limit=60, status=None,
+                deployment=None):
+    """Get statistics of durations of the action across many tasks.
+
+    Statistics are taken from the summaries of the task results, which
+    are indexed by the scenario and the action, so the results aren't
+    loaded.
+
+    :param scenario: name of the scenario
+    :param action: name of the atomic action, "total" or
+                   "total (corrected)"
+    :param limit: number of the most recent tasks to get statistics of
+    :param status: task status to filter by
+    :param deployment: UUID or name of the deployment to filter by
+    :returns: list of dicts with "task_uuid", "created_at" (of the task),
+              "pos", "count", "success", "min", "median", "90%ile",
+              "95%ile", "max" and "avg" keys, from the oldest task to
+              the newest one
+    """
+    return get_impl().task_trends(scenario, action=action, limit=limit,
+                                  status=status, deployment=deployment)
+
+
+def task_result_chunk_get_all_by_uuid(task_uuid):
+    """Get list of chunks of raw task results in order of creation.
+
+    :param task_uuid: string with UUID of Task instance.
+    :returns: list instances of TaskResultChunk.
+    """
+    return get_impl().task_result_chunk_get_all_by_uuid(task_uuid)
+
+
 def deployment_create(values):
     """Create a deployment from the values dictionary.
 
@@ -356,6 +481,16 @@ def get_worker(hostname):
     return get_impl().get_worker(hostname)
 
 
+def get_workers(updated_since=None):
+    """Get a list of registered worker services.
+
+    :param updated_since: datetime, if specified only workers that were
+                          marked as active after it are returned.
+    :returns: A list of workers.
+    """
+    return get_impl().get_workers(updated_since=updated_since)
+
+
 def unregister_worker(hostname):
     """Unregister this worker with the service registry.
 
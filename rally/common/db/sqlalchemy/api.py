@@ -16,8 +16,13 @@
 SQLAlchemy implementation for DB.API
 """
 
+import json
+import os
+
 from oslo_config import cfg
 from oslo_db import exception as db_exc
+from oslo_db.sqlalchemy import exc_filters
+from oslo_db.sqlalchemy import orm as db_orm
 from oslo_db.sqlalchemy import session as db_session
 from oslo_utils import timeutils
 import sqlalchemy as sa
@@ -28,7 +33,31 @@ from rally.common.i18n import _
 from rally import exceptions
 
 
+SQLITE_OPTS = [
+    cfg.StrOpt("sqlite_journal_mode", default="WAL",
+               choices=["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL",
+                        "OFF"],
+               help="Journal mode of SQLite database file. In WAL mode "
+                    "readers do not block a writer and a writer does not "
+                    "block readers, so several Rally processes can share "
+                    "one database."),
+    cfg.FloatOpt("sqlite_busy_timeout", default=30.0,
+                 help="Seconds to wait for a lock of SQLite database held "
+                      "by another connection before \"database is locked\" "
+                      "error is raised."),
+    cfg.StrOpt("sqlite_synchronous_level", default="NORMAL",
+               choices=["OFF", "NORMAL", "FULL"],
+               help="Synchronous level of SQLite connections. NORMAL is "
+                    "safe from corruption in WAL mode. Not used if "
+                    "sqlite_synchronous is False."),
+    cfg.IntOpt("sqlite_pool_size", default=5, min=0,
+               help="Number of connections to SQLite database file kept "
+                    "open and shared by the sessions. If 0, a new "
+                    "connection is opened for every session.")
+]
+
 CONF = cfg.CONF
+CONF.register_opts(SQLITE_OPTS, group="database")
 
 _FACADE = None
 
@@ -37,11 +66,92 @@ def _create_facade_lazily():
     global _FACADE
 
     if _FACADE is None:
-        _FACADE = db_session.EngineFacade.from_config(CONF)
+        url = sa.engine.url.make_url(CONF.database.connection)
+        if (url.get_dialect().name == "sqlite"
+                and url.database not in (None, "", ":memory:")):
+            _FACADE = _SQLiteFileFacade(url)
+        else:
+            _FACADE = db_session.EngineFacade.from_config(CONF)
 
     return _FACADE
 
 
+class _SQLiteFileFacade(object):
+    """Engine and sessions of SQLite database file.
+
+    oslo.db opens a new connection to SQLite file for every session, so
+    the engine is created here with a pool of connections which are
+    reused by the sessions and set up for concurrent access.
+    """
+
+    def __init__(self, url):
+        opts = CONF.database
+        if opts.sqlite_pool_size:
+            pool_args = {"poolclass": sa.pool.QueuePool,
+                         "pool_size": opts.sqlite_pool_size,
+                         "max_overflow": opts.max_overflow}
+            if opts.pool_timeout is not None:
+                pool_args["pool_timeout"] = opts.pool_timeout
+        else:
+            pool_args = {"poolclass": sa.pool.NullPool}
+        self._engine = sa.create_engine(
+            url, convert_unicode=True, pool_recycle=opts.idle_timeout,
+            connect_args={"check_same_thread": False}, **pool_args)
+        _tune_sqlite_engine(self._engine)
+        exc_filters.register_engine(self._engine)
+        self._maker = db_orm.get_maker(self._engine, autocommit=True,
+                                       expire_on_commit=False)
+
+    def get_engine(self):
+        return self._engine
+
+    def get_session(self, **kwargs):
+        return self._maker(**kwargs)
+
+
+def _tune_sqlite_engine(engine):
+    """Set up the engine of SQLite database file for concurrent access."""
+    opts = CONF.database
+
+    @sa.event.listens_for(engine, "connect")
+    def set_up_connection(dbapi_con, con_record):
+        con_record.info["pid"] = os.getpid()
+        # NOTE: pysqlite must not emit BEGIN itself, the transactions are
+        #       started by begin_immediate().
+        dbapi_con.isolation_level = None
+        dbapi_con.execute("PRAGMA busy_timeout = %d"
+                          % int(opts.sqlite_busy_timeout * 1000))
+        dbapi_con.execute("PRAGMA journal_mode = %s"
+                          % opts.sqlite_journal_mode)
+        dbapi_con.execute("PRAGMA synchronous = %s"
+                          % (opts.sqlite_synchronous_level
+                             if opts.sqlite_synchronous else "OFF"))
+
+    @sa.event.listens_for(engine, "checkout")
+    def check_pid(dbapi_con, con_record, con_proxy):
+        # NOTE: SQLite connection must not be used by a forked process
+        # (e.g. scenario runner workers), so such process opens its own.
+        if con_record.info.get("pid") != os.getpid():
+            con_record.connection = con_proxy.connection = None
+            raise sa.exc.DisconnectionError(
+                "SQLite connection was opened by another process")
+
+    @sa.event.listens_for(engine, "begin")
+    def begin_immediate(conn):
+        # NOTE: Transactions are started only for writes (sessions work in
+        # autocommit mode). Taking the write lock at once makes a concurrent
+        # writer wait for busy_timeout, while upgrading a deferred read lock
+        # would fail at once.
+        if "in_transaction" not in conn.info:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.info["in_transaction"] = True
+
+    @sa.event.listens_for(engine, "rollback")
+    @sa.event.listens_for(engine, "commit")
+    def end_transaction(conn):
+        conn.info.pop("in_transaction", None)
+
+
 def get_engine():
     facade = _create_facade_lazily()
     return facade.get_engine()
@@ -103,15 +213,21 @@ class Connection(object):
     def task_get(self, uuid):
         return self._task_get(uuid)
 
-    def task_get_detailed(self, uuid):
-        return (self.model_query(models.Task).
+    def task_get_detailed(self, uuid, load_raw=True):
+        task = (self.model_query(models.Task).
                 options(sa.orm.joinedload("results")).
                 filter_by(uuid=uuid).first())
+        if task and load_raw:
+            self._task_results_load_chunks(task.uuid, task.results)
+        return task
 
-    def task_get_detailed_last(self):
-        return (self.model_query(models.Task).
+    def task_get_detailed_last(self, load_raw=True):
+        task = (self.model_query(models.Task).
                 options(sa.orm.joinedload("results")).
                 order_by(models.Task.id.desc()).first())
+        if task and load_raw:
+            self._task_results_load_chunks(task.uuid, task.results)
+        return task
 
     def task_create(self, values):
         task = models.Task()
@@ -151,6 +267,10 @@ class Connection(object):
 
             (self.model_query(models.TaskResult).filter_by(task_uuid=uuid).
              delete(synchronize_session=False))
+            for model in (models.TaskResultChunk, models.TaskAtomicAction,
+                          models.TaskIteration, models.TaskDurationStats):
+                (self.model_query(model).filter_by(task_uuid=uuid).
+                 delete(synchronize_session=False))
 
             count = query.delete(synchronize_session=False)
             if not count:
@@ -163,14 +283,264 @@ class Connection(object):
                 raise exceptions.TaskNotFound(uuid=uuid)
 
     def task_result_create(self, task_uuid, key, data):
-        result = models.TaskResult()
-        result.update({"task_uuid": task_uuid, "key": key, "data": data})
-        result.save()
+        session = get_session()
+        with session.begin():
+            result = models.TaskResult()
+            result.update({"task_uuid": task_uuid, "key": key, "data": data})
+            result.save(session=session)
+            if data.get("summary"):
+                self._task_duration_stats_create(task_uuid, key,
+                                                 data["summary"], session)
         return result
 
-    def task_result_get_all_by_uuid(self, uuid):
-        return (self.model_query(models.TaskResult).
-                filter_by(task_uuid=uuid).all())
+    def task_result_bulk_create(self, task_uuid, results):
+        if not results:
+            return 0
+        stats = []
+        for result in results:
+            if result["data"].get("summary"):
+                stats.extend(self._task_duration_stats_rows(
+                    task_uuid, result["key"], result["data"]["summary"]))
+
+        session = get_session()
+        with session.begin():
+            session.execute(models.TaskResult.__table__.insert(),
+                            [{"task_uuid": task_uuid, "key": result["key"],
+                              "data": result["data"]}
+                             for result in results])
+            if stats:
+                session.execute(models.TaskDurationStats.__table__.insert(),
+                                stats)
+        return len(results)
+
+    def _task_duration_stats_rows(self, task_uuid, key, summary):
+        return [{"task_uuid": task_uuid,
+                 "scenario": key["name"],
+                 "pos": key["pos"],
+                 "action": row["name"],
+                 "count": row["count"],
+                 "success": row["success"],
+                 "min": row["min"],
+                 "median": row["median"],
+                 "p90": row["90%ile"],
+                 "p95": row["95%ile"],
+                 "max": row["max"],
+                 "avg": row["avg"]} for row in summary["atomic"]]
+
+    def _task_duration_stats_create(self, task_uuid, key, summary, session):
+        rows = self._task_duration_stats_rows(task_uuid, key, summary)
+        if rows:
+            session.execute(models.TaskDurationStats.__table__.insert(), rows)
+
+    def task_trends(self, scenario, action="total", limit=60, status=None,
+                    deployment=None):
+        stats = models.TaskDurationStats
+        query = (self.model_query(stats).
+                 join(models.Task, stats.task_uuid == models.Task.uuid).
+                 filter(stats.scenario == scenario, stats.action == action))
+        if status is not None:
+            query = query.filter(models.Task.status == status)
+        if deployment is not None:
+            query = query.filter(models.Task.deployment_uuid ==
+                                 self.deployment_get(deployment)["uuid"])
+
+        task_ids = [row[0] for row in
+                    query.with_entities(models.Task.id).distinct().
+                    order_by(models.Task.id.desc()).limit(limit).all()]
+        if not task_ids:
+            return []
+        rows = (query.filter(models.Task.id.in_(task_ids)).
+                with_entities(stats, models.Task.created_at).
+                order_by(models.Task.id, stats.pos).all())
+        return [{"task_uuid": row.task_uuid, "created_at": created_at,
+                 "pos": row.pos, "count": row.count,
+                 "success": row.success, "min": row.min,
+                 "median": row.median, "90%ile": row.p90,
+                 "95%ile": row.p95, "max": row.max, "avg": row.avg}
+                for row, created_at in rows]
+
+    def task_result_get_all_by_uuid(self, uuid, load_raw=True):
+        results = (self.model_query(models.TaskResult).
+                   filter_by(task_uuid=uuid).all())
+        if load_raw:
+            self._task_results_load_chunks(uuid, results)
+        return results
+
+    def task_result_raw_iter(self, uuid, key):
+        chunks = models.TaskResultChunk
+        # NOTE: Only ids are selected first, so chunks are loaded from the
+        #       DB one by one while they are iterated.
+        chunk_ids = [row[0] for row in
+                     self.model_query(chunks).with_entities(chunks.id).
+                     filter_by(task_uuid=uuid, scenario=key["name"],
+                               pos=key["pos"]).order_by(chunks.id).all()]
+        if not chunk_ids:
+            # Raw results saved in the task result itself
+            key = json.dumps(key, sort_keys=True)
+            for result in self.task_result_get_all_by_uuid(uuid,
+                                                           load_raw=False):
+                if json.dumps(result.key, sort_keys=True) == key:
+                    for raw in result.data.get("raw", []):
+                        yield raw
+            return
+
+        for chunk_id in chunk_ids:
+            data = (self.model_query(chunks).with_entities(chunks.data).
+                    filter_by(id=chunk_id).one())[0]
+            for raw in data:
+                yield raw
+
+    def task_result_chunk_create(self, task_uuid, key, data):
+        session = get_session()
+        with session.begin():
+            chunk = models.TaskResultChunk()
+            chunk.update({"task_uuid": task_uuid, "key": key,
+                          "scenario": key["name"], "pos": key["pos"],
+                          "data": data})
+            chunk.save(session=session)
+            self._task_iterations_create(task_uuid, key, data, session)
+        return chunk
+
+    def _task_iterations_create(self, task_uuid, key, raw, session):
+        iterations = []
+        actions = []
+        for result in raw:
+            error = bool(result.get("error"))
+            iterations.append({"task_uuid": task_uuid,
+                               "scenario": key["name"],
+                               "pos": key["pos"],
+                               "duration": result.get("duration"),
+                               "idle_duration": result.get("idle_duration"),
+                               "timestamp": result.get("timestamp"),
+                               "error": error})
+            for name, duration in result.get("atomic_actions", {}).items():
+                actions.append({"task_uuid": task_uuid,
+                                "scenario": key["name"],
+                                "pos": key["pos"],
+                                "name": name,
+                                "duration": duration,
+                                "error": error})
+        if iterations:
+            session.execute(models.TaskIteration.__table__.insert(),
+                            iterations)
+        if actions:
+            session.execute(models.TaskAtomicAction.__table__.insert(),
+                            actions)
+
+    def task_result_chunk_get_all_by_uuid(self, uuid):
+        return (self.model_query(models.TaskResultChunk).
+                filter_by(task_uuid=uuid).
+                order_by(models.TaskResultChunk.id).all())
+
+    def task_iteration_stats(self, uuid):
+        iterations = models.TaskIteration
+        totals = (self.model_query(iterations).
+                  with_entities(iterations.scenario, iterations.pos,
+                                sa.func.count(iterations.id),
+                                sa.func.sum(sa.cast(iterations.error,
+                                                    sa.Integer))).
+                  filter_by(task_uuid=uuid).
+                  group_by(iterations.scenario, iterations.pos).all())
+        durations = dict(
+            (tuple(row[:2]), row[2:]) for row in
+            self.model_query(iterations).
+            with_entities(iterations.scenario, iterations.pos,
+                          sa.func.min(iterations.duration),
+                          sa.func.avg(iterations.duration),
+                          sa.func.max(iterations.duration)).
+            filter_by(task_uuid=uuid, error=False).
+            group_by(iterations.scenario, iterations.pos).all())
+
+        stats = []
+        for scenario, pos, count, errors in sorted(totals):
+            min_, avg, max_ = durations.get((scenario, pos),
+                                            (None, None, None))
+            stats.append({"scenario": scenario, "pos": pos,
+                          "iterations": count, "errors": int(errors or 0),
+                          "min": min_, "avg": avg, "max": max_})
+        return stats
+
+    def task_atomic_action_stats(self, uuid):
+        actions = models.TaskAtomicAction
+        rows = (self.model_query(actions).
+                with_entities(actions.scenario, actions.pos, actions.name,
+                              sa.func.count(actions.duration),
+                              sa.func.min(actions.duration),
+                              sa.func.avg(actions.duration),
+                              sa.func.max(actions.duration)).
+                filter_by(task_uuid=uuid, error=False).
+                group_by(actions.scenario, actions.pos, actions.name).
+                order_by(actions.scenario, actions.pos, actions.name).all())
+        return [{"scenario": scenario, "pos": pos, "name": name,
+                 "count": count, "min": min_, "avg": avg, "max": max_}
+                for scenario, pos, name, count, min_, avg, max_ in rows]
+
+    def task_result_migrate(self, summarize):
+        ids = [row[0] for row in
+               self.model_query(models.TaskResult).
+               with_entities(models.TaskResult.id).
+               order_by(models.TaskResult.id).all()]
+        migrated = 0
+        for result_id in ids:
+            session = get_session()
+            with session.begin():
+                result = (self.model_query(models.TaskResult,
+                                           session=session).
+                          filter_by(id=result_id).first())
+                data = dict(result.data)
+                changed = False
+                # Results without iterations are kept as they are, since
+                # "raw" is taken from chunks only if there are any.
+                if data.get("raw"):
+                    raw = data.pop("raw")
+                    chunk = models.TaskResultChunk()
+                    chunk.update({"task_uuid": result.task_uuid,
+                                  "key": result.key,
+                                  "scenario": result.key["name"],
+                                  "pos": result.key["pos"], "data": raw})
+                    session.add(chunk)
+                    self._task_iterations_create(result.task_uuid,
+                                                 result.key, raw, session)
+                    if not data.get("summary"):
+                        data["summary"] = summarize(raw)
+                    result.data = data
+                    changed = True
+
+                if data.get("summary") and not (
+                        self.model_query(models.TaskDurationStats,
+                                         session=session).
+                        filter_by(task_uuid=result.task_uuid,
+                                  scenario=result.key["name"],
+                                  pos=result.key["pos"]).first()):
+                    self._task_duration_stats_create(
+                        result.task_uuid, result.key, data["summary"],
+                        session)
+                    changed = True
+                migrated += changed
+        return migrated
+
+    def _task_results_load_chunks(self, uuid, results):
+        """Put raw results stored in chunks into the task results.
+
+        Only the results saved without "raw" data and having chunks with
+        the same key are updated. The data is replaced without marking
+        the object as modified, so the raw results are never written back
+        to the task result.
+        """
+        if all("raw" in result.data for result in results):
+            return
+
+        raw = {}
+        for chunk in self.task_result_chunk_get_all_by_uuid(uuid):
+            raw.setdefault(json.dumps(chunk.key, sort_keys=True),
+                           []).extend(chunk.data)
+
+        for result in results:
+            key = json.dumps(result.key, sort_keys=True)
+            if "raw" not in result.data and key in raw:
+                data = dict(result.data)
+                data["raw"] = raw[key]
+                sa.orm.attributes.set_committed_value(result, "data", data)
 
     def _deployment_get(self, deployment, session=None):
         stored_deployment = self.model_query(
@@ -320,6 +690,12 @@ class Connection(object):
         except NoResultFound:
             raise exceptions.WorkerNotFound(worker=hostname)
 
+    def get_workers(self, updated_since=None):
+        query = self.model_query(models.Worker)
+        if updated_since is not None:
+            query = query.filter(models.Worker.updated_at >= updated_since)
+        return query.all()
+
     def unregister_worker(self, hostname):
         count = (self.model_query(models.Worker).
                  filter_by(hostname=hostname).delete())
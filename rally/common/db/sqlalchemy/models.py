@@ -183,6 +183,113 @@ class TaskResult(BASE, RallyBase):
                                primaryjoin="TaskResult.task_uuid == Task.uuid")
 
 
+class TaskResultChunk(BASE, RallyBase):
+    """Represents raw results of scenario iterations stored during the run.
+
+    Results are saved in chunks while the scenario is running, so they
+    aren't kept in memory and survive a crash of the task. The summary
+    of the scenario is saved as TaskResult after the run without raw
+    results, they are taken from the chunks with the same key instead.
+    """
+    __tablename__ = "task_result_chunks"
+    __table_args__ = (
+        sa.Index("task_result_chunk_task_uuid_scenario_pos",
+                 "task_uuid", "scenario", "pos"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+
+    key = sa.Column(sa_types.JSONEncodedDict, nullable=False)
+    # Name and position of the scenario in the task, copied from the key,
+    # so the chunks of a scenario are selected by the database
+    scenario = sa.Column(sa.String(255), nullable=False)
+    pos = sa.Column(sa.Integer, nullable=False)
+    data = sa.Column(sa_types.BigJSONEncodedDict, nullable=False)
+
+    task_uuid = sa.Column(sa.String(36), sa.ForeignKey("tasks.uuid"))
+
+
+class TaskIteration(BASE, RallyBase):
+    """Represents a single scenario iteration of the task.
+
+    Iterations are saved together with the chunks of raw results, so
+    statistics of the task can be calculated by the database without
+    loading the raw results.
+    """
+    __tablename__ = "task_iterations"
+    __table_args__ = (
+        sa.Index("task_iteration_task_uuid_scenario_pos",
+                 "task_uuid", "scenario", "pos"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    task_uuid = sa.Column(sa.String(36), sa.ForeignKey("tasks.uuid"),
+                          nullable=False)
+    # Name and position of the scenario in the task (the result key)
+    scenario = sa.Column(sa.String(255), nullable=False)
+    pos = sa.Column(sa.Integer, nullable=False)
+
+    duration = sa.Column(sa.Float)
+    idle_duration = sa.Column(sa.Float)
+    timestamp = sa.Column(sa.Float)
+    error = sa.Column(sa.Boolean, default=False, nullable=False)
+
+
+class TaskAtomicAction(BASE, RallyBase):
+    """Represents an atomic action of a scenario iteration.
+
+    The error flag of the iteration is copied here, so the rows of both
+    tables are inserted in bulk and queried without joins.
+    """
+    __tablename__ = "task_atomic_actions"
+    __table_args__ = (
+        sa.Index("task_atomic_action_task_uuid_scenario_pos_name",
+                 "task_uuid", "scenario", "pos", "name"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    task_uuid = sa.Column(sa.String(36), sa.ForeignKey("tasks.uuid"),
+                          nullable=False)
+    scenario = sa.Column(sa.String(255), nullable=False)
+    pos = sa.Column(sa.Integer, nullable=False)
+
+    name = sa.Column(sa.String(255), nullable=False)
+    duration = sa.Column(sa.Float)
+    error = sa.Column(sa.Boolean, default=False, nullable=False)
+
+
+class TaskDurationStats(BASE, RallyBase):
+    """Represents statistics of durations of an action of a scenario.
+
+    Rows are copied from the summary of the task result when it is saved,
+    so durations of the same action can be compared across many tasks
+    without loading their results.
+    """
+    __tablename__ = "task_duration_stats"
+    __table_args__ = (
+        sa.Index("task_duration_stats_scenario_action",
+                 "scenario", "action"),
+        sa.Index("task_duration_stats_task_uuid", "task_uuid"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    task_uuid = sa.Column(sa.String(36), sa.ForeignKey("tasks.uuid"),
+                          nullable=False)
+    scenario = sa.Column(sa.String(255), nullable=False)
+    pos = sa.Column(sa.Integer, nullable=False)
+    # Name of the atomic action, "total" or "total (corrected)"
+    action = sa.Column(sa.String(255), nullable=False)
+
+    count = sa.Column(sa.Integer, nullable=False)
+    success = sa.Column(sa.Integer, nullable=False)
+    min = sa.Column(sa.Float)
+    median = sa.Column(sa.Float)
+    p90 = sa.Column(sa.Float)
+    p95 = sa.Column(sa.Float)
+    max = sa.Column(sa.Float)
+    avg = sa.Column(sa.Float)
+
+
 class Verification(BASE, RallyBase):
     """Represents a verifier result."""
 
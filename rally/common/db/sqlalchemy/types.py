@@ -13,13 +13,46 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
 import json
+import zlib
 
+from oslo_config import cfg
+from oslo_utils import importutils
 from sqlalchemy.dialects import mysql as mysql_types
 from sqlalchemy.ext import mutable
 from sqlalchemy import types as sa_types
 
 from rally.common import costilius
+from rally.common.i18n import _
+from rally.common import log as logging
+from rally import exceptions
+
+
+LOG = logging.getLogger(__name__)
+
+ujson = importutils.try_import("ujson")
+lz4_frame = importutils.try_import("lz4.frame")
+
+CODEC_OPTS = [
+    cfg.StrOpt("big_json_backend", default="json",
+               choices=["json", "ujson"],
+               help="JSON library used to encode and decode big DB fields, "
+                    "like task results. \"ujson\" is several times faster, "
+                    "but keeps the order of keys only on Python 3.7+. If "
+                    "it is not installed, \"json\" is used."),
+    cfg.StrOpt("big_json_compression", default="none",
+               choices=["none", "zlib", "lz4"],
+               help="Compression of big DB fields, like task results. "
+                    "Fields saved with other compression (or without it) "
+                    "stay readable, the compression of a field is marked "
+                    "in its value. \"lz4\" requires the lz4 library."),
+    cfg.IntOpt("big_json_compression_level", default=1, min=1, max=9,
+               help="Level of zlib compression, from 1 (fastest) to 9 "
+                    "(smallest)."),
+]
+CONF = cfg.CONF
+CONF.register_opts(CODEC_OPTS, group="database")
 
 
 class JSONEncodedDict(sa_types.TypeDecorator):
@@ -39,6 +72,79 @@ class JSONEncodedDict(sa_types.TypeDecorator):
         return value
 
 
+_WARNED = set()
+
+
+def _get_ujson():
+    if CONF.database.big_json_backend == "ujson":
+        if ujson:
+            return ujson
+        if "ujson" not in _WARNED:
+            _WARNED.add("ujson")
+            LOG.warning(_("ujson is not installed, json is used instead"))
+
+
+def _json_dumps(value):
+    backend = _get_ujson()
+    if backend:
+        return backend.dumps(value)
+    return json.dumps(value, sort_keys=False)
+
+
+def _json_loads(value):
+    backend = _get_ujson()
+    if backend:
+        return backend.loads(value)
+    return costilius.json_loads(value,
+                                object_pairs_hook=costilius.OrderedDict)
+
+
+def _get_lz4():
+    if not lz4_frame:
+        raise exceptions.RallyException(
+            _("lz4 compression of DB fields requires lz4 library. To "
+              "install it run `pip install lz4`"))
+    return lz4_frame
+
+
+def _zlib_compress(data):
+    return zlib.compress(data, CONF.database.big_json_compression_level)
+
+
+def _lz4_compress(data):
+    return _get_lz4().compress(data)
+
+
+def _lz4_decompress(data):
+    return _get_lz4().decompress(data)
+
+
+# NOTE: Compressed values are saved as "<marker>:<base64 data>", so they
+#       are distinguished from plain JSON, which starts with "{" or "[".
+_COMPRESSORS = {
+    "zlib": (_zlib_compress, zlib.decompress),
+    "lz4": (_lz4_compress, _lz4_decompress),
+}
+
+
+def _compress(value):
+    compression = CONF.database.big_json_compression
+    if compression == "none":
+        return value
+    compress = _COMPRESSORS[compression][0]
+    data = base64.b64encode(compress(value.encode("utf-8")))
+    return "%s:%s" % (compression, data.decode("ascii"))
+
+
+def _decompress(value):
+    marker = value[:8].split(":", 1)[0]
+    if marker not in _COMPRESSORS:
+        return value
+    decompress = _COMPRESSORS[marker][1]
+    data = base64.b64decode(value[len(marker) + 1:].encode("ascii"))
+    return decompress(data).decode("utf-8")
+
+
 class BigJSONEncodedDict(JSONEncodedDict):
     """Represents an immutable structure as a json-encoded string.
 
@@ -46,6 +152,9 @@ class BigJSONEncodedDict(JSONEncodedDict):
        sqlite we are able to store more then 1GB. In some cases, like storing
        results of task 64kb is not enough. So this type uses for MySql
        LONGTEXT that allows us to store 4GiB.
+
+       JSON library and compression of the values are set by options of
+       "database" group (see CODEC_OPTS).
     """
 
     def load_dialect_impl(self, dialect):
@@ -54,6 +163,16 @@ class BigJSONEncodedDict(JSONEncodedDict):
         else:
             return dialect.type_descriptor(sa_types.Text)
 
+    def process_bind_param(self, value, dialect):
+        if value is not None:
+            value = _compress(_json_dumps(value))
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None:
+            value = _json_loads(_decompress(value))
+        return value
+
 
 class MutableDict(mutable.Mutable, dict):
     @classmethod
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import logging
 
 from oslo_config import cfg
@@ -64,6 +65,42 @@ def getLogger(name="unknown", version="unknown"):
     return oslogging._loggers[name]
 
 
+def _get_handlers():
+    loggers = [logging.getLogger()] + [
+        logger for logger in list(logging.Logger.manager.loggerDict.values())
+        if isinstance(logger, logging.Logger)]
+    handlers_ = {}
+    for logger in loggers:
+        for handler in logger.handlers:
+            handlers_[id(handler)] = handler
+    return [handler for key, handler in sorted(handlers_.items())]
+
+
+@contextlib.contextmanager
+def lock_handlers():
+    """Hold the locks of all the log handlers, e.g. to fork a process.
+
+    A process forked while another thread is writing a log record would
+    inherit the lock of the handler (and of its stream) locked forever.
+    The process forked within this context should call
+    recreate_handler_locks() first, since it inherits the locks held.
+    """
+    locked = _get_handlers()
+    for handler in locked:
+        handler.acquire()
+    try:
+        yield
+    finally:
+        for handler in reversed(locked):
+            handler.release()
+
+
+def recreate_handler_locks():
+    """Replace the locks of all the log handlers with new ones."""
+    for handler in _get_handlers():
+        handler.createLock()
+
+
 class RallyContextAdapter(oslogging.KeywordArgumentAdapter):
 
     def debug(self, msg, *args, **kwargs):
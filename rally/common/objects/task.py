@@ -97,6 +97,24 @@ TASK_RESULT_SCHEMA = {
         "full_duration": {
             "type": "number",
         },
+        "summary": {
+            "type": "object",
+            "properties": {
+                "atomic": {
+                    "type": "array"
+                },
+                "stages": {
+                    "type": "array"
+                },
+                "output": {
+                    "type": "array"
+                },
+            },
+            "required": ["atomic", "stages", "output"]
+        },
+        "runner": {
+            "type": "object"
+        },
     },
     "required": ["key", "sla", "result", "load_duration",
                  "full_duration"],
@@ -134,6 +152,7 @@ class Task(object):
 
     @staticmethod
     def get(uuid):
+        """Get the task without its results."""
         return Task(db.task_get(uuid))
 
     @staticmethod
@@ -158,11 +177,32 @@ class Task(object):
         self._update({"status": consts.TaskStatus.FAILED,
                       "verification_log": json.dumps(log)})
 
-    def get_results(self):
-        return db.task_result_get_all_by_uuid(self.task["uuid"])
+    def get_results(self, load_raw=True):
+        """Get the results of the task.
+
+        :param load_raw: if False, raw results of scenario iterations are
+                         not loaded, which is much cheaper for big tasks
+                         (see iter_raw_results())
+        """
+        return db.task_result_get_all_by_uuid(self.task["uuid"],
+                                              load_raw=load_raw)
+
+    def iter_raw_results(self, key):
+        """Iterate over raw results of the task result with the given key."""
+        return db.task_result_raw_iter(self.task["uuid"], key)
 
     def append_results(self, key, value):
         db.task_result_create(self.task["uuid"], key, value)
 
+    def extend_results(self, results):
+        """Save several results at once.
+
+        :param results: list of dicts with "key" and "data" of the results
+        """
+        db.task_result_bulk_create(self.task["uuid"], results)
+
+    def append_results_chunk(self, key, raw):
+        db.task_result_chunk_create(self.task["uuid"], key, raw)
+
     def delete(self, status=None):
         db.task_delete(self.task["uuid"], status=status)
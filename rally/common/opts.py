@@ -14,6 +14,8 @@
 
 import itertools
 
+from rally.common.db.sqlalchemy import api as db_api
+from rally.common.db.sqlalchemy import types as db_types
 from rally.common import log
 from rally import exceptions
 from rally import osclients
@@ -25,6 +27,9 @@ from rally.plugins.openstack.scenarios.heat import utils as heat_utils
 from rally.plugins.openstack.scenarios.manila import utils as manila_utils
 from rally.plugins.openstack.scenarios.nova import utils as nova_utils
 from rally.plugins.openstack.scenarios.sahara import utils as sahara_utils
+from rally.task import agent
+from rally.task import engine
+from rally.task import runner
 from rally.verification.tempest import config as tempest_conf
 
 
@@ -41,7 +46,13 @@ def list_opts():
                          manila_utils.MANILA_BENCHMARK_OPTS,
                          nova_utils.NOVA_BENCHMARK_OPTS,
                          sahara_utils.SAHARA_TIMEOUT_OPTS,
-                         ec2_utils.EC2_BENCHMARK_OPTS)),
+                         ec2_utils.EC2_BENCHMARK_OPTS,
+                         runner.RUNNER_OPTS,
+                         agent.AGENT_OPTS,
+                         engine.ENGINE_OPTS)),
+        ("database",
+         itertools.chain(db_api.SQLITE_OPTS,
+                         db_types.CODEC_OPTS)),
         ("image",
          itertools.chain(tempest_conf.IMAGE_OPTS)),
         ("users_context", itertools.chain(users.USER_CONTEXT_OPTS))
@@ -25,7 +25,13 @@ from rally import exceptions
 
 @six.add_metaclass(abc.ABCMeta)
 class StreamingAlgorithm(object):
-    """Base class for streaming computations that scale."""
+    """Base class for streaming computations that scale.
+
+    Computations of the same type made separately (e.g. by different
+    processes) can be combined with merge(), and the state of a
+    computation can be sent as a compact dict made by to_dict() and
+    restored with from_dict().
+    """
 
     @abc.abstractmethod
     def add(self, value):
@@ -35,6 +41,27 @@ class StreamingAlgorithm(object):
     def result(self):
         """Return the result based on the values processed so far."""
 
+    @abc.abstractmethod
+    def merge(self, other):
+        """Add the values processed by other computation to this one.
+
+        :param other: computation of the same type
+        """
+
+    @abc.abstractmethod
+    def to_dict(self):
+        """Return the state of the computation as a JSON-compatible dict."""
+
+    @classmethod
+    @abc.abstractmethod
+    def from_dict(cls, data):
+        """Restore the computation from a dict made by to_dict()."""
+
+    def _check_mergeable(self, other):
+        if type(other) is not type(self):
+            raise TypeError("Unable to merge %s into %s"
+                            % (type(other).__name__, type(self).__name__))
+
     def _cast_to_float(self, value):
         try:
             return float(value)
@@ -60,6 +87,21 @@ class MeanComputation(StreamingAlgorithm):
             raise exceptions.RallyException(message)
         return self.total / self.count
 
+    def merge(self, other):
+        self._check_mergeable(other)
+        self.count += other.count
+        self.total += other.total
+
+    def to_dict(self):
+        return {"count": self.count, "total": self.total}
+
+    @classmethod
+    def from_dict(cls, data):
+        comp = cls()
+        comp.count = data["count"]
+        comp.total = data["total"]
+        return comp
+
 
 class StdDevComputation(StreamingAlgorithm):
     """Compute standard deviation for a stream of numbers."""
@@ -88,6 +130,35 @@ class StdDevComputation(StreamingAlgorithm):
             raise exceptions.RallyException(message)
         return math.sqrt(self.dev_sum / (self.count - 1))
 
+    def merge(self, other):
+        # NOTE: This is the parallel version of the algorithm by Chan et
+        #       al., "Updating Formulae and a Pairwise Algorithm for
+        #       Computing Sample Variances", 1979.
+        self._check_mergeable(other)
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.dev_sum += (other.dev_sum +
+                         delta * delta * self.count * other.count / count)
+        self.mean += delta * other.count / count
+        self.count = count
+        self.mean_computation.merge(other.mean_computation)
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean,
+                "dev_sum": self.dev_sum}
+
+    @classmethod
+    def from_dict(cls, data):
+        comp = cls()
+        comp.count = data["count"]
+        comp.mean = data["mean"]
+        comp.dev_sum = data["dev_sum"]
+        comp.mean_computation = MeanComputation.from_dict(
+            {"count": data["count"], "total": data["mean"] * data["count"]})
+        return comp
+
 
 class MinComputation(StreamingAlgorithm):
     """Compute minimal value from a stream of numbers."""
@@ -106,6 +177,20 @@ class MinComputation(StreamingAlgorithm):
             raise ValueError("No values have been processed")
         return self._value
 
+    def merge(self, other):
+        self._check_mergeable(other)
+        if other._value is not None:
+            self.add(other._value)
+
+    def to_dict(self):
+        return {"value": self._value}
+
+    @classmethod
+    def from_dict(cls, data):
+        comp = cls()
+        comp._value = data["value"]
+        return comp
+
 
 class MaxComputation(StreamingAlgorithm):
     """Compute maximal value from a stream of numbers."""
@@ -124,6 +209,20 @@ class MaxComputation(StreamingAlgorithm):
             raise ValueError("No values have been processed")
         return self._value
 
+    def merge(self, other):
+        self._check_mergeable(other)
+        if other._value is not None:
+            self.add(other._value)
+
+    def to_dict(self):
+        return {"value": self._value}
+
+    @classmethod
+    def from_dict(cls, data):
+        comp = cls()
+        comp._value = data["value"]
+        return comp
+
 
 class PercentileComputation(StreamingAlgorithm):
     """Compute percentile value from a stream of numbers."""
@@ -167,6 +266,211 @@ class PercentileComputation(StreamingAlgorithm):
             raise ValueError("No values have been processed")
         return self._current_percentile
 
+    def _values(self):
+        return sorted([-value for value in self._left] + self._right)
+
+    def merge(self, other):
+        # NOTE: The exact percentile requires all the values, use
+        #       HistogramPercentileComputation to merge bounded summaries.
+        self._check_mergeable(other)
+        if other._percent != self._percent:
+            raise ValueError("Unable to merge %s percentile into %s "
+                             "percentile" % (other._percent, self._percent))
+        for value in other._values():
+            self.add(value)
+
+    def to_dict(self):
+        return {"percent": self._percent, "values": self._values()}
+
+    @classmethod
+    def from_dict(cls, data):
+        comp = cls(data["percent"])
+        for value in data["values"]:
+            comp.add(value)
+        return comp
+
+
+class HistogramPercentileComputation(StreamingAlgorithm):
+    """Compute percentiles of a stream of numbers with bounded memory.
+
+    Values are counted in buckets with exponentially growing bounds, like
+    in HDR histogram, so any percentile is found from one structure with
+    the given relative error. The number of buckets depends on the range
+    of the values instead of their count, e.g. durations from 1 ms to 1
+    hour take about 760 buckets with 1% error.
+
+    Computations of the same relative error made by different processes
+    can be combined with merge().
+    """
+
+    def __init__(self, percent=50, relative_error=0.01, max_buckets=2048):
+        """Init streaming computation.
+
+        :param percent: numeric percent (from 0 to 100) returned by result()
+        :param relative_error: max relative error of percentiles, e.g.
+                               0.01 for 1%
+        :param max_buckets: max number of buckets. If there are more, the
+                            buckets of the lowest values are joined, so
+                            their relative error becomes bigger
+        """
+        if not 0 <= percent <= 100:
+            raise ValueError("Unexpected percent: %s" % percent)
+        if not 0 < relative_error < 1:
+            raise ValueError("Unexpected relative error: %s"
+                             % relative_error)
+        if max_buckets < 2:
+            raise ValueError("Unexpected number of buckets: %s"
+                             % max_buckets)
+        self._percent = percent
+        self.relative_error = relative_error
+        self.max_buckets = max_buckets
+        self._gamma = (1 + relative_error) / (1 - relative_error)
+        self._multiplier = 1 / math.log(self._gamma)
+        self.count = 0
+        self._min = None
+        self._max = None
+        self._zero_count = 0
+        # {bucket index: count}, bucket i holds (gamma^(i-1), gamma^i]
+        self._positive = {}
+        # the same for absolute values of negative numbers
+        self._negative = {}
+
+    def _bucket(self, value):
+        return int(math.ceil(math.log(value) * self._multiplier))
+
+    def _bucket_value(self, index):
+        # The point with equal relative distance to both bounds
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def add(self, value):
+        value = self._cast_to_float(value)
+
+        self.count += 1
+        if self._min is None or value < self._min:
+            self._min = value
+        if self._max is None or value > self._max:
+            self._max = value
+
+        if value > 0:
+            buckets, index = self._positive, self._bucket(value)
+        elif value < 0:
+            buckets, index = self._negative, self._bucket(-value)
+        else:
+            self._zero_count += 1
+            return
+        if index in buckets:
+            buckets[index] += 1
+        else:
+            buckets[index] = 1
+            if len(self._positive) + len(self._negative) > self.max_buckets:
+                self._collapse()
+
+    def _collapse(self):
+        # Join the buckets of the values closest to zero
+        while len(self._positive) + len(self._negative) > self.max_buckets:
+            buckets = self._positive
+            if len(buckets) < 2:
+                buckets = self._negative
+            lowest = sorted(buckets)[:2]
+            buckets[lowest[1]] += buckets.pop(lowest[0])
+
+    def merge(self, other):
+        """Add the values processed by other computation to this one.
+
+        :param other: HistogramPercentileComputation of the same relative
+                      error
+        """
+        self._check_mergeable(other)
+        if other.relative_error != self.relative_error:
+            raise ValueError("Unable to merge computations of different "
+                             "relative errors: %s and %s"
+                             % (other.relative_error, self.relative_error))
+        if not other.count:
+            return
+        self.count += other.count
+        self._zero_count += other._zero_count
+        for own, others in ((self._positive, other._positive),
+                            (self._negative, other._negative)):
+            for index, count in others.items():
+                own[index] = own.get(index, 0) + count
+        self._min = (other._min if self._min is None
+                     else min(self._min, other._min))
+        self._max = (other._max if self._max is None
+                     else max(self._max, other._max))
+        self._collapse()
+
+    def _values_at(self, *ranks):
+        """Get approximate values at the given ranks (in ascending order)."""
+        values = []
+        ranks = list(ranks)
+        seen = 0
+        buckets = [(-self._bucket_value(index), count)
+                   for index, count in sorted(self._negative.items(),
+                                              reverse=True)]
+        if self._zero_count:
+            buckets.append((0.0, self._zero_count))
+        buckets.extend((self._bucket_value(index), count)
+                       for index, count in sorted(self._positive.items()))
+        for value, count in buckets:
+            seen += count
+            while ranks and ranks[0] < seen:
+                values.append(min(max(value, self._min), self._max))
+                ranks.pop(0)
+            if not ranks:
+                break
+        return values
+
+    def percentile(self, percent):
+        """Get a percentile of the values processed so far.
+
+        Values between the closest ranks are interpolated as in
+        rally.task.processing.utils.percentile().
+
+        :param percent: numeric percent (from 0 to 100)
+        """
+        if not self.count:
+            raise ValueError("No values have been processed")
+        if not 0 <= percent <= 100:
+            raise ValueError("Unexpected percent: %s" % percent)
+        rank = (self.count - 1) * percent / 100.0
+        lower, upper = int(math.floor(rank)), int(math.ceil(rank))
+        low, high = self._values_at(lower, upper)
+        # The lowest and the highest values are known exactly
+        exact = {0: self._min, self.count - 1: self._max}
+        low, high = exact.get(lower, low), exact.get(upper, high)
+        return low + (high - low) * (rank - lower)
+
+    def result(self):
+        return self.percentile(self._percent)
+
+    def to_dict(self):
+        return {"percent": self._percent,
+                "relative_error": self.relative_error,
+                "max_buckets": self.max_buckets,
+                "count": self.count,
+                "min": self._min,
+                "max": self._max,
+                "zero_count": self._zero_count,
+                # Pairs of bucket index and count, since keys of JSON
+                # objects are strings
+                "positive": sorted(self._positive.items()),
+                "negative": sorted(self._negative.items())}
+
+    @classmethod
+    def from_dict(cls, data):
+        comp = cls(percent=data["percent"],
+                   relative_error=data["relative_error"],
+                   max_buckets=data["max_buckets"])
+        comp.count = data["count"]
+        comp._min = data["min"]
+        comp._max = data["max"]
+        comp._zero_count = data["zero_count"]
+        comp._positive = dict((index, count)
+                              for index, count in data["positive"])
+        comp._negative = dict((index, count)
+                              for index, count in data["negative"])
+        return comp
+
 
 class ProgressComputation(StreamingAlgorithm):
     """Compute progress in percent."""
@@ -189,6 +493,23 @@ class ProgressComputation(StreamingAlgorithm):
     def result(self):
         return self._count / float(self._base_count) * 100
 
+    def merge(self, other):
+        self._check_mergeable(other)
+        if self._count + other._count > self._base_count:
+            raise RuntimeError(
+                "100%% progress is exceeded (count of %d)"
+                % self._base_count)
+        self._count += other._count
+
+    def to_dict(self):
+        return {"base_count": self._base_count, "count": self._count}
+
+    @classmethod
+    def from_dict(cls, data):
+        comp = cls(data["base_count"])
+        comp._count = data["count"]
+        return comp
+
 
 class IncrementComputation(StreamingAlgorithm):
     """Simple incremental counter."""
@@ -201,3 +522,16 @@ class IncrementComputation(StreamingAlgorithm):
 
     def result(self):
         return self._count
+
+    def merge(self, other):
+        self._check_mergeable(other)
+        self._count += other._count
+
+    def to_dict(self):
+        return {"count": self._count}
+
+    @classmethod
+    def from_dict(cls, data):
+        comp = cls()
+        comp._count = data["count"]
+        return comp
@@ -0,0 +1,239 @@
+# Copyright 2015: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import math
+import multiprocessing
+import time
+
+from rally.common.i18n import _
+from rally.common import log as logging
+from rally.common import utils
+from rally import consts
+from rally.plugins.common.runners import load_profile
+from rally.task import runner
+from rally.task import sla
+
+LOG = logging.getLogger(__name__)
+
+
+@runner.configure(name="adaptive_concurrency")
+class AdaptiveConcurrencyScenarioRunner(runner.ScenarioRunner):
+    """Scenario runner that finds the max load which meets the SLA.
+
+    The scenario is run in steps of "step_duration" seconds each, every
+    step with a constant concurrency. The results of every step are
+    checked against the criteria from the "sla" option of the runner (in
+    the same format as the "sla" section of the task). Concurrency starts
+    from "start_concurrency" and is multiplied by "factor" while the SLA
+    holds, then the runner bisects between the highest successful and the
+    lowest failed concurrency until they differ by "precision" or less.
+    Concurrency never exceeds "max_concurrency".
+
+    The results are tagged with the number of the step (as stages of
+    "load_profile" runner) and the highest throughput (successful
+    iterations per second) with the SLA held is reported in the log.
+
+    NOTE: the SLA of the task itself is checked against all the results,
+          including the steps that were overloaded on purpose.
+    """
+
+    CONFIG_SCHEMA = {
+        "type": "object",
+        "$schema": consts.JSON_SCHEMA,
+        "properties": {
+            "type": {
+                "type": "string"
+            },
+            "sla": {
+                "type": "object",
+                "minProperties": 1
+            },
+            "start_concurrency": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "max_concurrency": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "step_duration": {
+                "type": "number",
+                "exclusiveMinimum": True,
+                "minimum": 0
+            },
+            "factor": {
+                "type": "number",
+                "exclusiveMinimum": True,
+                "minimum": 1
+            },
+            "precision": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "max_cpu_count": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "results_batch_size": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "results_batch_interval": {
+                "type": "number",
+                "exclusiveMinimum": True,
+                "minimum": 0
+            }
+        },
+        "required": ["sla", "max_concurrency"],
+        "additionalProperties": False
+    }
+
+    def __init__(self, task, config):
+        super(AdaptiveConcurrencyScenarioRunner, self).__init__(task, config)
+        # Statistics of the finished steps, every item is a dict with
+        # "concurrency", "iterations", "throughput" and "success" keys.
+        self.steps = []
+        self._step_checker = None
+        self._step_successes = 0
+        self._step_iterations = 0
+
+    def _send_result(self, result):
+        result["stage"] = len(self.steps)
+        super(AdaptiveConcurrencyScenarioRunner, self)._send_result(result)
+        self._step_iterations += 1
+        if not result.get("error"):
+            self._step_successes += 1
+        self._step_checker.add_iteration(result)
+
+    def _run_step(self, concurrency, cls, method_name, context, args):
+        """Run the scenario with the given concurrency for one step.
+
+        :returns: True if the SLA held during the step
+        """
+        self._step_checker = sla.SLAChecker({"sla": self.config["sla"]})
+        self._step_successes = 0
+        self._step_iterations = 0
+
+        cpu_count = multiprocessing.cpu_count()
+        max_cpu_used = min(cpu_count,
+                           self.config.get("max_cpu_count", cpu_count))
+        processes_to_start = min(max_cpu_used, concurrency)
+        stages = [(self.config.get("step_duration", 10), concurrency)]
+        iteration_gen = utils.RAMInt()
+        result_queue = multiprocessing.Queue()
+        start = time.time()
+
+        def worker_args_gen():
+            counter = 0
+            while True:
+                worker_stages = [
+                    (duration, load_profile.LoadProfileScenarioRunner.
+                     _split_load(load, processes_to_start, counter,
+                                 "concurrency"))
+                    for duration, load in stages]
+                yield (self._create_result_batcher(result_queue),
+                       iteration_gen, start, worker_stages, "concurrency",
+                       None, context, cls, method_name, args, self.aborted)
+                counter += 1
+
+        process_pool = self._create_process_pool(
+            processes_to_start, load_profile._worker_process,
+            worker_args_gen())
+        self._join_processes(process_pool, result_queue)
+        duration = time.time() - start
+
+        success = bool(self._step_iterations) and all(
+            r["success"] for r in self._step_checker.results())
+        self.steps.append({
+            "concurrency": concurrency,
+            "iterations": self._step_iterations,
+            "throughput": self._step_successes / duration,
+            "success": success})
+        LOG.info(_("Task %(task)s | step %(step)d: concurrency %(conc)d, "
+                   "%(thr).2f iterations/s, SLA %(status)s")
+                 % {"task": self.task["uuid"], "step": len(self.steps),
+                    "conc": concurrency,
+                    "thr": self.steps[-1]["throughput"],
+                    "status": "passed" if success else "failed"})
+        return success
+
+    def _get_max_sustainable_step(self):
+        """Get the step with the highest throughput that met the SLA."""
+        passed = [step for step in self.steps if step["success"]]
+        if passed:
+            return max(passed, key=lambda step: step["throughput"])
+
+    def get_info(self):
+        """Get the steps and the max sustainable throughput of the run.
+
+        :returns: dict with "steps" and "max_sustainable" - the step with
+                  the highest throughput that met the SLA, None if the SLA
+                  failed at any concurrency
+        """
+        return {"steps": self.steps,
+                "max_sustainable": self._get_max_sustainable_step()}
+
+    def _run_scenario(self, cls, method_name, context, args):
+        """Runs the specified benchmark scenario with given arguments.
+
+        :param cls: The Scenario class where the scenario is implemented
+        :param method_name: Name of the method that implements the scenario
+        :param context: Benchmark context that contains users, admin & other
+                        information, that was created before benchmark started.
+        :param args: Arguments to call the scenario method with
+
+        :returns: List of results fore each single scenario iteration,
+                  where each result is a dictionary
+        """
+        sla.SLA.validate(self.config["sla"])
+        max_concurrency = self.config["max_concurrency"]
+        factor = self.config.get("factor", 2)
+        precision = self.config.get("precision", 1)
+        concurrency = min(self.config.get("start_concurrency", 1),
+                          max_concurrency)
+
+        self._log_debug_info(max_concurrency=max_concurrency, factor=factor,
+                             precision=precision,
+                             start_concurrency=concurrency)
+
+        good = 0
+        bad = None
+        while not self.aborted.is_set():
+            if self._run_step(concurrency, cls, method_name, context, args):
+                good = max(good, concurrency)
+            else:
+                bad = concurrency if bad is None else min(bad, concurrency)
+
+            if bad is None:
+                if concurrency >= max_concurrency:
+                    break
+                concurrency = min(
+                    max(int(math.ceil(concurrency * factor)),
+                        concurrency + 1),
+                    max_concurrency)
+            else:
+                if bad - good <= precision:
+                    break
+                concurrency = (good + bad) // 2
+
+        best = self._get_max_sustainable_step()
+        if best:
+            LOG.info(_("Task %(task)s | max sustainable throughput is "
+                       "%(thr).2f iterations/s at concurrency %(conc)d")
+                     % {"task": self.task["uuid"], "thr": best["throughput"],
+                        "conc": best["concurrency"]})
+        else:
+            LOG.info(_("Task %s | SLA failed at any concurrency")
+                     % self.task["uuid"])
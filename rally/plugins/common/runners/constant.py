@@ -18,26 +18,69 @@ import multiprocessing
 import threading
 import time
 
+from rally.common.i18n import _
 from rally.common import log as logging
 from rally.common import utils
 from rally import consts
+from rally import exceptions
 from rally.task import runner
-from rally.task import utils as butils
 
 LOG = logging.getLogger(__name__)
 
 
+def _worker_thread(queue, iteration_gen, times, context, cls, method_name,
+                   args, aborted, overhead):
+    """Run scenario iterations one by one until the load is generated.
+
+    Every thread of the worker process takes the next iteration number from
+    the shared iteration counter, runs the scenario once and puts the result
+    into the queue. The thread stops as soon as all iterations are taken or
+    the load generation is aborted.
+
+    :param queue: queue object to append results
+    :param iteration_gen: next iteration number generator
+    :param times: total number of scenario iterations to be run
+    :param context: scenario context object
+    :param cls: scenario class
+    :param method_name: scenario method name
+    :param args: scenario args
+    :param aborted: multiprocessing.Event that aborts load generation if
+                    the flag is set
+    :param overhead: list to append (iterations, overhead) tuple to, where
+                     overhead is the total time spent by the thread
+                     outside of scenario iterations
+    """
+    iterations = 0
+    total_overhead = 0.0
+    while not aborted.is_set():
+        started_at = time.time()
+        iteration = next(iteration_gen)
+        if iteration >= times:
+            break
+        scenario_context = runner._get_scenario_context(context)
+        result = runner._run_scenario_once(
+            (iteration, cls, method_name, scenario_context, args))
+        queue.put(result)
+
+        iterations += 1
+        total_overhead += (time.time() - started_at - result["duration"] -
+                           result["idle_duration"])
+    overhead.append((iterations, total_overhead))
+
+
 def _worker_process(queue, iteration_gen, timeout, concurrency, times, context,
                     cls, method_name, args, aborted, info):
     """Start the scenario within threads.
 
-    Spawn threads to support scenario execution for a fixed number of times.
-    This generates a constant load on the cloud under test by executing each
-    scenario iteration without pausing between iterations. Each thread runs
-    the scenario method once with passed scenario arguments and context.
-    After execution the result is appended to the queue.
+    Spawn a fixed pool of threads to support scenario execution for a fixed
+    number of times. This generates a constant load on the cloud under test
+    by executing each scenario iteration without pausing between iterations.
+    Each thread keeps running the scenario method with passed scenario
+    arguments and context while there are iterations left, so the number of
+    concurrently running iterations never exceeds the size of the pool.
+    After each execution the result is appended to the queue.
 
-    :param queue: queue object to append results
+    :param queue: runner.ResultBatcher object to append results
     :param iteration_gen: next iteration number generator
     :param timeout: operation's timeout
     :param concurrency: number of concurrently running scenario iterations
@@ -52,51 +95,187 @@ def _worker_process(queue, iteration_gen, timeout, concurrency, times, context,
     """
 
     pool = collections.deque()
-    alive_threads_in_pool = 0
-    finished_threads_in_pool = 0
+    overhead = []
+
+    runner._log_worker_info(times=times, concurrency=concurrency,
+                            timeout=timeout, cls=cls, method_name=method_name,
+                            args=args)
+
+    for i in range(min(concurrency, times)):
+        thread = threading.Thread(target=_worker_thread,
+                                  args=(queue, iteration_gen, times, context,
+                                        cls, method_name, args, aborted,
+                                        overhead))
+        thread.start()
+        pool.append(thread)
+
+    # Wait until all threads are done
+    while pool:
+        pool.popleft().join()
+    queue.flush()
+
+    iterations = sum(i for i, o in overhead)
+    if iterations:
+        LOG.debug("Worker %(counter)s finished %(iterations)d iterations. "
+                  "Runner overhead per iteration: %(overhead).6f sec." %
+                  {"counter": info["processes_counter"],
+                   "iterations": iterations,
+                   "overhead": sum(o for i, o in overhead) / iterations})
+
+
+def _async_worker_process(queue, iteration_gen, timeout, concurrency, times,
+                          context, cls, method_name, args, aborted, info):
+    """Start the scenario within green threads.
+
+    Works like _worker_process, but all the scenario iterations of the
+    process run in green threads on a single eventlet hub. Blocking I/O
+    of the scenario (sockets, select, sleep) is monkey-patched, so one
+    process is able to keep thousands of iterations in flight.
+
+    :param queue: runner.ResultBatcher object to append results
+    :param iteration_gen: next iteration number generator
+    :param timeout: operation's timeout
+    :param concurrency: number of concurrently running scenario iterations
+    :param times: total number of scenario iterations to be run
+    :param context: scenario context object
+    :param cls: scenario class
+    :param method_name: scenario method name
+    :param args: scenario args
+    :param aborted: multiprocessing.Event that aborts load generation if
+                    the flag is set
+    :param info: info about all processes count and counter of launched process
+    """
+    import eventlet
+
+    # Real threads are required by multiprocessing.Queue, which sends
+    # the results to the parent process.
+    eventlet.monkey_patch(os=False, thread=False)
+
+    overhead = []
 
     runner._log_worker_info(times=times, concurrency=concurrency,
                             timeout=timeout, cls=cls, method_name=method_name,
                             args=args)
 
-    iteration = next(iteration_gen)
-    while iteration < times and not aborted.is_set():
+    pool = eventlet.GreenPool(min(concurrency, times))
+    for i in range(min(concurrency, times)):
+        pool.spawn_n(_worker_thread, queue, iteration_gen, times, context,
+                     cls, method_name, args, aborted, overhead)
+    pool.waitall()
+    queue.flush()
+
+    iterations = sum(i for i, o in overhead)
+    if iterations:
+        LOG.debug("Worker %(counter)s finished %(iterations)d iterations. "
+                  "Runner overhead per iteration: %(overhead).6f sec." %
+                  {"counter": info["processes_counter"],
+                   "iterations": iterations,
+                   "overhead": sum(o for i, o in overhead) / iterations})
+
+
+def _run_scenario_once_with_timeout(args, timeout):
+    """Run the scenario once, but wait for the result at most timeout seconds.
+
+    The iteration is run in a daemon thread. If it doesn't finish in time,
+    a timeout error is returned as its result and the thread is returned
+    as well, so the caller can wait for it before starting a new
+    iteration; it is killed when the worker process exits.
+
+    :param args: arguments for runner._run_scenario_once()
+    :param timeout: operation's timeout, 0 means no timeout
+    :returns: tuple (result of the iteration, thread that is still
+              running the iteration or None)
+    """
+    if not timeout:
+        return runner._run_scenario_once(args), None
+
+    result = []
+    started_at = time.time()
+    thread = threading.Thread(
+        target=lambda: result.append(runner._run_scenario_once(args)))
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+    if not result:
+        timeout_result = runner.format_result_on_timeout(
+            multiprocessing.TimeoutError(
+                "Iteration %d didn't finish in %s seconds" % (args[0],
+                                                              timeout)),
+            timeout)
+        timeout_result["timestamp"] = started_at
+        return timeout_result, thread
+    return result[0], None
+
+
+def _duration_worker_thread(queue, iteration_gen, deadline, timeout, context,
+                            cls, method_name, args, aborted):
+    """Run scenario iterations one by one until the deadline.
+
+    :param queue: queue object to append results
+    :param iteration_gen: next iteration number generator
+    :param deadline: time after which no iterations are started
+    :param timeout: operation's timeout, 0 means no timeout
+    :param context: scenario context object
+    :param cls: scenario class
+    :param method_name: scenario method name
+    :param args: scenario args
+    :param aborted: multiprocessing.Event that aborts load generation if
+                    the flag is set
+    """
+    while not aborted.is_set() and time.time() < deadline:
+        iteration = next(iteration_gen)
         scenario_context = runner._get_scenario_context(context)
-        scenario_args = (iteration, cls, method_name, scenario_context, args)
-        worker_args = (queue, scenario_args)
+        result, timed_out_thread = _run_scenario_once_with_timeout(
+            (iteration, cls, method_name, scenario_context, args), timeout)
+        queue.put(result)
+        if timed_out_thread is not None:
+            # NOTE: The timed out iteration still takes the place of this
+            #       thread, otherwise more than "concurrency" iterations
+            #       would run at once. It isn't waited for after the
+            #       deadline, the worker process exits without it.
+            timed_out_thread.join(max(deadline - time.time(), 0))
+
+
+def _duration_worker_process(queue, iteration_gen, timeout, concurrency,
+                             deadline, context, cls, method_name, args,
+                             aborted, info):
+    """Start the scenario within threads until the deadline.
+
+    Works like _worker_process, but threads keep running the scenario
+    until the deadline instead of a fixed number of times. Iterations
+    that are already running at the deadline are finished (or timed out),
+    but no new ones are started.
+
+    :param queue: runner.ResultBatcher object to append results
+    :param iteration_gen: next iteration number generator
+    :param timeout: operation's timeout, 0 means no timeout
+    :param concurrency: number of concurrently running scenario iterations
+    :param deadline: time after which no iterations are started, it is
+                     the same for all processes of the runner
+    :param context: scenario context object
+    :param cls: scenario class
+    :param method_name: scenario method name
+    :param args: scenario args
+    :param aborted: multiprocessing.Event that aborts load generation if
+                    the flag is set
+    :param info: info about all processes count and counter of launched process
+    """
+    runner._log_worker_info(deadline=deadline, concurrency=concurrency,
+                            timeout=timeout, cls=cls, method_name=method_name,
+                            args=args)
 
-        thread = threading.Thread(target=runner._worker_thread,
-                                  args=worker_args)
+    pool = collections.deque()
+    for i in range(concurrency):
+        thread = threading.Thread(target=_duration_worker_thread,
+                                  args=(queue, iteration_gen, deadline,
+                                        timeout, context, cls, method_name,
+                                        args, aborted))
         thread.start()
-        pool.append((thread, time.time()))
-        alive_threads_in_pool += 1
-
-        while alive_threads_in_pool == concurrency:
-            prev_finished_threads_in_pool = finished_threads_in_pool
-            finished_threads_in_pool = 0
-            for t in pool:
-                if not t[0].isAlive():
-                    finished_threads_in_pool += 1
-
-            alive_threads_in_pool -= finished_threads_in_pool
-            alive_threads_in_pool += prev_finished_threads_in_pool
-
-            if alive_threads_in_pool < concurrency:
-                # NOTE(boris-42): cleanup pool array. This is required because
-                # in other case array length will be equal to times which
-                # is unlimited big
-                while pool and not pool[0][0].isAlive():
-                    pool.popleft()[0].join()
-                    finished_threads_in_pool -= 1
-                break
-
-            # we should wait to not create big noise with these checks
-            time.sleep(0.001)
-        iteration = next(iteration_gen)
+        pool.append(thread)
 
-    # Wait until all threads are done
     while pool:
-        pool.popleft()[0].join()
+        pool.popleft().join()
+    queue.flush()
 
 
 @runner.configure(name="constant")
@@ -135,12 +314,23 @@ class ConstantScenarioRunner(runner.ScenarioRunner):
             "max_cpu_count": {
                 "type": "integer",
                 "minimum": 1
+            },
+            "results_batch_size": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "results_batch_interval": {
+                "type": "number",
+                "exclusiveMinimum": True,
+                "minimum": 0
             }
         },
         "required": ["type"],
         "additionalProperties": False
     }
 
+    _worker_process = staticmethod(_worker_process)
+
     def _run_scenario(self, cls, method_name, context, args):
         """Runs the specified benchmark scenario with given arguments.
 
@@ -181,25 +371,55 @@ class ConstantScenarioRunner(runner.ScenarioRunner):
 
         def worker_args_gen(concurrency_overhead):
             while True:
-                yield (result_queue, iteration_gen, timeout,
+                yield (self._create_result_batcher(result_queue),
+                       iteration_gen, timeout,
                        concurrency_per_worker + (concurrency_overhead and 1),
                        times, context, cls, method_name, args, self.aborted)
                 if concurrency_overhead:
                     concurrency_overhead -= 1
 
         process_pool = self._create_process_pool(
-            processes_to_start, _worker_process,
+            processes_to_start, self._worker_process,
             worker_args_gen(concurrency_overhead))
         self._join_processes(process_pool, result_queue)
 
 
+@runner.configure(name="constant_async")
+class ConstantAsyncScenarioRunner(ConstantScenarioRunner):
+    """Creates constant load of green threads executing a scenario.
+
+    This runner works exactly as the constant runner, but each worker
+    process runs its share of concurrent scenario iterations in eventlet
+    green threads instead of OS threads. It is suitable for I/O-bound
+    scenarios that require very high concurrency (thousands of
+    iterations in flight) from a single host.
+
+    The runner requires eventlet to be installed.
+    """
+
+    _worker_process = staticmethod(_async_worker_process)
+
+    def _run_scenario(self, cls, method_name, context, args):
+        try:
+            import eventlet  # noqa
+        except ImportError:
+            raise exceptions.RallyException(
+                _("The constant_async runner requires eventlet. To install "
+                  "it run `pip install -r optional-requirements.txt`"))
+        super(ConstantAsyncScenarioRunner, self)._run_scenario(
+            cls, method_name, context, args)
+
+
 @runner.configure(name="constant_for_duration")
 class ConstantForDurationScenarioRunner(runner.ScenarioRunner):
     """Creates constant load executing a scenario for an interval of time.
 
     This runner will place a constant load on the cloud under test by
     executing each scenario iteration without pausing between iterations
-    until a specified interval of time has elapsed.
+    until a specified interval of time has elapsed. Iterations that are
+    still running at the end of the interval are finished, but no new
+    ones are started. An iteration that runs longer than "timeout"
+    seconds (600 by default) is recorded as failed with a timeout error.
 
     The concurrency parameter of the scenario config controls the
     number of concurrent scenarios which execute during a single
@@ -225,20 +445,25 @@ class ConstantForDurationScenarioRunner(runner.ScenarioRunner):
             "timeout": {
                 "type": "number",
                 "minimum": 1
+            },
+            "max_cpu_count": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "results_batch_size": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "results_batch_interval": {
+                "type": "number",
+                "exclusiveMinimum": True,
+                "minimum": 0
             }
         },
         "required": ["type", "duration"],
         "additionalProperties": False
     }
 
-    @staticmethod
-    def _iter_scenario_args(cls, method, ctx, args, aborted):
-        def _scenario_args(i):
-            if aborted.is_set():
-                raise StopIteration()
-            return (i, cls, method, runner._get_scenario_context(ctx), args)
-        return _scenario_args
-
     def _run_scenario(self, cls, method, context, args):
         """Runs the specified benchmark scenario with given arguments.
 
@@ -254,27 +479,36 @@ class ConstantForDurationScenarioRunner(runner.ScenarioRunner):
         timeout = self.config.get("timeout", 600)
         concurrency = self.config.get("concurrency", 1)
         duration = self.config.get("duration")
+        iteration_gen = utils.RAMInt()
 
-        pool = multiprocessing.Pool(concurrency)
+        cpu_count = multiprocessing.cpu_count()
+        max_cpu_used = min(cpu_count,
+                           self.config.get("max_cpu_count", cpu_count))
 
-        run_args = butils.infinite_run_args_generator(
-            self._iter_scenario_args(cls, method, context, args,
-                                     self.aborted))
-        iter_result = pool.imap(runner._run_scenario_once, run_args)
+        processes_to_start = min(max_cpu_used, concurrency)
+        concurrency_per_worker, concurrency_overhead = divmod(
+            concurrency, processes_to_start)
 
-        start = time.time()
-        while True:
-            try:
-                result = iter_result.next(timeout)
-            except multiprocessing.TimeoutError as e:
-                result = runner.format_result_on_timeout(e, timeout)
-            except StopIteration:
-                break
+        self._log_debug_info(duration=duration, concurrency=concurrency,
+                             timeout=timeout, max_cpu_used=max_cpu_used,
+                             processes_to_start=processes_to_start,
+                             concurrency_per_worker=concurrency_per_worker,
+                             concurrency_overhead=concurrency_overhead)
 
-            self._send_result(result)
+        result_queue = multiprocessing.Queue()
+        # All the processes stop starting iterations at the same time.
+        deadline = time.time() + duration
 
-            if time.time() - start > duration:
-                break
+        def worker_args_gen(concurrency_overhead):
+            while True:
+                yield (self._create_result_batcher(result_queue),
+                       iteration_gen, timeout,
+                       concurrency_per_worker + (concurrency_overhead and 1),
+                       deadline, context, cls, method, args, self.aborted)
+                if concurrency_overhead:
+                    concurrency_overhead -= 1
 
-        pool.terminate()
-        pool.join()
+        process_pool = self._create_process_pool(
+            processes_to_start, _duration_worker_process,
+            worker_args_gen(concurrency_overhead))
+        self._join_processes(process_pool, result_queue)
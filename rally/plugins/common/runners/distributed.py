@@ -0,0 +1,218 @@
+# Copyright 2015: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+
+from rally.common.i18n import _
+from rally.common import log as logging
+from rally import consts
+from rally import exceptions
+from rally.plugins.common.runners import load_profile
+from rally.task import agent as agent_lib
+from rally.task import runner
+
+LOG = logging.getLogger(__name__)
+
+
+@runner.configure(name="distributed")
+class DistributedScenarioRunner(runner.ScenarioRunner):
+    """Scenario runner that spreads the load over several agents.
+
+    The runner is a coordinator for the agents started on other hosts
+    with "rally-manage agent start". The load described by the "runner"
+    option is split between the agents: "times", "concurrency", "rps"
+    and "max_concurrency" values, as well as the load of each stage of
+    "load_profile" runner, are divided by the number of agents, and each
+    agent runs its part with the runner of the given type. Less agents are
+    used if any of the integer values is less than their number. Results
+    of all the agents are collected as results of this runner, abort is
+    propagated to all of them.
+
+    "adaptive_concurrency" runner can't be distributed, because it looks
+    for the concurrency limit by SLA of its own results.
+
+    Agents are either listed in "agents" option as "host:port" strings, or
+    all the agents that are registered in the database and active are
+    used.
+    """
+
+    NOT_SPLITTABLE = ("adaptive_concurrency", "distributed")
+
+    CONFIG_SCHEMA = {
+        "type": "object",
+        "$schema": consts.JSON_SCHEMA,
+        "properties": {
+            "type": {
+                "type": "string"
+            },
+            "runner": {
+                "type": "object",
+                "properties": {
+                    "type": {
+                        "type": "string",
+                        "not": {"enum": list(NOT_SPLITTABLE)}
+                    }
+                },
+                "required": ["type"]
+            },
+            "agents": {
+                "type": "array",
+                "items": {
+                    "type": "string"
+                },
+                "minItems": 1,
+                "uniqueItems": True
+            }
+        },
+        "required": ["runner"],
+        "additionalProperties": False
+    }
+
+    SPLIT_KEYS = ("times", "concurrency", "rps", "max_concurrency")
+
+    @classmethod
+    def _split_config(cls, config, agents_count):
+        """Split the load of the runner config between the agents.
+
+        :param config: config of the runner that generates the load
+        :param agents_count: number of available agents
+        :returns: list of runner configs, one per agent that gets some
+                  load; there may be less configs than agents if any of
+                  the integer values to split is less than their number
+        """
+        # NOTE: Every agent must get at least 1 of each integer value, so
+        #       the total load stays the same.
+        for key in cls.SPLIT_KEYS:
+            if isinstance(config.get(key), int):
+                agents_count = min(agents_count, config[key])
+
+        stages = None
+        if "stages" in config or "ramp" in config:
+            stages = load_profile.LoadProfileScenarioRunner._get_stages(
+                config)
+            load_type = config.get("load_type", "concurrency")
+            if load_type == "concurrency":
+                agents_count = min(agents_count,
+                                   max(load for duration, load in stages))
+            agents_count = max(agents_count, 1)
+
+        configs = [dict(config) for i in range(agents_count)]
+        if stages is not None:
+            for i, agent_config in enumerate(configs):
+                agent_config.pop("ramp", None)
+                agent_config["stages"] = [
+                    [duration,
+                     load_profile.LoadProfileScenarioRunner._split_load(
+                         load, agents_count, i, load_type)]
+                    for duration, load in stages]
+        for key in cls.SPLIT_KEYS:
+            if key not in config:
+                continue
+            value = config[key]
+            if isinstance(value, float):
+                for agent_config in configs:
+                    agent_config[key] = value / agents_count
+                continue
+            per_agent, overhead = divmod(value, agents_count)
+            for i, agent_config in enumerate(configs):
+                agent_config[key] = per_agent + (1 if i < overhead else 0)
+        return configs
+
+    def _get_agents(self):
+        addresses = self.config.get("agents") or agent_lib.get_active_agents()
+        if not addresses:
+            raise exceptions.RallyException(
+                _("There are no active agents to run the distributed "
+                  "runner."))
+        return addresses
+
+    def _run_scenario(self, cls, method_name, context, args):
+        """Runs the specified benchmark scenario on the agents.
+
+        :param cls: The Scenario class where the scenario is implemented
+        :param method_name: Name of the method that implements the scenario
+        :param context: Benchmark context that contains users, admin & other
+                        information, that was created before benchmark started.
+        :param args: Arguments to call the scenario method with
+
+        :returns: List of results fore each single scenario iteration,
+                  where each result is a dictionary
+        """
+        runner_config = self.config["runner"]
+        if runner_config["type"] in self.NOT_SPLITTABLE:
+            raise exceptions.InvalidConfigException(
+                _("Distributed runner can't run %s runner.")
+                % runner_config["type"])
+        runner.ScenarioRunner.validate(runner_config)
+
+        addresses = self._get_agents()
+        configs = self._split_config(runner_config, len(addresses))
+        addresses = addresses[:len(configs)]
+
+        self._log_debug_info(agents=addresses, configs=configs)
+
+        task = {"uuid": self.task["uuid"]}
+        # The task object can't be sent to agents, scenarios need only
+        # its uuid.
+        agent_context = dict(context, task=task)
+
+        agents = {}
+        try:
+            for address, config in zip(addresses, configs):
+                agents[address] = agent_lib.connect(address)
+                agents[address].start(task, config, cls, method_name,
+                                      agent_context, args)
+        except Exception:
+            for agent in agents.values():
+                agent.abort()
+            raise
+
+        self._join_agents(agents)
+
+    def _join_agents(self, agents):
+        """Collect results of the agents until all of them are finished.
+
+        :param agents: dict with proxies of the agents by their addresses
+        """
+        running = dict(agents)
+        errors = []
+        aborted = False
+        while running:
+            if self.aborted.is_set() and not aborted:
+                for agent in running.values():
+                    agent.abort()
+                aborted = True
+
+            received = False
+            for address, agent in list(running.items()):
+                # Results are taken after the check, so nothing produced
+                # by a finished agent is lost.
+                is_running = agent.is_running()
+                for result in agent.get_results():
+                    self._send_result(result)
+                    received = True
+                if not is_running:
+                    del running[address]
+                    error = agent.get_error()
+                    if error:
+                        errors.append("%s: %s" % (address, error))
+
+            if not received:
+                time.sleep(self.JOIN_TIMEOUT)
+
+        if errors:
+            raise exceptions.RallyException(
+                _("Some agents failed to run the scenario:\n%s")
+                % "\n".join(errors))
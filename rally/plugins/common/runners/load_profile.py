@@ -0,0 +1,403 @@
+# Copyright 2015: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import multiprocessing
+import threading
+import time
+
+from rally.common import utils
+from rally import consts
+from rally.task import runner
+
+
+def _worker_thread(queue, args, stage, intended_timestamp=None):
+    result = runner._run_scenario_once(args)
+    result["stage"] = stage
+    if intended_timestamp is not None:
+        result["intended_timestamp"] = intended_timestamp
+    queue.put(result)
+
+
+def _rps_worker_thread(queue, args, stage, intended_timestamp, slots):
+    try:
+        _worker_thread(queue, args, stage, intended_timestamp)
+    finally:
+        slots.release()
+
+
+def _concurrency_worker_thread(queue, iteration_gen, state, condition,
+                               context, cls, method_name, args):
+    """Run iterations while the current stage allows one more of them.
+
+    :param state: dict with "stage", "limit", "active" and "done" keys
+                  shared by all threads of the process
+    :param condition: threading.Condition that guards state
+    """
+    while True:
+        with condition:
+            while not state["done"] and state["active"] >= state["limit"]:
+                condition.wait()
+            if state["done"]:
+                return
+            state["active"] += 1
+            stage = state["stage"]
+
+        try:
+            scenario_context = runner._get_scenario_context(context)
+            scenario_args = (next(iteration_gen), cls, method_name,
+                             scenario_context, args)
+            _worker_thread(queue, scenario_args, stage)
+        finally:
+            with condition:
+                state["active"] -= 1
+                condition.notify()
+
+
+def _run_concurrency_stages(queue, iteration_gen, stages, max_concurrent,
+                            context, cls, method_name, args, aborted):
+    state = {"stage": None, "limit": 0, "active": 0, "done": False}
+    condition = threading.Condition()
+
+    pool = []
+    for i in range(max(value for start, end, value in stages)):
+        thread = threading.Thread(target=_concurrency_worker_thread,
+                                  args=(queue, iteration_gen, state,
+                                        condition, context, cls,
+                                        method_name, args))
+        thread.start()
+        pool.append(thread)
+
+    for stage, (stage_start, stage_end, concurrency) in enumerate(stages):
+        delay = stage_start - time.time()
+        if delay > 0:
+            aborted.wait(delay)
+        if aborted.is_set():
+            break
+
+        # Threads that are still running iterations of the previous stage
+        # are not interrupted, they just don't start new ones until the
+        # number of active threads fits into the new limit.
+        with condition:
+            state["stage"] = stage
+            state["limit"] = concurrency
+            condition.notify_all()
+
+        delay = stage_end - time.time()
+        if delay > 0:
+            aborted.wait(delay)
+
+    with condition:
+        state["done"] = True
+        condition.notify_all()
+
+    for thread in pool:
+        thread.join()
+
+
+def _run_rps_stages(queue, iteration_gen, stages, max_concurrent, context,
+                    cls, method_name, args, aborted, offset):
+    # NOTE: Like in the open loop mode of the rps runner, a thread takes a
+    #       slot when it is started and releases it when it finishes. Without
+    #       max_concurrent limit the slots are only released, so finished
+    #       threads are counted at the end without keeping all of them.
+    if max_concurrent:
+        slots = threading.BoundedSemaphore(max_concurrent)
+    else:
+        slots = threading.Semaphore(0)
+    started = 0
+
+    for stage, (stage_start, stage_end, rps) in enumerate(stages):
+        if aborted.is_set():
+            break
+        if not rps:
+            delay = stage_end - time.time()
+            if delay > 0:
+                aborted.wait(delay)
+            continue
+
+        interval = 1.0 / rps
+        i = 0
+        while True:
+            intended_timestamp = stage_start + (i + offset) * interval
+            if intended_timestamp >= stage_end:
+                break
+            delay = intended_timestamp - time.time()
+            if delay > 0:
+                aborted.wait(delay)
+            if aborted.is_set():
+                break
+
+            if max_concurrent:
+                slots.acquire()
+            scenario_context = runner._get_scenario_context(context)
+            scenario_args = (next(iteration_gen), cls, method_name,
+                             scenario_context, args)
+            thread = threading.Thread(target=_rps_worker_thread,
+                                      args=(queue, scenario_args, stage,
+                                            intended_timestamp, slots))
+            thread.start()
+            started += 1
+            i += 1
+
+    # All the slots are free when all the threads are finished
+    for i in range(max_concurrent or started):
+        slots.acquire()
+
+
+def _worker_process(queue, iteration_gen, start, stages, load_type,
+                    max_concurrent, context, cls, method_name, args,
+                    aborted, info):
+    """Start scenario within threads following the load profile.
+
+    Stages are run one after another, each one for its own duration. In
+    "concurrency" mode a pool of threads is started and the number of
+    threads allowed to run iterations is changed at every stage. In "rps"
+    mode iterations are started according to a fixed schedule, like in
+    the open loop mode of the rps runner.
+
+    Each result is tagged with the number of the stage when its iteration
+    was started.
+
+    :param queue: runner.ResultBatcher object to append results
+    :param iteration_gen: next iteration number generator
+    :param start: time when the first stage starts, it is the same for all
+                  processes of the runner
+    :param stages: list of (duration, load) pairs, the load is the share of
+                   this process in the concurrency or rps of the stage
+    :param load_type: either "concurrency" or "rps"
+    :param max_concurrent: maximum worker concurrency in "rps" mode,
+                           None means no limit
+    :param context: scenario context object
+    :param cls: scenario class
+    :param method_name: scenario method name
+    :param args: scenario args
+    :param aborted: multiprocessing.Event that aborts load generation if
+                    the flag is set
+    :param info: info about all processes count and counter of runned process
+    """
+    runner._log_worker_info(start=start, stages=stages, load_type=load_type,
+                            max_concurrent=max_concurrent, cls=cls,
+                            method_name=method_name, args=args)
+
+    timeline = []
+    stage_start = start
+    for duration, value in stages:
+        timeline.append((stage_start, stage_start + duration, value))
+        stage_start += duration
+
+    if load_type == "rps":
+        # Shift the schedules of the processes against each other, so the
+        # iterations are spread evenly within the interval.
+        offset = float(info["processes_counter"]) / info["processes_to_start"]
+        _run_rps_stages(queue, iteration_gen, timeline, max_concurrent,
+                        context, cls, method_name, args, aborted, offset)
+    else:
+        _run_concurrency_stages(queue, iteration_gen, timeline,
+                                max_concurrent, context, cls, method_name,
+                                args, aborted)
+    queue.flush()
+
+
+@runner.configure(name="load_profile")
+class LoadProfileScenarioRunner(runner.ScenarioRunner):
+    """Scenario runner that changes the load during the run.
+
+    The load is described either by a list of stages, each one is a pair
+    of the stage duration in seconds and the load applied during the
+    stage, or by a linear ramp from "start" to "end" load within
+    "duration" seconds split into "steps" equal stages.
+
+    The load is either the number of concurrently running iterations
+    ("load_type": "concurrency", default) or the number of iterations
+    started per second ("load_type": "rps"). In the latter case each
+    iteration keeps its scheduled start time, so the schedule lag caused
+    by max_concurrency limit is shown in the results.
+
+    Every result is tagged with the number of the stage, so statistics can
+    be calculated for each stage separately.
+    """
+
+    CONFIG_SCHEMA = {
+        "type": "object",
+        "$schema": consts.JSON_SCHEMA,
+        "properties": {
+            "type": {
+                "type": "string"
+            },
+            "load_type": {
+                "enum": ["concurrency", "rps"]
+            },
+            "stages": {
+                "type": "array",
+                "minItems": 1,
+                "items": {
+                    "type": "array",
+                    "items": [
+                        {
+                            "type": "number",
+                            "exclusiveMinimum": True,
+                            "minimum": 0
+                        },
+                        {
+                            "type": "number",
+                            "minimum": 0
+                        }
+                    ],
+                    "minItems": 2,
+                    "maxItems": 2
+                }
+            },
+            "ramp": {
+                "type": "object",
+                "properties": {
+                    "start": {
+                        "type": "number",
+                        "minimum": 0
+                    },
+                    "end": {
+                        "type": "number",
+                        "minimum": 0
+                    },
+                    "duration": {
+                        "type": "number",
+                        "exclusiveMinimum": True,
+                        "minimum": 0
+                    },
+                    "steps": {
+                        "type": "integer",
+                        "minimum": 1
+                    }
+                },
+                "required": ["start", "end", "duration"],
+                "additionalProperties": False
+            },
+            "max_concurrency": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "max_cpu_count": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "results_batch_size": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "results_batch_interval": {
+                "type": "number",
+                "exclusiveMinimum": True,
+                "minimum": 0
+            }
+        },
+        "oneOf": [
+            {"required": ["stages"]},
+            {"required": ["ramp"]}
+        ],
+        "additionalProperties": False
+    }
+
+    @staticmethod
+    def _get_stages(config):
+        """Convert the load profile from the config to the list of stages.
+
+        :param config: runner config
+        :returns: list of (duration, load) pairs
+        """
+        if "stages" in config:
+            stages = [(duration, load) for duration, load in config["stages"]]
+        else:
+            ramp = config["ramp"]
+            steps = ramp.get("steps", 10)
+            duration = float(ramp["duration"]) / steps
+            if steps == 1:
+                stages = [(duration, ramp["end"])]
+            else:
+                step = float(ramp["end"] - ramp["start"]) / (steps - 1)
+                stages = [(duration, ramp["start"] + step * i)
+                          for i in range(steps)]
+
+        if config.get("load_type", "concurrency") == "concurrency":
+            stages = [(duration, int(round(load)))
+                      for duration, load in stages]
+        return stages
+
+    @staticmethod
+    def _split_load(load, processes, counter, load_type):
+        """Get the share of the process in the load of a stage."""
+        if load_type == "rps":
+            return float(load) / processes
+        load_per_process, overhead = divmod(load, processes)
+        return load_per_process + (1 if counter < overhead else 0)
+
+    def _run_scenario(self, cls, method_name, context, args):
+        """Runs the specified benchmark scenario with given arguments.
+
+        :param cls: The Scenario class where the scenario is implemented
+        :param method_name: Name of the method that implements the scenario
+        :param context: Benchmark context that contains users, admin & other
+                        information, that was created before benchmark started.
+        :param args: Arguments to call the scenario method with
+
+        :returns: List of results fore each single scenario iteration,
+                  where each result is a dictionary
+        """
+        load_type = self.config.get("load_type", "concurrency")
+        stages = self._get_stages(self.config)
+        max_concurrency = self.config.get("max_concurrency")
+        iteration_gen = utils.RAMInt()
+
+        cpu_count = multiprocessing.cpu_count()
+        max_cpu_used = min(cpu_count,
+                           self.config.get("max_cpu_count", cpu_count))
+
+        if load_type == "rps":
+            processes_to_start = min(max_cpu_used,
+                                     max_concurrency or max_cpu_used)
+        else:
+            max_load = max(load for duration, load in stages)
+            processes_to_start = min(max_cpu_used, max(max_load, 1))
+
+        self._log_debug_info(load_type=load_type, stages=stages,
+                             max_concurrency=max_concurrency,
+                             max_cpu_used=max_cpu_used,
+                             processes_to_start=processes_to_start)
+
+        result_queue = multiprocessing.Queue()
+        # All the processes share the same timeline, so the stages are
+        # switched at the same time in all of them.
+        start = time.time()
+
+        def worker_args_gen():
+            counter = 0
+            while True:
+                worker_stages = [
+                    (duration, self._split_load(load, processes_to_start,
+                                                counter, load_type))
+                    for duration, load in stages]
+                if max_concurrency:
+                    max_concurrent = self._split_load(
+                        max_concurrency, processes_to_start, counter,
+                        "concurrency")
+                else:
+                    max_concurrent = None
+                yield (self._create_result_batcher(result_queue),
+                       iteration_gen, start, worker_stages, load_type,
+                       max_concurrent, context, cls, method_name, args,
+                       self.aborted)
+                counter += 1
+
+        process_pool = self._create_process_pool(
+            processes_to_start, _worker_process, worker_args_gen())
+        self._join_processes(process_pool, result_queue)
@@ -35,7 +35,7 @@ def _worker_process(queue, iteration_gen, timeout, rps, times,
     result to queue. A maximum of max_concurrent threads will be ran
     concurrently.
 
-    :param queue: queue object to append results
+    :param queue: runner.ResultBatcher object to append results
     :param iteration_gen: next iteration number generator
     :param timeout: operation's timeout
     :param rps: number of scenario iterations to be run per one second
@@ -91,6 +91,79 @@ def _worker_process(queue, iteration_gen, timeout, rps, times,
     while pool:
         thr = pool.popleft()
         thr.join()
+    queue.flush()
+
+
+def _open_loop_worker_thread(queue, args, intended_timestamp, slots):
+    try:
+        result = runner._run_scenario_once(args)
+        result["intended_timestamp"] = intended_timestamp
+        queue.put(result)
+    finally:
+        slots.release()
+
+
+def _open_loop_worker_process(queue, iteration_gen, timeout, rps, times,
+                              max_concurrent, context, cls, method_name,
+                              args, aborted, info):
+    """Start scenario within threads according to a fixed schedule.
+
+    Unlike _worker_process, the start time of each iteration is
+    calculated in advance (one iteration every 1 / rps seconds), and the
+    worker neither speeds up nor slows down to catch up with the
+    requested rate. If the iteration can't be started in time because
+    max_concurrent threads are still running, it is started as soon as
+    possible and its intended start time is saved in the result as
+    "intended_timestamp", so the delay caused by the cloud under test
+    is not hidden from the results.
+
+    :param queue: runner.ResultBatcher object to append results
+    :param iteration_gen: next iteration number generator
+    :param timeout: operation's timeout
+    :param rps: number of scenario iterations to be run per one second
+    :param times: total number of scenario iterations to be run
+    :param max_concurrent: maximum worker concurrency
+    :param context: scenario context object
+    :param cls: scenario class
+    :param method_name: scenario method name
+    :param args: scenario args
+    :param aborted: multiprocessing.Event that aborts load generation if
+                    the flag is set
+    :param info: info about all processes count and counter of runned process
+    """
+
+    # NOTE: A thread takes a slot when it is started and releases it when
+    #       it finishes, so the next iteration waits for whichever thread
+    #       finishes first rather than for the oldest one.
+    slots = threading.BoundedSemaphore(max_concurrent)
+    interval = 1.0 / rps
+    start = time.time() + (
+        (interval * info["processes_counter"]) / info["processes_to_start"])
+
+    runner._log_worker_info(times=times, rps=rps, timeout=timeout,
+                            cls=cls, method_name=method_name, args=args)
+
+    for i in range(times):
+        intended_timestamp = start + i * interval
+        delay = intended_timestamp - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        if aborted.is_set():
+            break
+
+        slots.acquire()
+        scenario_context = runner._get_scenario_context(context)
+        scenario_args = (next(iteration_gen), cls, method_name,
+                         scenario_context, args)
+        thread = threading.Thread(target=_open_loop_worker_thread,
+                                  args=(queue, scenario_args,
+                                        intended_timestamp, slots))
+        thread.start()
+
+    # All the slots are free when all the threads are finished
+    for i in range(max_concurrent):
+        slots.acquire()
+    queue.flush()
 
 
 @runner.configure(name="rps")
@@ -104,6 +177,11 @@ class RPSScenarioRunner(runner.ScenarioRunner):
     An example of a rps scenario is booting 1 VM per second. This
     execution type is thus very helpful in understanding the maximal load that
     a certain cloud can handle.
+
+    With "open_loop" option each iteration is started at its own
+    scheduled time regardless of the previous ones. Iterations delayed
+    by max_concurrency limit keep their intended start time, so the
+    reported latency can be corrected for the schedule lag.
     """
 
     CONFIG_SCHEMA = {
@@ -132,6 +210,18 @@ class RPSScenarioRunner(runner.ScenarioRunner):
             "max_cpu_count": {
                 "type": "integer",
                 "minimum": 1
+            },
+            "results_batch_size": {
+                "type": "integer",
+                "minimum": 1
+            },
+            "results_batch_interval": {
+                "type": "number",
+                "exclusiveMinimum": True,
+                "minimum": 0
+            },
+            "open_loop": {
+                "type": "boolean"
             }
         },
         "additionalProperties": False
@@ -196,7 +286,8 @@ class RPSScenarioRunner(runner.ScenarioRunner):
                                          to workers
             """
             while True:
-                yield (result_queue, iteration_gen, timeout, rps_per_worker,
+                yield (self._create_result_batcher(result_queue),
+                       iteration_gen, timeout, rps_per_worker,
                        times_per_worker + (times_overhead and 1),
                        concurrency_per_worker + (concurrency_overhead and 1),
                        context, cls, method_name, args, self.aborted)
@@ -205,7 +296,12 @@ class RPSScenarioRunner(runner.ScenarioRunner):
                 if concurrency_overhead:
                     concurrency_overhead -= 1
 
+        if self.config.get("open_loop", False):
+            worker_process = _open_loop_worker_process
+        else:
+            worker_process = _worker_process
+
         process_pool = self._create_process_pool(
-            processes_to_start, _worker_process,
+            processes_to_start, worker_process,
             worker_args_gen(times_overhead, concurrency_overhead))
         self._join_processes(process_pool, result_queue)
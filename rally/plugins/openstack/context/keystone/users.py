@@ -154,9 +154,15 @@ class UserGenerator(context.Context):
 
         tenants = collections.deque()
 
+        # NOTE: Subtasks of the task which are run in parallel create their
+        #       own tenants, the names of the tenants must differ.
+        owner_id = self.task["uuid"]
+        if self.context.get("subtask_id") is not None:
+            owner_id = "%s_%s" % (owner_id, self.context["subtask_id"])
+
         def publish(queue):
             for i in range(self.config["tenants"]):
-                args = (self.config["project_domain"], self.task["uuid"], i)
+                args = (self.config["project_domain"], owner_id, i)
                 queue.append(args)
 
         def consume(cache, args):
@@ -0,0 +1,261 @@
+# Copyright 2015: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Agents that generate load on behalf of the distributed runner.
+
+An agent is a service that listens for the coordinator (the "distributed"
+runner) on a TCP address and runs the part of the load assigned to it
+with an ordinary scenario runner. Agents are registered in the workers
+table with "host:port" as their hostname and periodically mark
+themselves as active, so the coordinator can find them.
+"""
+
+import datetime
+import socket
+import threading
+import time
+
+from multiprocessing import managers
+from oslo_config import cfg
+from oslo_utils import timeutils
+
+from rally.common import db
+from rally.common.i18n import _
+from rally.common import log as logging
+from rally import exceptions
+from rally.task import runner
+
+
+LOG = logging.getLogger(__name__)
+
+
+AGENT_OPTS = [
+    cfg.StrOpt("agent_authkey",
+               secret=True,
+               help="Secret key shared by the agents of the distributed "
+                    "runner and the coordinator. It is used to "
+                    "authenticate the connections to the agents."),
+    cfg.IntOpt("agent_heartbeat_interval",
+               default=10,
+               help="How often (in seconds) agents mark themselves as "
+                    "active in the database."),
+    cfg.IntOpt("agent_down_time",
+               default=60,
+               help="Agents that haven't marked themselves as active for "
+                    "this number of seconds are not used by the "
+                    "distributed runner."),
+    cfg.IntOpt("agent_coordinator_timeout",
+               default=60,
+               min=1,
+               help="Agents abort the scenario and drop its results if "
+                    "the coordinator hasn't taken the results for this "
+                    "number of seconds, e.g. because it is disconnected."),
+]
+
+CONF = cfg.CONF
+benchmark_group = cfg.OptGroup(name="benchmark", title="benchmark options")
+CONF.register_opts(AGENT_OPTS, group=benchmark_group)
+
+
+def get_authkey():
+    """Get the key that authenticates connections to agents."""
+    if not CONF.benchmark.agent_authkey:
+        raise exceptions.RallyException(
+            _("agent_authkey option of benchmark group should be set to "
+              "use agents of the distributed runner."))
+    return CONF.benchmark.agent_authkey.encode("utf-8")
+
+
+def get_active_agents():
+    """Get addresses of the agents that are considered alive.
+
+    :returns: list of "host:port" strings
+    """
+    updated_since = timeutils.utcnow() - datetime.timedelta(
+        seconds=CONF.benchmark.agent_down_time)
+    return [worker["hostname"]
+            for worker in db.get_workers(updated_since=updated_since)]
+
+
+def parse_address(address):
+    """Convert "host:port" string to (host, port) tuple."""
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit():
+        raise exceptions.InvalidArgumentsException(
+            _("Agent address should look like host:port, got %s")
+            % address)
+    return host, int(port)
+
+
+class AgentService(object):
+    """The object that the coordinator works with through the network.
+
+    Only one part of the load can be run by the agent at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runner = None
+        self._thread = None
+        self._error = None
+        self._polled_at = None
+
+    def start(self, task, config, cls, method_name, context, args):
+        """Start running the scenario with the given runner config.
+
+        :param task: dict with "uuid" of the task
+        :param config: config of the runner that generates the load
+        :param cls: The Scenario class where the scenario is implemented
+        :param method_name: Name of the method that implements the scenario
+        :param context: Benchmark context
+        :param args: Arguments to call the scenario method with
+        """
+        with self._lock:
+            if self.is_running():
+                raise exceptions.RallyException(
+                    _("Agent is busy with another scenario."))
+            runner_cls = runner.ScenarioRunner.get(config["type"])
+            self._runner = runner_cls(task, config)
+            self._error = None
+            self._polled_at = time.time()
+            self._thread = threading.Thread(
+                target=self._run, args=(cls, method_name, context, args))
+            self._thread.start()
+            watchdog = threading.Thread(
+                target=self._watch, args=(self._runner, self._thread))
+            watchdog.daemon = True
+            watchdog.start()
+
+    def _run(self, cls, method_name, context, args):
+        try:
+            self._runner._run_scenario(cls, method_name, context, args)
+        except Exception as e:
+            LOG.exception(e)
+            self._error = "%s: %s" % (type(e).__name__, e)
+
+    def _watch(self, runner_obj, thread):
+        """Abandon the run if the coordinator stops taking the results.
+
+        The result queue of the runner is bounded, so without the
+        coordinator the runner would wait for a free place forever.
+        """
+        abandoned = False
+        while thread.is_alive():
+            if abandoned:
+                queue = runner_obj.result_queue
+                while queue:
+                    queue.popleft()
+            elif (time.time() - self._polled_at >
+                    CONF.benchmark.agent_coordinator_timeout):
+                LOG.warning(_("Coordinator hasn't taken the results for %s "
+                              "seconds, the scenario is aborted.")
+                            % CONF.benchmark.agent_coordinator_timeout)
+                abandoned = True
+                runner_obj.abort()
+                runner_obj.result_queue.close()
+                continue
+            thread.join(1)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_error(self):
+        """Get the error of the last run, None if it was successful."""
+        return self._error
+
+    def get_results(self):
+        """Take all the results that are produced by the runner so far."""
+        results = []
+        self._polled_at = time.time()
+        if self._runner is not None:
+            queue = self._runner.result_queue
+            while queue:
+                results.append(dict(queue.popleft()))
+        return results
+
+    def abort(self):
+        if self._runner is not None:
+            self._runner.abort()
+
+
+class AgentManager(managers.BaseManager):
+    """Manager that connects the coordinator to an agent."""
+
+
+AgentManager.register("agent")
+
+
+def connect(address):
+    """Connect to the agent.
+
+    :param address: "host:port" of the agent
+    :returns: proxy of the AgentService object of the agent
+    """
+    manager = AgentManager(address=parse_address(address),
+                           authkey=get_authkey())
+    manager.connect()
+    return manager.agent()
+
+
+WILDCARD_HOSTS = ("", "0.0.0.0", "::")
+
+
+class Agent(object):
+    """Service that runs the parts of the load sent by the coordinator."""
+
+    def __init__(self, host, port, name=None):
+        """Create the agent.
+
+        :param host: address to listen on
+        :param port: port to listen on, 0 means any free port
+        :param name: host name to register, the coordinator connects to
+                     it; host is used by default, or the name of the
+                     machine if the agent listens on all the interfaces
+        """
+        self.service = AgentService()
+        self._stopped = threading.Event()
+
+        class AgentServerManager(AgentManager):
+            pass
+
+        AgentServerManager.register("agent", callable=lambda: self.service)
+        self._server = AgentServerManager(
+            address=(host, port), authkey=get_authkey()).get_server()
+        if not name:
+            # The coordinator can't connect to the wildcard address
+            name = socket.gethostname() if host in WILDCARD_HOSTS else host
+        self.address = "%s:%d" % (name, self._server.address[1])
+
+    def _heartbeat(self):
+        while True:
+            self._stopped.wait(CONF.benchmark.agent_heartbeat_interval)
+            if self._stopped.is_set():
+                break
+            db.update_worker(self.address)
+
+    def serve(self):
+        """Register the agent and serve the coordinator until stopped."""
+        db.register_worker({"hostname": self.address})
+        LOG.info(_("Agent %s is started.") % self.address)
+        heartbeat = threading.Thread(target=self._heartbeat)
+        heartbeat.daemon = True
+        heartbeat.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stopped.set()
+            self.service.abort()
+            db.unregister_worker(self.address)
+            LOG.info(_("Agent %s is stopped.") % self.address)
@@ -13,12 +13,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import json
 import threading
 import time
 import traceback
 
 import jsonschema
+from oslo_config import cfg
 import six
 
 from rally.common.i18n import _
@@ -31,6 +33,7 @@ from rally import osclients
 from rally.plugins.openstack.context.keystone import existing_users
 from rally.plugins.openstack.context.keystone import users as users_ctx
 from rally.task import context
+from rally.task.processing import utils as putils
 from rally.task import runner
 from rally.task.scenarios import base as base_scenario
 from rally.task import sla
@@ -39,6 +42,29 @@ from rally.task import sla
 LOG = logging.getLogger(__name__)
 
 
+ENGINE_OPTS = [
+    cfg.IntOpt("results_chunk_size",
+               default=1000,
+               help="Raw results of scenario iterations are saved to the "
+                    "database in chunks of up to this number of results "
+                    "while the scenario is running."),
+    cfg.FloatOpt("results_chunk_interval",
+                 default=10.0,
+                 help="Maximum number of seconds raw results of scenario "
+                      "iterations are kept in memory before they are "
+                      "saved to the database."),
+    cfg.IntOpt("max_parallel_subtasks",
+               default=4,
+               min=1,
+               help="Max number of subtasks marked with \"parallel\": true "
+                    "in the task config which are run at the same time."),
+]
+
+CONF = cfg.CONF
+benchmark_group = cfg.OptGroup(name="benchmark", title="benchmark options")
+CONF.register_opts(ENGINE_OPTS, group=benchmark_group)
+
+
 CONFIG_SCHEMA = {
     "type": "object",
     "$schema": consts.JSON_SCHEMA,
@@ -64,6 +90,9 @@ CONFIG_SCHEMA = {
                     "sla": {
                         "type": "object"
                     },
+                    "parallel": {
+                        "type": "boolean"
+                    },
                 },
                 "additionalProperties": False
             }
@@ -94,8 +123,12 @@ class BenchmarkEngine(object):
             engine.run()        # to run config
     """
 
+    # Max time (in seconds) the consumer waits for a result before checking
+    # whether the runner is finished
+    RESULT_WAIT_TIMEOUT = 0.1
+
     def __init__(self, config, task, admin=None, users=None,
-                 abort_on_sla_failure=False):
+                 abort_on_sla_failure=False, max_parallel_subtasks=None):
         """BenchmarkEngine constructor.
 
         :param config: The configuration with specified benchmark scenarios
@@ -104,12 +137,27 @@ class BenchmarkEngine(object):
         :param users: List of dicts with user credentials
         :param abort_on_sla_failure: True if the execution should be stopped
                                      when some SLA check fails
+        :param max_parallel_subtasks: max number of subtasks marked as
+                                      "parallel" which are run at once,
+                                      max_parallel_subtasks option of the
+                                      "benchmark" section by default
         """
         self.config = config
         self.task = task
         self.admin = admin and objects.Endpoint(**admin) or None
         self.existing_users = users or []
         self.abort_on_sla_failure = abort_on_sla_failure
+        if max_parallel_subtasks is None:
+            max_parallel_subtasks = CONF.benchmark.max_parallel_subtasks
+        elif max_parallel_subtasks < 1:
+            raise exceptions.InvalidArgumentsException(
+                _("max_parallel_subtasks should be positive, got %s")
+                % max_parallel_subtasks)
+        self.max_parallel_subtasks = max_parallel_subtasks
+        # Results of the finished scenarios which are not saved yet
+        self.results = []
+        self._results_lock = threading.Lock()
+        self._save_lock = threading.Lock()
 
     @rutils.log_task_wrapper(LOG.info, _("Task validation check cloud."))
     def _check_cloud(self):
@@ -205,7 +253,7 @@ class BenchmarkEngine(object):
         cfg = config.get("runner", {"type": "serial"})
         return runner.ScenarioRunner.get(cfg["type"])(self.task, cfg)
 
-    def _prepare_context(self, ctx, name, endpoint):
+    def _prepare_context(self, ctx, name, endpoint, subtask_id=None):
         scenario_context = base_scenario.Scenario.meta(name, "context")
         if self.existing_users and "users" not in ctx:
             scenario_context.setdefault("existing_users", self.existing_users)
@@ -219,6 +267,10 @@ class BenchmarkEngine(object):
             "scenario_name": name,
             "config": scenario_context
         }
+        if subtask_id is not None:
+            # NOTE: Contexts of the subtasks run in parallel must not create
+            #       resources with the same names, e.g. the tenants.
+            context_obj["subtask_id"] = subtask_id
 
         return context_obj
 
@@ -232,43 +284,126 @@ class BenchmarkEngine(object):
                   corresponding benchmark test launches
         """
         self.task.update_status(consts.TaskStatus.RUNNING)
+        self._run_scenarios()
+        self.task.update_status(consts.TaskStatus.FINISHED)
+
+    def _run_scenarios(self):
+        # Subtasks marked as "parallel" which go one after another in the
+        # config are run together, any other subtask is run alone.
+        parallel = []
         for name in self.config:
             for n, kw in enumerate(self.config[name]):
                 key = {"name": name, "pos": n, "kw": kw}
-                LOG.info("Running benchmark with key: \n%s"
-                         % json.dumps(key, indent=2))
-                runner_obj = self._get_runner(kw)
-                is_done = threading.Event()
-                unexpected_failure = {}
-                consumer = threading.Thread(
-                    target=self.consume_results,
-                    args=(key, self.task, is_done, unexpected_failure,
-                          runner_obj))
-                consumer.start()
-                context_obj = self._prepare_context(kw.get("context", {}),
-                                                    name, self.admin)
-                self.duration = 0
-                self.full_duration = 0
+                if kw.get("parallel"):
+                    parallel.append(key)
+                    continue
+                self._run_parallel(parallel)
+                parallel = []
+                self._run_subtask(key)
+        self._run_parallel(parallel)
+
+    def _run_parallel(self, keys):
+        """Run the subtasks at the same time.
+
+        Up to max_parallel_subtasks subtasks are run at once, each with its
+        own runner, context and consumer of the results. Every subtask gets
+        "subtask_id" in the context (its number in keys), so the contexts
+        can tell their resources apart. If a subtask fails, the subtasks
+        which are not started yet are skipped.
+
+        Worker processes of the runners are forked while the threads of the
+        other subtasks are running, so they are forked one at a time with
+        the log handlers locked (see ScenarioRunner._create_process_pool()).
+        Plugins should not hold other locks shared by threads while the
+        scenario runs.
+
+        :param keys: keys of the subtasks
+        """
+        if len(keys) < 2:
+            for key in keys:
+                self._run_subtask(key)
+            return
+
+        LOG.info("Running %(count)d benchmarks in parallel, up to %(max)d "
+                 "at once" % {"count": len(keys),
+                              "max": self.max_parallel_subtasks})
+        keys = collections.deque(enumerate(keys))
+        errors = []
+
+        def worker():
+            while not errors:
                 try:
-                    with rutils.Timer() as timer:
-                        with context.ContextManager(context_obj):
-                            self.duration = runner_obj.run(
-                                name, context_obj, kw.get("args", {}))
+                    subtask_id, key = keys.popleft()
+                except IndexError:
+                    return
+                try:
+                    self._run_subtask(key, subtask_id)
                 except Exception as e:
                     LOG.exception(e)
-                    unexpected_failure["exc"] = e
-                finally:
-                    self.full_duration = timer.duration()
-                    is_done.set()
-                    consumer.join()
-        self.task.update_status(consts.TaskStatus.FINISHED)
+                    errors.append(e)
+
+        workers = [threading.Thread(target=worker)
+                   for i in range(min(self.max_parallel_subtasks, len(keys)))]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def _run_subtask(self, key, subtask_id=None):
+        name, kw = key["name"], key["kw"]
+        LOG.info("Running benchmark with key: \n%s"
+                 % json.dumps(key, indent=2))
+        runner_obj = self._get_runner(kw)
+        is_done = threading.Event()
+        unexpected_failure = {}
+        durations = {"load_duration": 0, "full_duration": 0}
+        consumer = threading.Thread(
+            target=self.consume_results,
+            args=(key, self.task, is_done, unexpected_failure, runner_obj,
+                  durations))
+        consumer.start()
+        context_obj = self._prepare_context(kw.get("context", {}),
+                                            name, self.admin, subtask_id)
+        try:
+            with rutils.Timer() as timer:
+                with context.ContextManager(context_obj):
+                    durations["load_duration"] = runner_obj.run(
+                        name, context_obj, kw.get("args", {}))
+        except Exception as e:
+            LOG.exception(e)
+            unexpected_failure["exc"] = e
+        finally:
+            durations["full_duration"] = timer.duration()
+            is_done.set()
+            consumer.join()
+
+    def _save_results(self):
+        """Save the results of the finished scenarios.
+
+        A result is saved as soon as its scenario finishes. Results of
+        parallel scenarios which finish while another one is being saved
+        are saved together in one transaction.
+        """
+        with self._save_lock:
+            with self._results_lock:
+                results, self.results = self.results, []
+            if len(results) == 1:
+                self.task.append_results(results[0]["key"],
+                                         results[0]["data"])
+            elif results:
+                self.task.extend_results(results)
 
     def consume_results(self, key, task, is_done, unexpected_failure,
-                        runner_obj):
+                        runner_obj, durations):
         """Consume scenario runner results from queue and send them to db.
 
         Has to be run from different thread simultaneously with the runner.run
-        method.
+        method. Raw results are saved in chunks while the scenario is
+        running, so they aren't accumulated in memory. The summary of the
+        scenario (SLA and statistics of durations, computed on the fly) is
+        saved as soon as the runner finishes.
 
         :param key: Scenario identifier
         :param task: Running task
@@ -277,26 +412,72 @@ class BenchmarkEngine(object):
         :param unexpected_failure: Dictionary object with information about
                                    unexpected exception.
         :param runner_obj: ScenarioRunner object that was used to run a task
+        :param durations: Dictionary object where the runner thread puts
+                          "load_duration" and "full_duration" of the run
+                          before is_done is set.
         """
-        results = []
+        chunk = []
+        chunk_started_at = time.time()
+        saved_chunks = 0
         sla_checker = sla.SLAChecker(key["kw"])
-        while True:
-            if runner_obj.result_queue:
-                result = runner_obj.result_queue.popleft()
-                results.append(result)
-                success = sla_checker.add_iteration(result)
-                if self.abort_on_sla_failure and not success:
-                    sla_checker.set_aborted()
-                    runner_obj.abort()
-            elif is_done.isSet():
-                break
-            else:
-                time.sleep(0.1)
-
-            if unexpected_failure.get("exc"):
-                sla_checker.set_unexpected_failure(unexpected_failure["exc"])
-
-        task.append_results(key, {"raw": results,
-                                  "load_duration": self.duration,
-                                  "full_duration": self.full_duration,
-                                  "sla": sla_checker.results()})
+        results_summary = putils.ResultsSummary()
+        queue = runner_obj.result_queue
+        try:
+            while True:
+                # Wakes up as soon as the runner sends a result
+                result = queue.get(timeout=self.RESULT_WAIT_TIMEOUT)
+                if result is not None:
+                    if not chunk:
+                        chunk_started_at = time.time()
+                    chunk.append(result)
+                    results_summary.add(result)
+                    success = sla_checker.add_iteration(result)
+                    if self.abort_on_sla_failure and not success:
+                        sla_checker.set_aborted()
+                        runner_obj.abort()
+                elif is_done.isSet() and not queue:
+                    break
+
+                if chunk and (
+                        len(chunk) >= CONF.benchmark.results_chunk_size or
+                        (time.time() - chunk_started_at >=
+                         CONF.benchmark.results_chunk_interval)):
+                    task.append_results_chunk(key, chunk)
+                    saved_chunks += 1
+                    chunk = []
+        finally:
+            # NOTE: The runner must not wait for the queue to be consumed
+            #       if the consumer is gone.
+            queue.close()
+
+        # NOTE: The runner thread records its failure before is_done is set,
+        #       so it is known by now.
+        if unexpected_failure.get("exc"):
+            sla_checker.set_unexpected_failure(unexpected_failure["exc"])
+
+        stats = queue.stats()
+        LOG.debug("Task %(task)s | result queue of %(name)s: %(total)d "
+                  "results, max depth %(max_depth)d of %(maxsize)d, runner "
+                  "waited %(waits)d times for %(wait_duration).2fs"
+                  % dict(stats, task=task["uuid"], name=key["name"]))
+        if stats["waits"]:
+            LOG.info(_("Task %(task)s | results of %(name)s were consumed "
+                       "slower than produced, the runner waited for "
+                       "%(duration).2fs")
+                     % {"task": task["uuid"], "name": key["name"],
+                        "duration": stats["wait_duration"]})
+
+        data = {"load_duration": durations["load_duration"],
+                "full_duration": durations["full_duration"],
+                "sla": sla_checker.results(),
+                "summary": results_summary.result()}
+        runner_info = runner_obj.get_info()
+        if runner_info:
+            data["runner"] = runner_info
+        if chunk:
+            task.append_results_chunk(key, chunk)
+        elif not saved_chunks:
+            data["raw"] = []
+        with self._results_lock:
+            self.results.append({"key": key, "data": data})
+        self._save_results()
@@ -13,21 +13,43 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import bisect
 import math
 
+from oslo_utils import importutils
+
+
+numpy = importutils.try_import("numpy")
+
+
+def sort_data(data):
+    """Sort the data for Histogram, with NumPy if it is installed.
+
+    :param data: a list of numbers
+    :returns: a sorted list of the numbers, or a sorted NumPy array
+    """
+    if numpy is not None:
+        return numpy.sort(numpy.array(data, dtype=float))
+    return sorted(data)
+
 
 class Histogram:
     """Represents a Histogram chart."""
 
-    def __init__(self, data, number_of_bins, method=None, key=None):
+    def __init__(self, data, number_of_bins, method=None, key=None,
+                 sorted_data=None):
         """Initialize a Histogram object
 
         :param data: a list of numbers
         :param number_of_bins: an integer
         :param description: a string
         :param key: a string
+        :param sorted_data: the data returned by sort_data(), so several
+                            histograms of the same data can share it
         """
         self.data = data
+        self.sorted_data = (sort_data(data) if sorted_data is None
+                            else sorted_data)
         self.number_of_bins = number_of_bins
         self.method = method
         self.key = key
@@ -50,14 +72,20 @@ class Histogram:
                 for i in range(1, self.number_of_bins + 1)]
 
     def _calculate_y_axis(self):
-        """Return a list with the values of the y axis."""
-        y_axis = [0] * len(self.x_axis)
-        for data_point in self.data:
-            for i, bin in enumerate(self.x_axis):
-                if data_point <= bin:
-                    y_axis[i] += 1
-                    break
-        return y_axis
+        """Return a list with the values of the y axis.
+
+        A data point belongs to the first bin with an x value not less than
+        the point. The number of points up to every x value is found by
+        binary search in the sorted data.
+        """
+        if numpy is not None and isinstance(self.sorted_data, numpy.ndarray):
+            counts = numpy.searchsorted(self.sorted_data, self.x_axis,
+                                        side="right").tolist()
+        else:
+            counts = [bisect.bisect_right(self.sorted_data, x)
+                      for x in self.x_axis]
+        return [count - previous
+                for count, previous in zip(counts, [0] + counts[:-1])]
 
 
 def calculate_number_of_bins_sqrt(data):
@@ -107,3 +135,18 @@ def hvariety(data):
             "number_of_bins": calculate_number_of_bins_half(data),
         }
     ]
+
+
+def get_histograms(data, key=None):
+    """Build histograms of the data with every method of hvariety().
+
+    The data is sorted only once for all the histograms.
+
+    :param data: a non-empty list of numbers
+    :param key: a string
+    :returns: list of Histogram objects
+    """
+    sorted_data = sort_data(data)
+    return [Histogram(data, variety["number_of_bins"], variety["method"],
+                      key, sorted_data=sorted_data)
+            for variety in hvariety(data)]
@@ -13,53 +13,62 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import copy
 import json
 
 import six
 
+from rally.common import costilius
 from rally.task.processing.charts import histogram as histo
 from rally.task.processing import utils
 from rally.ui import utils as ui_utils
 
 
+def _append_row(columns, idx, row):
+    """Append the values of a row to the columns of a table.
+
+    Sometimes we miss iteration data, so we care about data integrity by
+    setting zero values: a column that appears at the row gets zeros for
+    the previous rows, and columns missing in the row get zero for it.
+
+    :param columns: ordered dict of lists of values, updated in place
+    :param idx: index of the row
+    :param row: dict of values by column names
+    """
+    for key, value in row.items():
+        if key not in columns:
+            columns[key] = [0] * idx
+        columns[key].append(value)
+    if len(row) < len(columns):
+        for values in columns.values():
+            if len(values) == idx:
+                values.append(0)
+
+
 def _prepare_data(data):
+    """Gather data of all the charts and tables in one pass over results.
+
+    The results themselves are not modified.
+    """
     durations = []
     idle_durations = []
-    atomic_durations = {}
-    output = {}
+    histogram_data = []
+    atomic_durations = costilius.OrderedDict()
+    atomic_histogram_data = costilius.OrderedDict()
+    output = costilius.OrderedDict()
     output_errors = []
-    output_stacked = []
     errors = []
-
-    # NOTE(maretskiy): We need this extra iteration
-    # to determine something that we should know about the data
-    # before starting its processing.
-    atomic_names = set()
-    output_names = set()
-    for r in data["result"]:
-        atomic_names.update(r["atomic_actions"].keys())
-        output_names.update(r["scenario_output"]["data"].keys())
+    summary = data.get("summary")
+    summary_stream = None if summary else utils.ResultsSummary()
 
     for idx, r in enumerate(data["result"]):
-        # NOTE(maretskiy): Sometimes we miss iteration data.
-        # So we care about data integrity by setting zero values
-        if len(r["atomic_actions"]) < len(atomic_names):
-            for atomic_name in atomic_names:
-                r["atomic_actions"].setdefault(atomic_name, 0)
-
-        if len(r["scenario_output"]["data"]) < len(output_names):
-            for output_name in output_names:
-                r["scenario_output"]["data"].setdefault(output_name, 0)
+        if summary_stream is not None:
+            summary_stream.add(r)
 
         if r["scenario_output"]["errors"]:
             output_errors.append((idx, r["scenario_output"]["errors"]))
+        _append_row(output, idx, r["scenario_output"]["data"])
 
-        for param, value in r["scenario_output"]["data"].items():
-            try:
-                output[param].append(value)
-            except KeyError:
-                output[param] = [value]
+        _append_row(atomic_durations, idx, r["atomic_actions"])
 
         if r["error"]:
             type_, message, traceback = r["error"]
@@ -69,20 +78,17 @@ def _prepare_data(data):
                            "traceback": traceback})
 
             # NOTE(maretskiy): Reset failed durations (no sense to display)
-            r["duration"] = 0
-            r["idle_duration"] = 0
-
-        durations.append(r["duration"])
-        idle_durations.append(r["idle_duration"])
-
-        for met, duration in r["atomic_actions"].items():
-            try:
-                atomic_durations[met].append(duration)
-            except KeyError:
-                atomic_durations[met] = [duration]
+            durations.append(0)
+            idle_durations.append(0)
+        else:
+            durations.append(r["duration"])
+            idle_durations.append(r["idle_duration"])
+            _append_row(atomic_histogram_data, len(histogram_data),
+                        r["atomic_actions"])
+            histogram_data.append(r["duration"])
 
-    for k, v in six.iteritems(output):
-        output_stacked.append({"key": k, "values": utils.compress(v)})
+    output_stacked = [{"key": k, "values": utils.compress(v)}
+                      for k, v in six.iteritems(output)]
 
     for k, v in six.iteritems(atomic_durations):
         atomic_durations[k] = utils.compress(v)
@@ -92,25 +98,22 @@ def _prepare_data(data):
             "duration": utils.compress(durations),
             "idle_duration": utils.compress(idle_durations)},
         "atomic_durations": atomic_durations,
+        "histogram_data": histogram_data,
+        "atomic_histogram_data": atomic_histogram_data,
         "output": output_stacked,
         "output_errors": output_errors,
         "errors": errors,
+        "summary": summary or summary_stream.result(),
         "sla": data["sla"],
         "load_duration": data["load_duration"],
         "full_duration": data["full_duration"],
     }
 
 
-def _process_main_duration(result, data):
-    histogram_data = [r["duration"] for r in result["result"]
-                      if not r["error"]]
-    histograms = []
-    if histogram_data:
-        hvariety = histo.hvariety(histogram_data)
-        for i in range(len(hvariety)):
-            histograms.append(histo.Histogram(histogram_data,
-                                              hvariety[i]["number_of_bins"],
-                                              hvariety[i]["method"]))
+def _process_main_duration(data):
+    histogram_data = data["histogram_data"]
+    histograms = (histo.get_histograms(histogram_data)
+                  if histogram_data else [])
 
     stacked_area = []
     for key in "duration", "idle_duration":
@@ -137,70 +140,19 @@ def _process_main_duration(result, data):
     }
 
 
-def _process_atomic(result, data):
-
-    def avg(lst, key=None):
-        lst = lst if not key else map(lambda x: x[key], lst)
-        return utils.mean(lst)
-
-    # NOTE(boris-42): In our result["result"] we have next structure:
-    #                 {"error": NoneOrDict,
-    #                  "atomic_actions": {
-    #                       "action1": <duration>,
-    #                       "action2": <duration>
-    #                   }
-    #                 }
-    #                 Our goal is to get next structure:
-    #                 [{"key": $atomic_actions.action,
-    #                   "values": [[order, $atomic_actions.duration
-    #                              if not $error else 0], ...}]
-    #
-    #                 Order of actions in "atomic_action" is similar for
-    #                 all iteration. So we should take first non "error"
-    #                 iteration. And get in atomitc_iter list:
-    #                 [{"key": "action", "values":[]}]
-    stacked_area = []
-    for row in result["result"]:
-        if not row["error"] and "atomic_actions" in row:
-            stacked_area = [{"key": a, "values": []}
-                            for a in row["atomic_actions"]]
-            break
-
-    # NOTE(boris-42): pie is similar to stacked_area, only difference is in
-    #                 structure of values. In case of $error we shouldn't put
-    #                 anything in pie. In case of non error we should put just
-    #                 $atomic_actions.duration (without order)
+def _process_atomic(data):
+    # NOTE: Pie and histograms show durations of atomic actions of
+    #       successful iterations only. In case any single atomic action
+    #       failed, put 0.
     pie = []
-    histogram_data = []
-    if stacked_area:
-        pie = copy.deepcopy(stacked_area)
-        histogram_data = copy.deepcopy(stacked_area)
-        for i, res in enumerate(result["result"]):
-            # in case of error put (order, 0.0) to all actions of stacked area
-            if res["error"]:
-                for k in range(len(stacked_area)):
-                    stacked_area[k]["values"].append([i + 1, 0.0])
-                continue
-
-            # in case of non error put real durations to pie and stacked area
-            for j, action in enumerate(res["atomic_actions"].keys()):
-                # in case any single atomic action failed, put 0
-                action_duration = res["atomic_actions"][action] or 0.0
-                pie[j]["values"].append(action_duration)
-                histogram_data[j]["values"].append(action_duration)
-
-    # filter out empty action lists in pie / histogram to avoid errors
-    pie = filter(lambda x: x["values"], pie)
-    histogram_data = [x for x in histogram_data if x["values"]]
-
-    histograms = [[] for atomic_action in range(len(histogram_data))]
-    for i, atomic_action in enumerate(histogram_data):
-        hvariety = histo.hvariety(atomic_action["values"])
-        for v in range(len(hvariety)):
-            histograms[i].append(histo.Histogram(atomic_action["values"],
-                                                 hvariety[v]["number_of_bins"],
-                                                 hvariety[v]["method"],
-                                                 atomic_action["key"]))
+    histograms = []
+    for name, durations in six.iteritems(data["atomic_histogram_data"]):
+        if not durations:
+            continue
+        durations = [d or 0.0 for d in durations]
+        pie.append({"key": name, "value": utils.mean(durations)})
+        histograms.append(histo.get_histograms(durations, name))
+
     stacked_area = []
     for name, durations in six.iteritems(data["atomic_durations"]):
         stacked_area.append({
@@ -220,38 +172,33 @@ def _process_atomic(result, data):
             for i, atomic_action_list in enumerate(histograms)
         ],
         "iter": stacked_area,
-        "pie": [{"key": x["key"], "value": avg(x["values"])} for x in pie]
+        "pie": pie
     }
 
 
-def _get_atomic_action_durations(result):
-    raw = result.get("result", [])
-    actions_data = utils.get_atomic_actions_data(raw)
-    table = []
-    total = []
-    for action in actions_data:
-        durations = actions_data[action]
-        if durations:
-            data = [action,
-                    round(min(durations), 3),
-                    round(utils.median(durations), 3),
-                    round(utils.percentile(durations, 0.90), 3),
-                    round(utils.percentile(durations, 0.95), 3),
-                    round(max(durations), 3),
-                    round(utils.mean(durations), 3),
-                    "%.1f%%" % (len(durations) * 100.0 / len(raw)),
-                    len(raw)]
-        else:
-            data = [action, None, None, None, None, None, None, 0, len(raw)]
+def _get_durations_row(name, row):
+    if row["min"] is not None:
+        return [name,
+                round(row["min"], 3),
+                round(row["median"], 3),
+                round(row["90%ile"], 3),
+                round(row["95%ile"], 3),
+                round(row["max"], 3),
+                round(row["avg"], 3),
+                "%.1f%%" % (row["success"] * 100.0 / row["count"]),
+                row["count"]]
+    return [name, None, None, None, None, None, None, 0, row["count"]]
 
-        # Save 'total' - it must be appended last
-        if action == "total":
-            total = data
-            continue
-        table.append(data)
 
-    if total:
-        table.append(total)
+def _get_atomic_action_durations(summary):
+    # NOTE: 'total' rows go after the atomic actions in the summary
+    table = [_get_durations_row(row["name"], row)
+             for row in summary["atomic"]]
+
+    # Totals of the stages of the load profile go after the overall ones
+    for row in summary["stages"]:
+        table.append(_get_durations_row("total (stage %d)" % (row["name"] + 1),
+                                        row))
 
     return table
 
@@ -269,10 +216,10 @@ def _process_results(results):
                       "Avg (sec)",
                       "Success",
                       "Count"]
-        table_rows = _get_atomic_action_durations(result)
         scenario_name, kw, pos = (result["key"]["name"],
                                   result["key"]["kw"], result["key"]["pos"])
         data = _prepare_data(result)
+        table_rows = _get_atomic_action_durations(data["summary"])
         cls = scenario_name.split(".")[0]
         met = scenario_name.split(".")[1]
         name = "%s%s" % (met, (pos and " [%d]" % (int(pos) + 1) or ""))
@@ -288,8 +235,8 @@ def _process_results(results):
             "name": name,
             "runner": kw["runner"]["type"],
             "config": json.dumps({scenario_name: [kw]}, indent=2),
-            "iterations": _process_main_duration(result, data),
-            "atomic": _process_atomic(result, data),
+            "iterations": _process_main_duration(data),
+            "atomic": _process_atomic(data),
             "table_cols": table_cols,
             "table_rows": table_rows,
             "output": data["output"],
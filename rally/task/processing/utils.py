@@ -15,11 +15,17 @@
 
 import math
 
+from oslo_utils import importutils
+
 from rally.common import costilius
 from rally.common.i18n import _
+from rally.common import streaming_algorithms as streaming
 from rally import exceptions
 
 
+numpy = importutils.try_import("numpy")
+
+
 def mean(values):
     """Find the simple average of a list of values.
 
@@ -64,6 +70,40 @@ def percentile(values, percent):
     if not values:
         return None
     values.sort()
+    return _percentile_of_sorted(values, percent)
+
+
+def percentiles(values, percents):
+    """Find several percentiles of a list of values at once.
+
+    The values are sorted only once for all the percentiles. If NumPy is
+    installed, they aren't sorted at all: numpy.partition() puts in place
+    just the values that the percentiles are interpolated from, which takes
+    linear time. The interpolation is the same as of percentile(), so the
+    results are the same with and without NumPy.
+
+    :parameter values: list of numbers
+    :parameter percents: list of float values from 0.0 to 1.0
+
+    :returns: list of the percentiles of values in the order of percents
+    """
+    if not values:
+        return [None] * len(percents)
+    if numpy is None:
+        values = sorted(values)
+        return [_percentile_of_sorted(values, p) for p in percents]
+
+    last = len(values) - 1
+    indexes = set()
+    for percent in percents:
+        indexes.add(int(math.floor(last * percent)))
+        indexes.add(int(math.ceil(last * percent)))
+    values = numpy.partition(numpy.array(values, dtype=float),
+                             sorted(indexes))
+    return [float(_percentile_of_sorted(values, p)) for p in percents]
+
+
+def _percentile_of_sorted(values, percent):
     k = (len(values) - 1) * percent
     f = math.floor(k)
     c = math.ceil(k)
@@ -74,9 +114,16 @@ def percentile(values, percent):
     return (d0 + d1)
 
 
+CORRECTED_TOTAL = "total (corrected)"
+
+
 def get_atomic_actions_data(raw_data):
     """Retrieve detailed (by atomic actions & total runtime) benchmark data.
 
+    If iterations were started later than intended by the runner (see
+    "open_loop" option of the rps runner), total durations corrected by
+    the lag of iteration start are added as CORRECTED_TOTAL.
+
     :parameter raw_data: list of raw records (scenario runner output)
 
     :returns: dictionary containing atomic action + total duration lists
@@ -95,9 +142,173 @@ def get_atomic_actions_data(raw_data):
             for r in raw_data
             if r["atomic_actions"].get(atomic_action) is not None]
     actions_data["total"] = [r["duration"] for r in raw_data if not r["error"]]
+    corrected = [
+        r["duration"] + max(r["timestamp"] - r["intended_timestamp"], 0)
+        for r in raw_data if not r["error"] and "intended_timestamp" in r]
+    if corrected:
+        actions_data[CORRECTED_TOTAL] = corrected
     return actions_data
 
 
+def get_stages_data(raw_data):
+    """Retrieve total durations of iterations grouped by load stages.
+
+    Results are tagged with stages by runners that change the load during
+    the run (e.g. "load_profile" runner).
+
+    :parameter raw_data: list of raw records (scenario runner output)
+
+    :returns: ordered dictionary {stage: (durations, count)}, where
+              durations is a list of total durations of successful
+              iterations and count is the number of all the iterations
+              of the stage; empty if results are not tagged with stages
+    """
+    stages = {}
+    for r in raw_data:
+        if "stage" not in r:
+            continue
+        durations, count = stages.get(r["stage"], ([], 0))
+        if not r["error"]:
+            durations.append(r["duration"])
+        stages[r["stage"]] = (durations, count + 1)
+    return costilius.OrderedDict(sorted(stages.items()))
+
+
+class DurationStats(object):
+    """Statistics of a row of durations table, computed value by value."""
+
+    def __init__(self):
+        self.count = 0
+        self._min = streaming.MinComputation()
+        self._max = streaming.MaxComputation()
+        self._mean = streaming.MeanComputation()
+        # NOTE: Exact percentiles require all the values, but plain floats
+        #       take much less memory than the results they are taken from.
+        self._values = []
+
+    def add(self, value):
+        self.count += 1
+        self._min.add(value)
+        self._max.add(value)
+        self._mean.add(value)
+        self._values.append(value)
+
+    def result(self, name, count):
+        """Get the row of the table.
+
+        :parameter name: name of the row
+        :parameter count: number of all the iterations, including the ones
+                          that added no values to the row
+
+        :returns: dict with "name", "min", "median", "90%ile", "95%ile",
+                  "max" and "avg" of the values (None if there are no
+                  values), the number of values as "success" and "count"
+        """
+        row = {"name": name, "success": self.count, "count": count}
+        if self.count:
+            # NOTE: The median is the 50th percentile: for an even number of
+            #       values both median() and percentile() take the average of
+            #       the two middle ones.
+            median_, p90, p95 = percentiles(self._values, (0.5, 0.90, 0.95))
+            row.update({"min": self._min.result(),
+                        "median": median_,
+                        "90%ile": p90,
+                        "95%ile": p95,
+                        "max": self._max.result(),
+                        "avg": self._mean.result()})
+        else:
+            row.update(dict.fromkeys(("min", "median", "90%ile", "95%ile",
+                                      "max", "avg")))
+        return row
+
+
+class ResultsSummary(object):
+    """Summary statistics of the results of a scenario.
+
+    Results are added one by one, so the summary is computed while the
+    scenario runs and the results themselves aren't kept. The summary
+    contains the same tables as get_atomic_actions_data(),
+    get_stages_data() and scenario output produce from the raw results.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._atomic_names = None
+        self._atomic = {}
+        self._total = DurationStats()
+        self._corrected = DurationStats()
+        self._stages = {}
+        self._output = {}
+
+    def add(self, result):
+        """Add a result of a single scenario iteration to the summary."""
+        self.count += 1
+        error = result.get("error")
+        atomic_actions = result.get("atomic_actions", {})
+        if (self._atomic_names is None and not error
+                and "atomic_actions" in result):
+            self._atomic_names = list(atomic_actions)
+        for name, duration in atomic_actions.items():
+            if duration is not None:
+                self._atomic.setdefault(name, DurationStats()).add(duration)
+
+        if not error:
+            self._total.add(result["duration"])
+            if "intended_timestamp" in result:
+                self._corrected.add(
+                    result["duration"] +
+                    max(result["timestamp"] - result["intended_timestamp"],
+                        0))
+
+        if "stage" in result:
+            stage = self._stages.setdefault(result["stage"],
+                                            [DurationStats(), 0])
+            stage[1] += 1
+            if not error:
+                stage[0].add(result["duration"])
+
+        output = result.get("scenario_output") or {}
+        for key, value in (output.get("data") or {}).items():
+            self._output.setdefault(key, DurationStats()).add(float(value))
+
+    def result(self):
+        """Get the summary.
+
+        :returns: dict with lists of rows (see DurationStats.result()):
+                  "atomic" - atomic actions followed by "total" and
+                  CORRECTED_TOTAL (if any) rows, "stages" - total
+                  durations by stages, named by the stage numbers, and
+                  "output" - values of scenario output by their keys
+        """
+        atomic = [self._atomic.get(name, DurationStats()).result(name,
+                                                                 self.count)
+                  for name in self._atomic_names or []]
+        atomic.append(self._total.result("total", self.count))
+        if self._corrected.count:
+            atomic.append(self._corrected.result(CORRECTED_TOTAL,
+                                                 self.count))
+        return {
+            "atomic": atomic,
+            "stages": [stats.result(stage, count) for stage, (stats, count)
+                       in sorted(self._stages.items())],
+            "output": [stats.result(key, self.count) for key, stats
+                       in sorted(self._output.items())]
+        }
+
+
+def get_results_summary(raw_data):
+    """Compute summary of the raw results saved without it.
+
+    :parameter raw_data: list of raw records (scenario runner output)
+
+    :returns: summary in the format of ResultsSummary.result()
+    """
+    summary = ResultsSummary()
+    for result in raw_data:
+        summary.add(result)
+    return summary.result()
+
+
 def compress(data, limit=1000, merge=None, normalize=None):
     """Enumerate and reduce list of values.
 
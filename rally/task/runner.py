@@ -17,10 +17,13 @@ import abc
 import collections
 import multiprocessing
 import random
+import threading
 import time
 
 import jsonschema
+from oslo_config import cfg
 import six
+from six import moves
 
 from rally.common import log as logging
 from rally.common.plugin import plugin
@@ -34,6 +37,39 @@ from rally.task import utils
 LOG = logging.getLogger(__name__)
 
 
+RUNNER_OPTS = [
+    cfg.BoolOpt("strict_result_validation",
+                default=False,
+                help="Validate every result of scenario iterations with "
+                     "jsonschema instead of the faster built-in check "
+                     "of the result format."),
+    cfg.IntOpt("result_queue_size",
+               default=10000,
+               min=0,
+               help="Max number of results of scenario iterations kept "
+                    "in memory until they are consumed by the task "
+                    "engine. When the queue is full, the runner waits, "
+                    "slowing down the workers. 0 means unlimited."),
+]
+
+CONF = cfg.CONF
+benchmark_group = cfg.OptGroup(name="benchmark", title="benchmark options")
+CONF.register_opts(RUNNER_OPTS, group=benchmark_group)
+
+# NOTE: Subtasks marked as "parallel" fork worker processes of their
+#       runners while the threads of the other subtasks are running. The
+#       processes are started one at a time with the log handlers locked,
+#       so a handler locked by another thread at the fork can't hang the
+#       process.
+_FORK_LOCK = threading.Lock()
+
+
+def _run_worker_process(worker_process, *args, **kwargs):
+    # NOTE: The process is forked with the log handlers locked.
+    logging.recreate_handler_locks()
+    worker_process(*args, **kwargs)
+
+
 def format_result_on_timeout(exc, timeout):
     return {
         "duration": timeout,
@@ -95,6 +131,180 @@ def _worker_thread(queue, args):
     queue.put(_run_scenario_once(args))
 
 
+# Order of fields in the compact wire format of results that are sent
+# from worker processes to the runner.
+RESULT_FIELDS = ("duration", "timestamp", "idle_duration", "error",
+                 "scenario_output", "atomic_actions", "intended_timestamp",
+                 "stage")
+
+
+def pack_result(result):
+    """Pack result dict into a compact tuple to send it between processes.
+
+    Results with unexpected keys are returned as is, so they still fail
+    ScenarioRunnerResult validation after unpacking.
+
+    :param result: dict with results of a single scenario iteration
+    :returns: tuple of values ordered as in RESULT_FIELDS or the result
+    """
+    if not isinstance(result, dict) or set(result) - set(RESULT_FIELDS):
+        return result
+    return tuple(result.get(field) for field in RESULT_FIELDS)
+
+
+def unpack_result(packed):
+    """Restore result dict packed with pack_result()."""
+    if not isinstance(packed, tuple):
+        return packed
+    return dict((field, value) for field, value in zip(RESULT_FIELDS, packed)
+                if value is not None)
+
+
+class ResultBatcher(object):
+    """Send results from a worker process to the runner in batches.
+
+    Results are packed with pack_result() and buffered until either
+    batch_size results are collected or batch_interval seconds passed
+    since the first result got into the buffer. Then the whole buffer is
+    put into the queue as a single list.
+    """
+
+    def __init__(self, queue, batch_size=1, batch_interval=1.0):
+        """Init result batcher.
+
+        :param queue: multiprocessing.Queue to send batches to
+        :param batch_size: max number of results in a batch
+        :param batch_interval: max time (in seconds) a result may stay
+                               in the buffer
+        """
+        self.queue = queue
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._batch = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def put(self, result):
+        with self._lock:
+            self._batch.append(pack_result(result))
+            if len(self._batch) >= self.batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.batch_interval,
+                                              self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Send all the buffered results."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._batch:
+            self.queue.put(self._batch)
+            self._batch = []
+
+
+class ResultQueue(object):
+    """Queue of results between the runner and the consumer of the results.
+
+    The runner appends results and waits while the queue holds maxsize
+    results, so the workers are slowed down instead of the results piling
+    up in memory when the consumer falls behind. The consumer takes the
+    results with get() which wakes up as soon as a result is appended.
+
+    The methods of collections.deque used to read the results (popleft(),
+    len(), iteration and indexing) are supported as well.
+    """
+
+    def __init__(self, maxsize=0):
+        """Init result queue.
+
+        :param maxsize: max number of results in the queue, 0 for unlimited
+        """
+        self.maxsize = maxsize
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        # Metrics of the queue
+        self.total = 0
+        self.max_depth = 0
+        self.waits = 0
+        self.wait_duration = 0.0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def __bool__(self):
+        return bool(self._queue)
+
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        return iter(list(self._queue))
+
+    def __getitem__(self, index):
+        return self._queue[index]
+
+    def _is_full(self):
+        return (not self._closed and self.maxsize > 0 and
+                len(self._queue) >= self.maxsize)
+
+    def append(self, result):
+        """Add the result, waiting while the queue is full."""
+        with self._cond:
+            if self._is_full():
+                self.waits += 1
+                started_at = time.time()
+                while self._is_full():
+                    self._cond.wait()
+                self.wait_duration += time.time() - started_at
+            self._queue.append(result)
+            self.total += 1
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._cond.notify_all()
+
+    def popleft(self):
+        """Take the oldest result, raise IndexError if there is none."""
+        with self._cond:
+            result = self._queue.popleft()
+            self._cond.notify_all()
+            return result
+
+    def get(self, timeout=None):
+        """Take the oldest result, waiting for it if the queue is empty.
+
+        :param timeout: max time (in seconds) to wait for a result
+        :returns: the result or None if there was no result in time
+        """
+        with self._cond:
+            if not self._queue:
+                self._cond.wait(timeout)
+            if not self._queue:
+                return None
+            result = self._queue.popleft()
+            self._cond.notify_all()
+            return result
+
+    def close(self):
+        """Stop limiting the size, e.g. when the results are not consumed."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        """Get the metrics of the queue depth."""
+        return {"total": self.total,
+                "maxsize": self.maxsize,
+                "max_depth": self.max_depth,
+                "waits": self.waits,
+                "wait_duration": self.wait_duration}
+
+
 def _log_worker_info(**info):
     """Log worker parameters for debugging.
 
@@ -118,9 +328,16 @@ class ScenarioRunnerResult(dict):
             "timestamp": {
                 "type": "number"
             },
+            "intended_timestamp": {
+                "type": "number"
+            },
             "idle_duration": {
                 "type": "number"
             },
+            "stage": {
+                "type": "integer",
+                "minimum": 0
+            },
             "scenario_output": {
                 "type": "object",
                 "properties": {
@@ -154,7 +371,73 @@ class ScenarioRunnerResult(dict):
 
     def __init__(self, result_list):
         super(ScenarioRunnerResult, self).__init__(result_list)
-        jsonschema.validate(result_list, self.RESULT_SCHEMA)
+        if (CONF.benchmark.strict_result_validation
+                or not _is_valid_result(result_list)):
+            # jsonschema also explains what exactly is wrong with the
+            # result that hasn't passed the fast check.
+            jsonschema.validate(result_list, self.RESULT_SCHEMA)
+
+
+def _is_number(value):
+    return (isinstance(value, six.integer_types + (float,))
+            and not isinstance(value, bool))
+
+
+def _is_valid_result(result):
+    """Check that result matches ScenarioRunnerResult.RESULT_SCHEMA.
+
+    This is a hand-written equivalent of the schema, which is much faster
+    than jsonschema validation.
+
+    :param result: result of a single scenario iteration
+    :returns: True if result is valid, False otherwise
+    """
+    if not isinstance(result, dict) or set(result) - _RESULT_KEYS:
+        return False
+
+    for key in ("duration", "timestamp", "intended_timestamp",
+                "idle_duration"):
+        if key in result and not _is_number(result[key]):
+            return False
+
+    if "stage" in result:
+        stage = result["stage"]
+        if (not isinstance(stage, six.integer_types)
+                or isinstance(stage, bool) or stage < 0):
+            return False
+
+    if "scenario_output" in result:
+        output = result["scenario_output"]
+        if not isinstance(output, dict) or set(output) - _OUTPUT_KEYS:
+            return False
+        if "data" in output:
+            if not isinstance(output["data"], dict):
+                return False
+            if not all(_is_number(v) for v in output["data"].values()):
+                return False
+        if ("errors" in output
+                and not isinstance(output["errors"], six.string_types)):
+            return False
+
+    if "atomic_actions" in result:
+        actions = result["atomic_actions"]
+        if not isinstance(actions, dict):
+            return False
+        if not all(v is None or _is_number(v) for v in actions.values()):
+            return False
+
+    if "error" in result:
+        if not isinstance(result["error"], list):
+            return False
+        if not all(isinstance(e, six.string_types) for e in result["error"]):
+            return False
+
+    return True
+
+
+_RESULT_KEYS = frozenset(ScenarioRunnerResult.RESULT_SCHEMA["properties"])
+_OUTPUT_KEYS = frozenset(ScenarioRunnerResult.RESULT_SCHEMA["properties"]
+                         ["scenario_output"]["properties"])
 
 
 def configure(name, namespace="default"):
@@ -174,6 +457,10 @@ class ScenarioRunner(plugin.Plugin):
 
     CONFIG_SCHEMA = {}
 
+    # Max time (in seconds) to wait for a result before checking whether
+    # worker processes are finished
+    JOIN_TIMEOUT = 0.1
+
     def __init__(self, task, config):
         """Runner constructor.
 
@@ -185,7 +472,7 @@ class ScenarioRunner(plugin.Plugin):
         """
         self.task = task
         self.config = config
-        self.result_queue = collections.deque()
+        self.result_queue = ResultQueue(CONF.benchmark.result_queue_size)
         self.aborted = multiprocessing.Event()
 
     @staticmethod
@@ -225,6 +512,13 @@ class ScenarioRunner(plugin.Plugin):
         """Abort the execution of further benchmark scenario iterations."""
         self.aborted.set()
 
+    def get_info(self):
+        """Get details of the run which are saved with the scenario results.
+
+        :returns: dict, empty if the runner has nothing to report
+        """
+        return {}
+
     @staticmethod
     def _create_process_pool(processes_to_start, worker_process,
                              worker_args_gen):
@@ -240,32 +534,71 @@ class ScenarioRunner(plugin.Plugin):
         for i in range(processes_to_start):
             kwrgs = {"processes_to_start": processes_to_start,
                      "processes_counter": i}
-            process = multiprocessing.Process(target=worker_process,
-                                              args=next(worker_args_gen),
-                                              kwargs={"info": kwrgs})
-            process.start()
+            process = multiprocessing.Process(
+                target=_run_worker_process,
+                args=(worker_process,) + tuple(next(worker_args_gen)),
+                kwargs={"info": kwrgs})
+            with _FORK_LOCK:
+                with logging.lock_handlers():
+                    process.start()
             process_pool.append(process)
 
         return process_pool
 
+    def _create_result_batcher(self, result_queue):
+        """Create ResultBatcher for a worker process of the runner.
+
+        Batch parameters are taken from "results_batch_size" and
+        "results_batch_interval" options of the runner config.
+
+        :param result_queue: multiprocessing.Queue that receives the results
+        :returns: ResultBatcher object
+        """
+        return ResultBatcher(
+            result_queue,
+            batch_size=self.config.get("results_batch_size", 1),
+            batch_interval=self.config.get("results_batch_interval", 1.0))
+
     def _join_processes(self, process_pool, result_queue):
         """Join the processes in the pool and send their results to the queue.
 
+        Batches of results are read from the queue with a blocking call, so
+        every batch is sent as soon as it arrives and no CPU is spent while
+        the workers are busy. Processes are joined once they finish.
+
         :param process_pool: pool of processes to join
-        :result_queue: multiprocessing.Queue that receives the results
+        :result_queue: multiprocessing.Queue that receives batches of
+                       results from ResultBatcher objects
         """
         while process_pool:
+            try:
+                batch = result_queue.get(timeout=self.JOIN_TIMEOUT)
+            except moves.queue.Empty:
+                pass
+            else:
+                self._send_batch(batch)
+                # Send all the results that are already in the queue at once
+                # before checking the state of the processes.
+                while not result_queue.empty():
+                    self._send_batch(result_queue.get())
+
             while process_pool and not process_pool[0].is_alive():
                 process_pool.popleft().join()
 
-            if result_queue.empty():
-                # sleep a bit to avoid 100% usage of CPU by this method
-                time.sleep(0.001)
-
-            while not result_queue.empty():
-                self._send_result(result_queue.get())
+        # Processes flush their results before exit, so everything left
+        # is already available in the queue.
+        while not result_queue.empty():
+            self._send_batch(result_queue.get())
         result_queue.close()
 
+    def _send_batch(self, batch):
+        """Send to consumer all the results of batch from ResultBatcher.
+
+        :param batch: list of results packed with pack_result()
+        """
+        for packed in batch:
+            self._send_result(unpack_result(packed))
+
     def _send_result(self, result):
         """Send partial result to consumer.
 
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+#
+# Copyright 2015: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the time of histograms calculation for a large dataset.
+
+Usage: python -m tests.benchmarks.histogram [points] [max_seconds]
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+import mock
+
+from rally.task.processing.charts import histogram
+
+
+def measure(data, use_numpy):
+    numpy = histogram.numpy if use_numpy else None
+    with mock.patch.object(histogram, "numpy", numpy):
+        started_at = time.time()
+        histograms = histogram.get_histograms(data)
+        duration = time.time() - started_at
+
+    for hist in histograms:
+        expected = len([x for x in data if x <= hist.x_axis[-1]])
+        if sum(hist.y_axis) != expected:
+            raise AssertionError("Histogram %s lost some points"
+                                 % hist.method)
+    return duration
+
+
+def main(argv):
+    points = int(argv[1]) if len(argv) > 1 else 1000000
+    max_seconds = float(argv[2]) if len(argv) > 2 else 60
+
+    rand = random.Random(42)
+    data = [rand.uniform(0, 100) for i in range(points)]
+
+    modes = [False]
+    if histogram.numpy is not None:
+        modes.append(True)
+    else:
+        print("numpy is not installed, only pure Python mode is measured")
+
+    failed = False
+    for use_numpy in modes:
+        duration = measure(data, use_numpy)
+        print("%d points, numpy=%s: %.2f sec"
+              % (points, use_numpy, duration))
+        failed = failed or duration > max_seconds
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
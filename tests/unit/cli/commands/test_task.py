@@ -114,7 +114,8 @@ class TaskCommandsTestCase(test.TestCase):
         self.task.start(task_path, deployment_id)
         mock_task_start.assert_called_once_with(
             deployment_id, {"some": "json"},
-            task=mock_task_create.return_value, abort_on_sla_failure=False)
+            task=mock_task_create.return_value, abort_on_sla_failure=False,
+            max_parallel_subtasks=None)
         mock__load_task.assert_called_once_with(task_path, None, None)
 
     @mock.patch("rally.cli.commands.task.TaskCommands._load_task",
@@ -128,6 +129,16 @@ class TaskCommandsTestCase(test.TestCase):
         mock__load_task.assert_called_once_with(
             task_path, task_args, task_args_file)
 
+    @mock.patch("rally.cli.commands.task.TaskCommands._load_task")
+    @mock.patch("rally.cli.commands.task.api")
+    def test_start_invalid_max_parallel_subtasks(self, mock_api,
+                                                 mock__load_task):
+        result = self.task.start("task_path", "deployment",
+                                 max_parallel_subtasks=0)
+        self.assertEqual(1, result)
+        self.assertFalse(mock__load_task.called)
+        self.assertFalse(mock_api.Task.create.called)
+
     @mock.patch("rally.cli.commands.task.envutils.get_global")
     def test_start_no_deployment_id(self, mock_get_global):
         mock_get_global.side_effect = exceptions.InvalidArgumentsException
@@ -145,7 +156,8 @@ class TaskCommandsTestCase(test.TestCase):
         mock_api.Task.create.assert_called_once_with("deployment", "tag")
         mock_api.Task.start.assert_called_once_with(
             "deployment", mock__load_task.return_value,
-            task=mock_api.Task.create.return_value, abort_on_sla_failure=False)
+            task=mock_api.Task.create.return_value, abort_on_sla_failure=False,
+            max_parallel_subtasks=None)
 
     @mock.patch("rally.cli.commands.task.api")
     def test_abort(self, mock_api):
@@ -244,9 +256,193 @@ class TaskCommandsTestCase(test.TestCase):
         }
         mock_db.task_get_detailed = mock.MagicMock(return_value=value)
         self.task.detailed(test_uuid)
-        mock_db.task_get_detailed.assert_called_once_with(test_uuid)
+        mock_db.task_get_detailed.assert_called_once_with(test_uuid,
+                                                          load_raw=False)
 
         self.task.detailed(test_uuid, iterations_data=True)
+        mock_db.task_get_detailed.assert_called_with(test_uuid,
+                                                     load_raw=True)
+
+    @mock.patch("rally.cli.commands.task.cliutils.print_list")
+    @mock.patch("rally.cli.commands.task.db")
+    def test_detailed_stages(self, mock_db, mock_print_list):
+        raw = [{"duration": d, "idle_duration": 0, "stage": s,
+                "scenario_output": {"data": {}, "errors": None},
+                "atomic_actions": {}, "error": e}
+               for d, s, e in ((1.0, 0, None), (2.0, 1, None),
+                               (3.0, 1, ["type", "message", "traceback"]))]
+        mock_db.task_get_detailed.return_value = {
+            "id": "task",
+            "uuid": "task_uuid",
+            "status": "status",
+            "results": [{"key": {"name": "fake_name", "pos": "fake_pos",
+                                 "kw": "fake_kw"},
+                         "data": {"load_duration": 1.0,
+                                  "full_duration": 2.0,
+                                  "raw": raw}}]
+        }
+
+        self.task.detailed("task_uuid")
+
+        labels = [c[1]["table_label"]
+                  for c in mock_print_list.call_args_list]
+        self.assertEqual(["Response Times (sec)",
+                          "Response Times by Stage (sec)"], labels)
+        rows = mock_print_list.call_args_list[1][0][0]
+        self.assertEqual([(1, 1.0, "100.0%", 1), (2, 2.0, "50.0%", 2)],
+                         [(r.stage, r.max, r.success, r.count)
+                          for r in rows])
+
+    def _get_task_with_runner_info(self, best):
+        return {
+            "id": "task",
+            "uuid": "task_uuid",
+            "status": "status",
+            "results": [{"key": {"name": "fake_name", "pos": "fake_pos",
+                                 "kw": "fake_kw"},
+                         "data": {"load_duration": 1.0,
+                                  "full_duration": 2.0,
+                                  "raw": [],
+                                  "runner": {"steps": [],
+                                             "max_sustainable": best}}}]
+        }
+
+    @mock.patch("rally.cli.commands.task.sys.stdout")
+    @mock.patch("rally.cli.commands.task.db")
+    def test_detailed_max_sustainable_throughput(self, mock_db, mock_stdout):
+        mock_db.task_get_detailed.return_value = (
+            self._get_task_with_runner_info({"concurrency": 4,
+                                             "throughput": 2.5}))
+
+        self.task.detailed("task_uuid")
+
+        mock_stdout.write.assert_has_calls([mock.call(
+            "Max sustainable throughput: 2.50 iterations/s at "
+            "concurrency 4")])
+
+    @mock.patch("rally.cli.commands.task.sys.stdout")
+    @mock.patch("rally.cli.commands.task.db")
+    def test_detailed_no_sustainable_throughput(self, mock_db, mock_stdout):
+        mock_db.task_get_detailed.return_value = (
+            self._get_task_with_runner_info(None))
+
+        self.task.detailed("task_uuid")
+
+        mock_stdout.write.assert_has_calls([mock.call(
+            "Max sustainable throughput: SLA failed at any concurrency")])
+
+    @mock.patch("rally.cli.commands.task.cliutils.print_list")
+    @mock.patch("rally.cli.commands.task.db")
+    def test_detailed_summary(self, mock_db, mock_print_list):
+        row = {"success": 1, "count": 2, "min": 1.0, "median": 1.5,
+               "90%ile": 1.9, "95%ile": 1.95, "max": 2.0, "avg": 1.5}
+        summary = {"atomic": [dict(row, name="total")],
+                   "stages": [],
+                   "output": [dict(row, name="foo")]}
+        mock_db.task_get_detailed.return_value = {
+            "id": "task",
+            "uuid": "task_uuid",
+            "status": "status",
+            "results": [{"key": {"name": "fake_name", "pos": "fake_pos",
+                                 "kw": "fake_kw"},
+                         "data": {"load_duration": 1.0,
+                                  "full_duration": 2.0,
+                                  "summary": summary,
+                                  "raw": []}}]
+        }
+
+        self.task.detailed("task_uuid")
+
+        self.assertEqual(2, mock_print_list.call_count)
+        rows = mock_print_list.call_args_list[0][0][0]
+        self.assertEqual([("total", 1.0, 1.5, 2.0, "50.0%", 2)],
+                         [(r.action, r.min, r.median, r.max, r.success,
+                           r.count) for r in rows])
+        rows = mock_print_list.call_args_list[1][0][0]
+        self.assertEqual([("foo", 1.0, 1.9, 2.0)],
+                         [(r.key, r.min, r.__dict__["90%ile"], r.max)
+                          for r in rows])
+
+    @mock.patch("rally.cli.commands.task.cliutils.print_list")
+    @mock.patch("rally.cli.commands.task.db")
+    def test_detailed_running(self, mock_db, mock_print_list):
+        row = {"success": 1, "count": 1, "min": 1.0, "median": 1.0,
+               "90%ile": 1.0, "95%ile": 1.0, "max": 1.0, "avg": 1.0}
+        mock_db.task_get_detailed.return_value = {
+            "id": "task",
+            "uuid": "task_uuid",
+            "status": consts.TaskStatus.RUNNING,
+            "results": [{"key": {"name": "a", "pos": 0, "kw": {}},
+                         "data": {"load_duration": 1.0,
+                                  "full_duration": 2.0,
+                                  "summary": {"atomic": [
+                                      dict(row, name="total")],
+                                      "stages": [], "output": []}}}]
+        }
+        mock_db.task_iteration_stats.return_value = [
+            {"scenario": "a", "pos": 0, "iterations": 1, "errors": 0,
+             "min": 1.0, "avg": 1.0, "max": 1.0},
+            {"scenario": "a", "pos": 1, "iterations": 3, "errors": 1,
+             "min": 2.0, "avg": 2.5, "max": 3.0}]
+        mock_db.task_atomic_action_stats.return_value = [
+            {"scenario": "a", "pos": 0, "name": "x", "count": 1,
+             "min": 1.0, "avg": 1.0, "max": 1.0},
+            {"scenario": "a", "pos": 1, "name": "x", "count": 2,
+             "min": 1.0, "avg": 1.5, "max": 2.0}]
+
+        self.task.detailed("task_uuid")
+
+        mock_db.task_iteration_stats.assert_called_once_with("task_uuid")
+        self.assertEqual(2, mock_print_list.call_count)
+        self.assertEqual("Response Times so far (sec)",
+                         mock_print_list.call_args[1]["table_label"])
+        rows = mock_print_list.call_args[0][0]
+        self.assertEqual([("x", 1.0, 1.5, 2.0, 2),
+                          ("total", 2.0, 2.5, 3.0, 2)],
+                         [(r.action, r.min, r.avg, r.max, r.success)
+                          for r in rows])
+
+    @mock.patch("rally.cli.commands.task.cliutils.print_list")
+    @mock.patch("rally.cli.commands.task.db")
+    def test_detailed_finished(self, mock_db, mock_print_list):
+        mock_db.task_get_detailed.return_value = {
+            "id": "task", "uuid": "task_uuid",
+            "status": consts.TaskStatus.FINISHED, "results": []}
+
+        self.task.detailed("task_uuid")
+
+        self.assertFalse(mock_db.task_iteration_stats.called)
+        self.assertFalse(mock_print_list.called)
+
+    @mock.patch("rally.cli.commands.task.cliutils.print_list")
+    @mock.patch("rally.cli.commands.task.objects.Task.iter_raw_results")
+    @mock.patch("rally.cli.commands.task.db")
+    def test_detailed_lazy_raw(self, mock_db, mock_task_iter_raw_results,
+                               mock_print_list):
+        key = {"name": "fake_name", "pos": "fake_pos", "kw": "fake_kw"}
+        raw = [{"duration": 1.0, "idle_duration": 0, "atomic_actions": {},
+                "scenario_output": {"data": {"a": 1}, "errors": None},
+                "error": None}]
+        mock_db.task_get_detailed.return_value = {
+            "id": "task",
+            "uuid": "task_uuid",
+            "status": "status",
+            "results": [{"key": key,
+                         "data": {"load_duration": 1.0,
+                                  "full_duration": 2.0}}]
+        }
+        mock_task_iter_raw_results.side_effect = lambda *args: iter(raw)
+
+        self.task.detailed("task_uuid")
+
+        mock_db.task_get_detailed.assert_called_once_with("task_uuid",
+                                                          load_raw=False)
+        self.assertEqual([mock.call(key)] * 2,
+                         mock_task_iter_raw_results.call_args_list)
+        self.assertFalse(mock_db.task_result_raw_iter.called)
+        rows = mock_print_list.call_args_list[0][0][0]
+        self.assertEqual([("total", 1.0, 1)],
+                         [(r.action, r.max, r.count) for r in rows])
 
     @mock.patch("rally.cli.commands.task.db")
     @mock.patch("rally.cli.commands.task.logging")
@@ -277,7 +473,8 @@ class TaskCommandsTestCase(test.TestCase):
         test_uuid = "eb290c30-38d8-4c8f-bbcc-fc8f74b004ae"
         mock_db.task_get_detailed = mock.MagicMock(return_value=None)
         self.task.detailed(test_uuid)
-        mock_db.task_get_detailed.assert_called_once_with(test_uuid)
+        mock_db.task_get_detailed.assert_called_once_with(test_uuid,
+                                                          load_raw=False)
 
     @mock.patch("json.dumps")
     @mock.patch("rally.cli.commands.task.objects.Task.get")
@@ -304,6 +501,21 @@ class TaskCommandsTestCase(test.TestCase):
                          mock_json_dumps.call_args[1])
         mock_task_get.assert_called_once_with(task_id)
 
+    @mock.patch("json.dumps")
+    @mock.patch("rally.cli.commands.task.objects.Task.get")
+    def test_results_summary(self, mock_task_get, mock_json_dumps):
+        data = [{"key": "foo_key",
+                 "data": {"raw": [], "sla": [], "load_duration": 1.0,
+                          "full_duration": 2.0, "summary": {"atomic": []}}}]
+        mock_task_get.return_value.get_results.return_value = data
+
+        self.task.results("foo_task_id")
+
+        self.assertEqual([{"key": "foo_key", "result": [], "sla": [],
+                           "load_duration": 1.0, "full_duration": 2.0,
+                           "summary": {"atomic": []}}],
+                         mock_json_dumps.call_args[0][0])
+
     @mock.patch("rally.cli.commands.task.sys.stdout")
     @mock.patch("rally.cli.commands.task.objects.Task.get")
     def test_results_no_data(self, mock_task_get, mock_stdout):
@@ -360,11 +572,14 @@ class TaskCommandsTestCase(test.TestCase):
 
         mock_open.side_effect().write.assert_called_once_with("html_report")
         mock_task_get.assert_called_once_with(task_id)
+        mock_results.assert_called_once_with(load_raw=True)
 
         reset_mocks()
+        mock_results.reset_mock()
         self.task.report(tasks=task_id, out="/tmp/%s.html" % task_id,
                          out_format="junit")
         mock_open.assert_called_once_with("/tmp/%s.html" % task_id, "w+")
+        mock_results.assert_called_once_with(load_raw=False)
 
         reset_mocks()
         self.task.report(task_id, out="spam.html", open_it=True)
@@ -604,6 +819,7 @@ class TaskCommandsTestCase(test.TestCase):
         result = self.task.sla_check(task_id="fake_task_id")
         self.assertEqual(1, result)
         mock_task_get.assert_called_with("fake_task_id")
+        mock_task_get().get_results.assert_called_with(load_raw=False)
 
         data[0]["data"]["sla"][0]["success"] = True
         mock_task_get().get_results.return_value = data
@@ -611,6 +827,71 @@ class TaskCommandsTestCase(test.TestCase):
         result = self.task.sla_check(task_id="fake_task_id", tojson=True)
         self.assertEqual(0, result)
 
+    def _get_trends(self):
+        return [{"task_uuid": "uuid%d" % i,
+                 "created_at": date.datetime(2015, 8, i + 1),
+                 "pos": 0, "count": 4, "success": i, "min": 1.0,
+                 "median": 1.5, "90%ile": 1.9, "95%ile": 1.95, "max": 2.0,
+                 "avg": 1.5} for i in range(3)]
+
+    @mock.patch("rally.cli.commands.task.cliutils.print_list")
+    @mock.patch("rally.cli.commands.task.db.task_trends")
+    def test_trends(self, mock_task_trends, mock_print_list):
+        mock_task_trends.return_value = self._get_trends()
+
+        self.assertIsNone(self.task.trends("Foo.bar", action="foo",
+                                           limit=10, status="finished"))
+
+        mock_task_trends.assert_called_once_with(
+            "Foo.bar", action="foo", limit=10, status="finished",
+            deployment=None)
+        rows = mock_print_list.call_args[0][0]
+        self.assertEqual(
+            [("uuid0", "2015-08-01 00:00:00", "0.0%"),
+             ("uuid1", "2015-08-02 00:00:00", "25.0%"),
+             ("uuid2", "2015-08-03 00:00:00", "50.0%")],
+            [(r.task_uuid, r.created_at, r.success) for r in rows])
+        self.assertEqual("foo of Foo.bar (sec)",
+                         mock_print_list.call_args[1]["table_label"])
+
+    @mock.patch("rally.cli.commands.task.cliutils.print_list")
+    @mock.patch("rally.cli.commands.task.db.task_trends")
+    def test_trends_no_iterations(self, mock_task_trends, mock_print_list):
+        trends = self._get_trends()[:1]
+        trends[0].update({"count": 0, "success": 0, "min": None,
+                          "median": None, "90%ile": None, "95%ile": None,
+                          "max": None, "avg": None})
+        mock_task_trends.return_value = trends
+
+        self.assertIsNone(self.task.trends("Foo.bar"))
+
+        rows = mock_print_list.call_args[0][0]
+        self.assertEqual([("0.0%", 0)], [(r.success, r.count) for r in rows])
+
+    @mock.patch("rally.cli.commands.task.json.dumps")
+    @mock.patch("rally.cli.commands.task.db.task_trends")
+    def test_trends_json(self, mock_task_trends, mock_json_dumps):
+        mock_task_trends.return_value = self._get_trends()
+
+        self.task.trends("Foo.bar", deployment="foo_deployment",
+                         tojson=True)
+
+        mock_task_trends.assert_called_once_with(
+            "Foo.bar", action="total", limit=60, status=None,
+            deployment="foo_deployment")
+        rows = mock_json_dumps.call_args[0][0]
+        self.assertEqual("2015-08-02 00:00:00", rows[1]["created_at"])
+        self.assertEqual("25.0%", rows[1]["success"])
+
+    @mock.patch("rally.cli.commands.task.db.task_trends", return_value=[])
+    def test_trends_no_results(self, mock_task_trends):
+        self.assertEqual(1, self.task.trends("Foo.bar"))
+
+    @mock.patch("rally.cli.commands.task.db.task_trends")
+    def test_trends_invalid_status(self, mock_task_trends):
+        self.assertEqual(1, self.task.trends("Foo.bar", status="foo"))
+        self.assertFalse(mock_task_trends.called)
+
     @mock.patch("rally.api.Task.validate")
     @mock.patch("rally.cli.commands.task.open",
                 side_effect=mock.mock_open(read_data="{\"some\": \"json\"}"),
@@ -26,7 +26,8 @@ class CmdManageTestCase(test.TestCase):
     @mock.patch("rally.cli.manage.cliutils")
     def test_main(self, mock_cliutils):
         manage.main()
-        categories = {"db": manage.DBCommands,
+        categories = {"agent": manage.AgentCommands,
+                      "db": manage.DBCommands,
                       "tempest": manage.TempestCommands}
         mock_cliutils.run.assert_called_once_with(sys.argv, categories)
 
@@ -43,6 +44,24 @@ class DBCommandsTestCase(test.TestCase):
         calls = [mock.call.db_drop(), mock.call.db_create()]
         self.assertEqual(calls, mock_db.mock_calls)
 
+    @mock.patch("rally.cli.manage.db")
+    def test_upgrade(self, mock_db):
+        mock_db.task_result_migrate.return_value = 2
+        self.db_commands.upgrade()
+        calls = [mock.call.db_create(),
+                 mock.call.task_result_migrate(
+                     manage.putils.get_results_summary)]
+        self.assertEqual(calls, mock_db.mock_calls)
+
+
+class AgentCommandsTestCase(test.TestCase):
+
+    @mock.patch("rally.cli.manage.agent.Agent")
+    def test_start(self, mock_agent):
+        manage.AgentCommands().start(5000, host="10.0.0.1", name="example")
+        mock_agent.assert_called_once_with("10.0.0.1", 5000, name="example")
+        mock_agent.return_value.serve.assert_called_once_with()
+
 
 class TempestCommandsTestCase(test.TestCase):
 
@@ -15,14 +15,28 @@
 
 """Tests for db.api layer."""
 
+import datetime
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import mock
+from oslo_config import cfg
 from six import moves
+import sqlalchemy as sa
 
 from rally.common import db
+from rally.common.db.sqlalchemy import api as db_api
 from rally import consts
 from rally import exceptions
+from rally.task.processing import utils as putils
 from tests.unit import test
 
 
+CONF = cfg.CONF
+
+
 class TasksTestCase(test.DBTestCase):
     def setUp(self):
         super(TasksTestCase, self).setUp()
@@ -162,6 +176,284 @@ class TasksTestCase(test.DBTestCase):
             self.assertEqual(res[0]["key"], data)
             self.assertEqual(res[0]["data"], data)
 
+    def test_task_delete_with_result_chunks(self):
+        task_id = self._create_task()["uuid"]
+        db.task_result_chunk_create(
+            task_id, {"name": "a", "pos": 0},
+            [{"duration": 1, "atomic_actions": {"a": 1}}])
+        db.task_delete(task_id)
+        self.assertEqual([], db.task_result_chunk_get_all_by_uuid(task_id))
+        self.assertEqual([], db.task_iteration_stats(task_id))
+        self.assertEqual([], db.task_atomic_action_stats(task_id))
+
+    def test_task_result_chunk_get_all_by_uuid(self):
+        task1 = self._create_task()["uuid"]
+        task2 = self._create_task()["uuid"]
+        key = {"name": "atata", "pos": 0}
+
+        db.task_result_chunk_create(task1, key, [{"a": 1}, {"a": 2}])
+        db.task_result_chunk_create(task2, key, [{"b": 1}])
+        db.task_result_chunk_create(task1, key, [{"a": 3}])
+
+        chunks = db.task_result_chunk_get_all_by_uuid(task1)
+        self.assertEqual([key, key], [chunk["key"] for chunk in chunks])
+        self.assertEqual([[{"a": 1}, {"a": 2}], [{"a": 3}]],
+                         [chunk["data"] for chunk in chunks])
+
+    def test_task_result_get_all_by_uuid_with_chunks(self):
+        task_id = self._create_task()["uuid"]
+        key1 = {"name": "atata", "pos": 0}
+        key2 = {"pos": 1, "name": "atata"}
+        db.task_result_chunk_create(task_id, key1, [{"a": 1}, {"a": 2}])
+        db.task_result_chunk_create(task_id, key2, [{"b": 1}])
+        db.task_result_chunk_create(task_id, key1, [{"a": 3}])
+        db.task_result_create(task_id, key1, {"sla": []})
+        db.task_result_create(task_id, key2, {"sla": []})
+        db.task_result_create(task_id, {"name": "atata", "pos": 2},
+                              {"sla": []})
+        db.task_result_create(task_id, {"name": "atata", "pos": 3},
+                              {"sla": [], "raw": [{"c": 1}]})
+
+        res = db.task_result_get_all_by_uuid(task_id)
+        self.assertEqual([[{"a": 1}, {"a": 2}, {"a": 3}], [{"b": 1}], None,
+                          [{"c": 1}]],
+                         [r["data"].get("raw") for r in res])
+        self.assertEqual([[]] * 4, [r["data"]["sla"] for r in res])
+
+        # Raw results are never saved into the task results
+        res = db.task_result_get_all_by_uuid(task_id)
+        res[0]["data"]["sla"] = [{"success": True}]
+        db.task_result_chunk_create(task_id, key1, [{"a": 4}])
+        self.assertEqual([{"a": 1}, {"a": 2}, {"a": 3}, {"a": 4}],
+                         db.task_get_detailed(task_id).results[0].data["raw"])
+
+    def test_task_result_get_all_by_uuid_without_raw(self):
+        task_id = self._create_task()["uuid"]
+        key = {"name": "atata", "pos": 0}
+        db.task_result_chunk_create(task_id, key, [{"a": 1}])
+        db.task_result_create(task_id, key, {"sla": []})
+
+        res = db.task_result_get_all_by_uuid(task_id, load_raw=False)
+        self.assertEqual([{"sla": []}], [r["data"] for r in res])
+        task = db.task_get_detailed(task_id, load_raw=False)
+        self.assertEqual([{"sla": []}], [r["data"] for r in task.results])
+        task = db.task_get_detailed_last(load_raw=False)
+        self.assertEqual([{"sla": []}], [r["data"] for r in task.results])
+
+    def test_task_result_raw_iter(self):
+        task_id = self._create_task()["uuid"]
+        key1 = {"name": "atata", "pos": 0}
+        key2 = {"pos": 1, "name": "atata"}
+        key3 = {"name": "atata", "pos": 2}
+        db.task_result_chunk_create(task_id, key1, [{"a": 1}, {"a": 2}])
+        db.task_result_chunk_create(task_id, key2, [{"b": 1}])
+        db.task_result_chunk_create(task_id, key1, [{"a": 3}])
+        db.task_result_create(task_id, key3, {"sla": [], "raw": [{"c": 1}]})
+
+        raw_iter = db.task_result_raw_iter(task_id, key1)
+        self.assertEqual({"a": 1}, next(raw_iter))
+        self.assertEqual([{"a": 2}, {"a": 3}], list(raw_iter))
+        self.assertEqual([{"b": 1}],
+                         list(db.task_result_raw_iter(task_id,
+                                                      {"name": "atata",
+                                                       "pos": 1})))
+        self.assertEqual([{"c": 1}],
+                         list(db.task_result_raw_iter(task_id, key3)))
+        self.assertEqual([], list(db.task_result_raw_iter(
+            task_id, {"name": "atata", "pos": 3})))
+        self.assertEqual([], list(db.task_result_raw_iter(
+            task_id, {"name": "other", "pos": 0})))
+
+    def test_task_iteration_stats(self):
+        task_id = self._create_task()["uuid"]
+        other_task_id = self._create_task()["uuid"]
+        db.task_result_chunk_create(
+            task_id, {"name": "a", "pos": 0},
+            [{"duration": 1.0, "idle_duration": 0, "timestamp": 1, "error": [],
+              "atomic_actions": {"x": 0.5, "y": 0.5}},
+             {"duration": 3.0, "idle_duration": 0, "timestamp": 2, "error": [],
+              "atomic_actions": {"x": 1.5, "y": None}},
+             {"duration": 9.0, "idle_duration": 0, "timestamp": 3,
+              "error": ["E", "m", "t"], "atomic_actions": {"x": 9.0}}])
+        db.task_result_chunk_create(
+            task_id, {"name": "a", "pos": 1},
+            [{"duration": 1.0, "error": ["E", "m", "t"]}])
+        db.task_result_chunk_create(
+            task_id, {"name": "b", "pos": 0},
+            [{"duration": 4.0, "error": [], "atomic_actions": {"x": 4.0}}])
+        db.task_result_chunk_create(
+            other_task_id, {"name": "a", "pos": 0},
+            [{"duration": 5.0, "error": [], "atomic_actions": {"x": 5.0}}])
+
+        self.assertEqual(
+            [{"scenario": "a", "pos": 0, "iterations": 3, "errors": 1,
+              "min": 1.0, "avg": 2.0, "max": 3.0},
+             {"scenario": "a", "pos": 1, "iterations": 1, "errors": 1,
+              "min": None, "avg": None, "max": None},
+             {"scenario": "b", "pos": 0, "iterations": 1, "errors": 0,
+              "min": 4.0, "avg": 4.0, "max": 4.0}],
+            db.task_iteration_stats(task_id))
+        self.assertEqual(
+            [{"scenario": "a", "pos": 0, "name": "x", "count": 2,
+              "min": 0.5, "avg": 1.0, "max": 1.5},
+             {"scenario": "a", "pos": 0, "name": "y", "count": 1,
+              "min": 0.5, "avg": 0.5, "max": 0.5},
+             {"scenario": "b", "pos": 0, "name": "x", "count": 1,
+              "min": 4.0, "avg": 4.0, "max": 4.0}],
+            db.task_atomic_action_stats(task_id))
+
+    def test_task_result_migrate(self):
+        task_id = self._create_task()["uuid"]
+        key = {"name": "a", "pos": 0}
+        raw = [{"duration": 1.0, "error": [], "atomic_actions": {"x": 1.0}},
+               {"duration": 2.0, "error": ["E", "m", "t"],
+                "atomic_actions": {}}]
+        db.task_result_create(task_id, key, {"raw": raw, "sla": []})
+        db.task_result_create(task_id, {"name": "b", "pos": 1},
+                              {"raw": [], "sla": []})
+
+        self.assertEqual(1, db.task_result_migrate(putils.get_results_summary))
+        self.assertEqual(0, db.task_result_migrate(putils.get_results_summary))
+
+        chunks = db.task_result_chunk_get_all_by_uuid(task_id)
+        self.assertEqual([raw], [chunk["data"] for chunk in chunks])
+        self.assertEqual([{"scenario": "a", "pos": 0, "iterations": 2,
+                           "errors": 1, "min": 1.0, "avg": 1.0, "max": 1.0}],
+                         db.task_iteration_stats(task_id))
+        res = db.task_result_get_all_by_uuid(task_id)
+        self.assertEqual([raw, []], [r["data"]["raw"] for r in res])
+        self.assertEqual([[], []], [r["data"]["sla"] for r in res])
+        self.assertEqual(["x", "total"],
+                         [row["name"]
+                          for row in res[0]["data"]["summary"]["atomic"]])
+        self.assertEqual([(1.0, 2, 1)],
+                         [(r["max"], r["count"], r["success"])
+                          for r in db.task_trends("a")])
+
+    def test_task_result_migrate_duration_stats(self):
+        task_id = self._create_task()["uuid"]
+        summary = {"atomic": [{"name": "total", "count": 1, "success": 1,
+                               "min": 1, "median": 1, "90%ile": 1,
+                               "95%ile": 1, "max": 1, "avg": 1}],
+                   "stages": [], "output": []}
+        db.task_result_create(task_id, {"name": "a", "pos": 0},
+                              {"sla": [], "summary": summary})
+        db.task_result_create(task_id, {"name": "a", "pos": 1},
+                              {"sla": []})
+        # Summary saved before the duration stats table was added
+        task_id = self._create_task()["uuid"]
+        db.task_result_create(task_id, {"name": "a", "pos": 0},
+                              {"sla": []})
+        result = db.task_result_get_all_by_uuid(task_id)[0]
+        result.data = {"sla": [], "summary": summary}
+        result.save()
+        self.assertEqual(1, len(db.task_trends("a")))
+
+        self.assertEqual(1, db.task_result_migrate(putils.get_results_summary))
+        self.assertEqual(0, db.task_result_migrate(putils.get_results_summary))
+        self.assertEqual(2, len(db.task_trends("a")))
+
+    def test_task_result_migrate_scenarios_at_same_pos(self):
+        task_id = self._create_task()["uuid"]
+        for name in ("A.a", "B.b"):
+            db.task_result_create(task_id, {"name": name, "pos": 0},
+                                  {"raw": [{"duration": 1.0, "error": [],
+                                            "atomic_actions": {}}],
+                                   "sla": []})
+
+        self.assertEqual(2, db.task_result_migrate(putils.get_results_summary))
+
+        self.assertEqual(["A.a", "B.b"],
+                         sorted(row["scenario"]
+                                for row in db.task_iteration_stats(task_id)))
+        self.assertEqual(1, len(db.task_trends("A.a")))
+        self.assertEqual(1, len(db.task_trends("B.b")))
+
+    def _get_summary(self, *rows):
+        keys = ("name", "count", "success", "min", "median", "90%ile",
+                "95%ile", "max", "avg")
+        return {"atomic": [dict(zip(keys, row)) for row in rows],
+                "stages": [], "output": []}
+
+    def test_task_result_bulk_create(self):
+        task_id = self._create_task()["uuid"]
+        results = [
+            {"key": {"name": "Foo.bar", "pos": 0},
+             "data": {"sla": [], "summary": self._get_summary(
+                 ("boot", 2, 2, 1, 1, 1, 1, 1, 1),
+                 ("total", 2, 2, 2, 2, 2, 2, 2, 2))}},
+            {"key": {"name": "Foo.baz", "pos": 1},
+             "data": {"sla": [{"success": False}], "raw": []}}]
+
+        self.assertEqual(2, db.task_result_bulk_create(task_id, results))
+
+        self.assertEqual(
+            results,
+            [{"key": r["key"], "data": r["data"]}
+             for r in db.task_result_get_all_by_uuid(task_id)])
+        self.assertEqual(
+            [2], [r["avg"] for r in db.task_trends("Foo.bar")])
+        self.assertEqual(
+            [1], [r["avg"] for r in db.task_trends("Foo.bar", "boot")])
+        self.assertEqual([], db.task_trends("Foo.baz"))
+
+    def test_task_result_bulk_create_empty(self):
+        task_id = self._create_task()["uuid"]
+        self.assertEqual(0, db.task_result_bulk_create(task_id, []))
+        self.assertEqual([], db.task_result_get_all_by_uuid(task_id))
+
+    def test_task_trends(self):
+        other_deploy = db.deployment_create({})
+        tasks = [self._create_task({"status": status})["uuid"]
+                 for status in ("finished", "failed", "finished")]
+        tasks.append(self._create_task(
+            {"deployment_uuid": other_deploy["uuid"]})["uuid"])
+        for i, task_id in enumerate(tasks):
+            db.task_result_create(
+                task_id, {"name": "Foo.bar", "pos": 0},
+                {"sla": [], "summary": self._get_summary(
+                    ("boot", 2, 2, i, i, i, i, i, i),
+                    ("total", 2, 1, i + 1, i + 1, i + 1, i + 1, i + 1,
+                     i + 1))})
+        db.task_result_create(
+            tasks[0], {"name": "Foo.bar", "pos": 1},
+            {"sla": [], "summary": self._get_summary(
+                ("total", 1, 0, None, None, None, None, None, None))})
+        db.task_result_create(
+            tasks[0], {"name": "Foo.baz", "pos": 2},
+            {"sla": [], "summary": self._get_summary(
+                ("total", 1, 1, 5, 5, 5, 5, 5, 5))})
+        db.task_result_create(tasks[1], {"name": "Foo.bar", "pos": 3},
+                              {"sla": []})
+
+        trends = db.task_trends("Foo.bar")
+        self.assertEqual(
+            [(tasks[0], 0, 1, 1.0), (tasks[0], 1, None, None),
+             (tasks[1], 0, 2, 2.0), (tasks[2], 0, 3, 3.0),
+             (tasks[3], 0, 4, 4.0)],
+            [(r["task_uuid"], r["pos"], r["95%ile"], r["avg"])
+             for r in trends])
+        self.assertEqual({"task_uuid": tasks[0], "pos": 0, "count": 2,
+                          "success": 1, "min": 1, "median": 1,
+                          "90%ile": 1, "95%ile": 1, "max": 1, "avg": 1},
+                         dict((k, v) for k, v in trends[0].items()
+                              if k != "created_at"))
+        self.assertIsNotNone(trends[0]["created_at"])
+
+        self.assertEqual(
+            [(tasks[2], 2), (tasks[3], 3)],
+            [(r["task_uuid"], r["min"])
+             for r in db.task_trends("Foo.bar", action="boot", limit=2)])
+        self.assertEqual(
+            [tasks[0], tasks[0], tasks[2]],
+            [r["task_uuid"] for r in db.task_trends(
+                "Foo.bar", status="finished", deployment=self.deploy["uuid"])])
+        self.assertEqual([], db.task_trends("Foo.bar", action="unknown"))
+
+        db.task_delete(tasks[0])
+        self.assertEqual([tasks[1], tasks[2], tasks[3]],
+                         [r["task_uuid"] for r in db.task_trends("Foo.bar")])
+
     def test_task_get_detailed(self):
         task1 = self._create_task()
         key = {"name": "atata"}
@@ -450,3 +742,140 @@ class WorkerTestCase(test.DBTestCase):
 
     def test_update_worker_not_found(self):
         self.assertRaises(exceptions.WorkerNotFound, db.update_worker, "fake")
+
+    def test_get_workers(self):
+        db.register_worker({"hostname": "test2"})
+        workers = db.get_workers()
+        self.assertEqual(["test", "test2"],
+                         sorted(w["hostname"] for w in workers))
+
+    def test_get_workers_updated_since(self):
+        updated_at = self.worker["updated_at"]
+        workers = db.get_workers(updated_since=updated_at)
+        self.assertEqual(["test"], [w["hostname"] for w in workers])
+        workers = db.get_workers(
+            updated_since=updated_at + datetime.timedelta(seconds=1))
+        self.assertEqual([], workers)
+
+
+def _write_results(task_uuid, worker, iterations, errors):
+    try:
+        for i in moves.range(iterations):
+            key = {"name": "scenario", "pos": worker}
+            db.task_result_chunk_create(task_uuid, key,
+                                        [{"duration": float(i)}] * 10)
+            db.task_update(task_uuid, {"verification_log": str(i)})
+            db.task_result_chunk_get_all_by_uuid(task_uuid)
+            db.task_list()
+    except Exception as e:
+        errors.put("%s: %s" % (type(e).__name__, e))
+
+
+class SQLiteTestCase(test.TestCase):
+
+    def setUp(self):
+        super(SQLiteTestCase, self).setUp()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self._set_options(
+            connection="sqlite:///%s" % os.path.join(tmp_dir, "rally.db"))
+        self.addCleanup(db.db_cleanup)
+        db.db_cleanup()
+
+    def _set_options(self, **options):
+        for name, value in options.items():
+            CONF.set_override(name, value, group="database")
+            self.addCleanup(CONF.clear_override, name, group="database")
+
+    def _get_pragmas(self):
+        with db_api.get_engine().connect() as conn:
+            return [conn.execute("PRAGMA %s" % name).scalar()
+                    for name in ("journal_mode", "busy_timeout",
+                                 "synchronous")]
+
+    def test_engine_defaults(self):
+        db.db_create()
+
+        self.assertIsInstance(db_api.get_engine().pool,
+                              sa.pool.QueuePool)
+        # synchronous NORMAL is 1
+        self.assertEqual(["wal", 30000, 1], self._get_pragmas())
+
+    def test_engine_options(self):
+        self._set_options(sqlite_journal_mode="DELETE",
+                          sqlite_busy_timeout=2.5,
+                          sqlite_synchronous_level="FULL",
+                          sqlite_pool_size=0)
+        db.db_create()
+
+        self.assertIsInstance(db_api.get_engine().pool,
+                              sa.pool.NullPool)
+        self.assertEqual(["delete", 2500, 2], self._get_pragmas())
+
+    def test_engine_pool_options(self):
+        self._set_options(sqlite_pool_size=3)
+
+        pool = db_api.get_engine().pool
+
+        self.assertIsInstance(pool, sa.pool.QueuePool)
+        self.assertEqual(3, pool.size())
+
+    def test_engine_synchronous_off(self):
+        self._set_options(sqlite_synchronous=False)
+        db.db_create()
+
+        self.assertEqual(0, self._get_pragmas()[2])
+
+    def test_engine_errors_are_translated(self):
+        db.db_create()
+        db.deployment_create({"name": "foo"})
+
+        self.assertRaises(exceptions.DeploymentNameExists,
+                          db.deployment_create, {"name": "foo"})
+
+    def test_engine_memory(self):
+        self._set_options(connection="sqlite://")
+
+        engine = db_api.get_engine()
+
+        self.assertNotIsInstance(engine.pool, sa.pool.QueuePool)
+        with engine.connect() as conn:
+            self.assertEqual(
+                "memory", conn.execute("PRAGMA journal_mode").scalar())
+
+    def test_connection_not_shared_with_forked_process(self):
+        db.db_create()
+        engine = db_api.get_engine()
+        with engine.connect() as conn:
+            parent_con = conn.connection.connection
+
+        with mock.patch("os.getpid", return_value=-1):
+            with engine.connect() as conn:
+                child_con = conn.connection.connection
+
+        self.assertIsNot(parent_con, child_con)
+
+    def test_concurrent_writers(self):
+        db.db_create()
+        deployment = db.deployment_create({})
+        task = db.task_create({"deployment_uuid": deployment["uuid"]})
+        errors = multiprocessing.Queue()
+        workers, iterations = 4, 20
+
+        processes = [
+            multiprocessing.Process(
+                target=_write_results,
+                args=(task["uuid"], worker, iterations, errors))
+            for worker in moves.range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        messages = []
+        while not errors.empty():
+            messages.append(errors.get())
+        self.assertEqual([], messages)
+        self.assertEqual(
+            workers * iterations,
+            len(db.task_result_chunk_get_all_by_uuid(task["uuid"])))
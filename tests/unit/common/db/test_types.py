@@ -0,0 +1,148 @@
+# Copyright 2015: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import zlib
+
+import ddt
+import mock
+from oslo_config import cfg
+import testtools
+
+from rally.common import costilius
+from rally.common import db
+from rally.common.db.sqlalchemy import types
+from rally import exceptions
+from tests.unit import test
+
+
+CONF = cfg.CONF
+
+
+@ddt.ddt
+class BigJSONEncodedDictTestCase(test.TestCase):
+
+    def setUp(self):
+        super(BigJSONEncodedDictTestCase, self).setUp()
+        self.type = types.BigJSONEncodedDict()
+        self.value = costilius.OrderedDict([
+            ("raw", [{"duration": 1.5, "error": [], "name": u"т"}]),
+            ("sla", []), ("a", {"b": None})])
+
+    def _set_options(self, **options):
+        for name, value in options.items():
+            CONF.set_override(name, value, group="database")
+            self.addCleanup(CONF.clear_override, name, group="database")
+
+    def test_process_bind_param_default(self):
+        value = self.type.process_bind_param(self.value, None)
+
+        self.assertTrue(value.startswith("{\"raw\": ["))
+        result = self.type.process_result_value(value, None)
+        self.assertEqual(self.value, result)
+        self.assertEqual(["raw", "sla", "a"], list(result))
+
+    def test_process_none(self):
+        self.assertIsNone(self.type.process_bind_param(None, None))
+        self.assertIsNone(self.type.process_result_value(None, None))
+
+    @ddt.data("zlib", "lz4")
+    def test_process_compressed(self, compression):
+        if compression == "lz4" and not types.lz4_frame:
+            self.skipTest("lz4 is not installed")
+        self._set_options(big_json_compression=compression)
+
+        value = self.type.process_bind_param(self.value, None)
+
+        self.assertTrue(value.startswith(compression + ":"))
+        self.assertEqual(self.value,
+                         self.type.process_result_value(value, None))
+
+        # Values are readable regardless of the current options
+        self._set_options(big_json_compression="none")
+        self.assertEqual(self.value,
+                         self.type.process_result_value(value, None))
+        plain = self.type.process_bind_param(self.value, None)
+        self._set_options(big_json_compression=compression)
+        self.assertEqual(self.value,
+                         self.type.process_result_value(plain, None))
+
+    @mock.patch("rally.common.db.sqlalchemy.types.zlib.compress",
+                wraps=zlib.compress)
+    def test_process_zlib_level(self, mock_compress):
+        self._set_options(big_json_compression="zlib",
+                          big_json_compression_level=9)
+
+        value = self.type.process_bind_param(self.value, None)
+
+        self.assertEqual(9, mock_compress.call_args[0][1])
+        self.assertEqual(self.value,
+                         self.type.process_result_value(value, None))
+
+    @ddt.data(0, 10)
+    def test_zlib_level_out_of_range(self, level):
+        self.assertRaises(ValueError, CONF.set_override,
+                          "big_json_compression_level", level,
+                          group="database")
+
+    def test_process_lz4_not_installed(self):
+        self._set_options(big_json_compression="lz4")
+        with mock.patch.object(types, "lz4_frame", None):
+            self.assertRaises(exceptions.RallyException,
+                              self.type.process_bind_param, self.value, None)
+
+    @testtools.skipIf(not types.ujson, "ujson is not installed")
+    def test_process_ujson(self):
+        self._set_options(big_json_backend="ujson")
+
+        value = self.type.process_bind_param(self.value, None)
+
+        self.assertEqual(self.value,
+                         self.type.process_result_value(value, None))
+        self._set_options(big_json_backend="json")
+        self.assertEqual(self.value,
+                         self.type.process_result_value(value, None))
+
+    @mock.patch("rally.common.db.sqlalchemy.types.LOG")
+    def test_process_ujson_not_installed(self, mock_log):
+        self._set_options(big_json_backend="ujson")
+
+        with mock.patch.object(types, "ujson", None):
+            with mock.patch.object(types, "_WARNED", set()):
+                value = self.type.process_bind_param(self.value, None)
+                result = self.type.process_result_value(value, None)
+
+        self.assertEqual(self.value, result)
+        self.assertEqual(["raw", "sla", "a"], list(result))
+        self.assertEqual(1, mock_log.warning.call_count)
+
+
+class BigJSONEncodedDictDBTestCase(test.DBTestCase):
+
+    def test_task_result_compressed(self):
+        CONF.set_override("big_json_compression", "zlib", group="database")
+        self.addCleanup(CONF.clear_override, "big_json_compression",
+                        group="database")
+        deployment_id = db.deployment_create({})["uuid"]
+        task_id = db.task_create({"deployment_uuid": deployment_id})["uuid"]
+        data = {"raw": [{"duration": 1.0}] * 10, "sla": []}
+
+        db.task_result_create(task_id, {"name": "a", "pos": 0}, data)
+        db.task_result_chunk_create(task_id, {"name": "a", "pos": 1},
+                                    data["raw"])
+
+        results = db.task_result_get_all_by_uuid(task_id)
+        self.assertEqual([data], [r["data"] for r in results])
+        chunks = db.task_result_chunk_get_all_by_uuid(task_id)
+        self.assertEqual([data["raw"]], [c["data"] for c in chunks])
@@ -146,9 +146,26 @@ class TaskTestCase(test.TestCase):
         task = objects.Task(task=self.task)
         results = task.get_results()
         mock_task_result_get_all_by_uuid.assert_called_once_with(
-            self.task["uuid"])
+            self.task["uuid"], load_raw=True)
         self.assertEqual(results, "foo_results")
 
+    @mock.patch("rally.common.objects.task.db.task_result_get_all_by_uuid",
+                return_value="foo_results")
+    def test_get_results_without_raw(self, mock_task_result_get_all_by_uuid):
+        task = objects.Task(task=self.task)
+        results = task.get_results(load_raw=False)
+        mock_task_result_get_all_by_uuid.assert_called_once_with(
+            self.task["uuid"], load_raw=False)
+        self.assertEqual(results, "foo_results")
+
+    @mock.patch("rally.common.objects.task.db.task_result_raw_iter",
+                return_value=iter(["foo_raw"]))
+    def test_iter_raw_results(self, mock_task_result_raw_iter):
+        task = objects.Task(task=self.task)
+        self.assertEqual(["foo_raw"], list(task.iter_raw_results("key")))
+        mock_task_result_raw_iter.assert_called_once_with(
+            self.task["uuid"], "key")
+
     @mock.patch("rally.common.objects.task.db.task_result_create")
     def test_append_results(self, mock_task_result_create):
         task = objects.Task(task=self.task)
@@ -156,6 +173,21 @@ class TaskTestCase(test.TestCase):
         mock_task_result_create.assert_called_once_with(
             self.task["uuid"], "opt", "val")
 
+    @mock.patch("rally.common.objects.task.db.task_result_bulk_create")
+    def test_extend_results(self, mock_task_result_bulk_create):
+        task = objects.Task(task=self.task)
+        results = [{"key": "opt", "data": "val"}]
+        task.extend_results(results)
+        mock_task_result_bulk_create.assert_called_once_with(
+            self.task["uuid"], results)
+
+    @mock.patch("rally.common.objects.task.db.task_result_chunk_create")
+    def test_append_results_chunk(self, mock_task_result_chunk_create):
+        task = objects.Task(task=self.task)
+        task.append_results_chunk("opt", ["val"])
+        mock_task_result_chunk_create.assert_called_once_with(
+            self.task["uuid"], "opt", ["val"])
+
     @mock.patch("rally.common.objects.task.db.task_update")
     def test_set_failed(self, mock_task_update):
         mock_task_update.return_value = self.task
@@ -13,12 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import ddt
-
+import json
 import math
+import random
+
+import ddt
 
 from rally.common import streaming_algorithms as algo
 from rally import exceptions
+from rally.task.processing import utils
 from tests.unit import test
 
 
@@ -152,6 +155,128 @@ class PercentileComputationTestCase(test.TestCase):
         self.assertRaises(ValueError, comp.result)
 
 
+@ddt.ddt
+class HistogramPercentileComputationTestCase(test.TestCase):
+
+    def _get_values(self, count, seed=42):
+        rnd = random.Random(seed)
+        return [rnd.lognormvariate(0, 1) for i in range(count)]
+
+    def _get_exact(self, values, percent):
+        return utils.percentile(list(values), percent / 100.0)
+
+    @ddt.data(0.01, 0.001, 0.05)
+    def test_accuracy(self, relative_error):
+        values = self._get_values(20000)
+        comp = algo.HistogramPercentileComputation(
+            relative_error=relative_error, max_buckets=10000)
+        for value in values:
+            comp.add(value)
+
+        for percent in (0, 1, 10, 25, 50, 75, 90, 95, 99, 99.9, 100):
+            exact = self._get_exact(values, percent)
+            self.assertLessEqual(
+                abs(comp.percentile(percent) - exact) / exact,
+                relative_error, "Percent %s" % percent)
+
+    @ddt.data(
+        {"stream": "mixed16", "percent": 50},
+        {"stream": "mixed50", "percent": 90},
+        {"stream": "mixed5000", "percent": 25},
+        {"stream": "range5000", "percent": 99})
+    @ddt.unpack
+    def test_result(self, stream, percent):
+        values = getattr(PercentileComputationTestCase, stream)
+        comp = algo.HistogramPercentileComputation(percent=percent)
+        for value in values:
+            comp.add(value)
+
+        exact = self._get_exact(values, percent)
+        self.assertLessEqual(abs(comp.result() - exact) / exact, 0.01)
+
+    def test_negative_and_zero_values(self):
+        values = [-10, -1, -0.5, 0, 0, 0.5, 1, 10]
+        comp = algo.HistogramPercentileComputation(relative_error=0.001)
+        for value in values:
+            comp.add(value)
+
+        for percent in (0, 10, 30, 40, 50, 60, 90, 100):
+            self.assertAlmostEqual(self._get_exact(values, percent),
+                                   comp.percentile(percent), delta=0.01)
+
+    def test_single_value(self):
+        comp = algo.HistogramPercentileComputation()
+        comp.add(3.3)
+        self.assertEqual(3.3, comp.result())
+        self.assertEqual(3.3, comp.percentile(99.9))
+
+    def test_memory_is_bounded(self):
+        comp = algo.HistogramPercentileComputation()
+        # Durations from 1 ms to 1 hour
+        for i in range(100000):
+            comp.add(0.001 * 3600000 ** (i / 100000.0))
+
+        self.assertEqual(100000, comp.count)
+        self.assertLess(len(comp._positive), 800)
+
+    def test_max_buckets(self):
+        values = self._get_values(10000)
+        comp = algo.HistogramPercentileComputation(max_buckets=200)
+        for value in values:
+            comp.add(value)
+
+        self.assertEqual(200, len(comp._positive))
+        # The highest percentiles keep their accuracy
+        for percent in (90, 99, 100):
+            exact = self._get_exact(values, percent)
+            self.assertLessEqual(
+                abs(comp.percentile(percent) - exact) / exact, 0.01)
+
+    def test_merge(self):
+        values = self._get_values(10000)
+        whole = algo.HistogramPercentileComputation()
+        parts = [algo.HistogramPercentileComputation() for i in range(4)]
+        for i, value in enumerate(values):
+            whole.add(value)
+            parts[i % 4].add(value)
+
+        merged = algo.HistogramPercentileComputation()
+        for part in parts:
+            merged.merge(part)
+        merged.merge(algo.HistogramPercentileComputation())
+
+        self.assertEqual(whole.count, merged.count)
+        for percent in (0, 5, 50, 95, 100):
+            self.assertEqual(whole.percentile(percent),
+                             merged.percentile(percent))
+
+    def test_merge_raises(self):
+        comp = algo.HistogramPercentileComputation()
+        self.assertRaises(
+            ValueError, comp.merge,
+            algo.HistogramPercentileComputation(relative_error=0.02))
+        self.assertRaises(TypeError, comp.merge,
+                          algo.PercentileComputation(50))
+
+    def test_add_raises(self):
+        comp = algo.HistogramPercentileComputation()
+        self.assertRaises(TypeError, comp.add)
+        self.assertRaises(TypeError, comp.add, None)
+        self.assertRaises(TypeError, comp.add, "str")
+
+    @ddt.data({"percent": 101}, {"percent": -1}, {"relative_error": 0},
+              {"relative_error": 1}, {"max_buckets": 1})
+    def test___init__raises(self, kwargs):
+        self.assertRaises(ValueError, algo.HistogramPercentileComputation,
+                          **kwargs)
+
+    def test_result_raises(self):
+        comp = algo.HistogramPercentileComputation()
+        self.assertRaises(ValueError, comp.result)
+        comp.add(1)
+        self.assertRaises(ValueError, comp.percentile, 101)
+
+
 class ProgressComputationTestCase(test.TestCase):
 
     def test___init__raises(self):
@@ -182,3 +307,87 @@ class IncrementComputationTestCase(test.TestCase):
             self.assertEqual(i - 1, comp.result())
             comp.add(42)
             self.assertEqual(i, comp.result())
+
+
+@ddt.ddt
+class MergeAndSerializationTestCase(test.TestCase):
+
+    stream = [55.71, 83.05, 24.12, 27, 48.36, 16.36, 96.23, 6, 16.0, 88.11,
+              29.52, 99.2, 79.96, 77.84, 85.45, 85.32, 7, 17.1, 3.02, 15.23]
+
+    @ddt.data(
+        (algo.MeanComputation, {}),
+        (algo.StdDevComputation, {}),
+        (algo.MinComputation, {}),
+        (algo.MaxComputation, {}),
+        (algo.PercentileComputation, {"percent": 90}),
+        (algo.HistogramPercentileComputation, {"percent": 90}),
+        (algo.ProgressComputation, {"base_count": 40}),
+        (algo.IncrementComputation, {}))
+    @ddt.unpack
+    def test_merge(self, cls, kwargs):
+        whole = cls(**kwargs)
+        parts = [cls(**kwargs) for i in range(3)]
+        for i, value in enumerate(self.stream):
+            whole.add(value)
+            # The last part stays empty
+            parts[i % 2].add(value)
+
+        merged = parts[0]
+        for part in parts[1:]:
+            merged.merge(part)
+
+        self.assertAlmostEqual(whole.result(), merged.result(), places=10)
+
+    @ddt.data(
+        (algo.MeanComputation, {}),
+        (algo.StdDevComputation, {}),
+        (algo.MinComputation, {}),
+        (algo.MaxComputation, {}),
+        (algo.PercentileComputation, {"percent": 90}),
+        (algo.HistogramPercentileComputation, {"percent": 90}),
+        (algo.ProgressComputation, {"base_count": 40}),
+        (algo.IncrementComputation, {}))
+    @ddt.unpack
+    def test_to_dict_from_dict(self, cls, kwargs):
+        comp = cls(**kwargs)
+        for value in self.stream:
+            comp.add(value)
+
+        data = json.loads(json.dumps(comp.to_dict()))
+        restored = cls.from_dict(data)
+
+        self.assertEqual(comp.result(), restored.result())
+        self.assertEqual(comp.to_dict(), restored.to_dict())
+        # The restored computation goes on with the stream
+        comp.add(42)
+        restored.add(42)
+        self.assertEqual(comp.result(), restored.result())
+
+    def test_merge_into_empty(self):
+        comp = algo.StdDevComputation()
+        other = algo.StdDevComputation()
+        for value in self.stream:
+            other.add(value)
+
+        comp.merge(other)
+
+        self.assertAlmostEqual(other.result(), comp.result(), places=10)
+        self.assertAlmostEqual(other.mean, comp.mean, places=10)
+
+    def test_merge_other_type(self):
+        self.assertRaises(TypeError, algo.MinComputation().merge,
+                          algo.MaxComputation())
+
+    def test_merge_percentiles_of_different_percents(self):
+        self.assertRaises(ValueError, algo.PercentileComputation(50).merge,
+                          algo.PercentileComputation(90))
+
+    def test_merge_progress_exceeded(self):
+        comp = algo.ProgressComputation(3)
+        other = algo.ProgressComputation(3)
+        comp.add()
+        comp.add()
+        other.add()
+        other.add()
+        self.assertRaises(RuntimeError, comp.merge, other)
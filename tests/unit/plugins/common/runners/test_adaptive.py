@@ -0,0 +1,176 @@
+# Copyright 2015: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import ddt
+import jsonschema
+import mock
+
+from rally.plugins.common.runners import adaptive
+from rally.task import runner
+from tests.unit import fakes
+from tests.unit import test
+
+
+RUNNERS = "rally.plugins.common.runners."
+
+
+@ddt.ddt
+class AdaptiveConcurrencyScenarioRunnerTestCase(test.TestCase):
+
+    def setUp(self):
+        super(AdaptiveConcurrencyScenarioRunnerTestCase, self).setUp()
+        self.task = {"uuid": "fake_uuid"}
+        self.context = fakes.FakeUserContext({}).context
+        self.context["task"] = {"uuid": "fake_uuid"}
+        self.config = {"type": "adaptive_concurrency",
+                       "sla": {"max_avg_duration": 1.0},
+                       "max_concurrency": 32}
+
+    def _get_runner(self, passed_up_to=None, **config):
+        """Get runner where the SLA holds up to the given concurrency."""
+        self.config.update(config)
+        runner_obj = adaptive.AdaptiveConcurrencyScenarioRunner(self.task,
+                                                                self.config)
+
+        def run_step(concurrency, *args):
+            success = passed_up_to is not None and concurrency <= passed_up_to
+            runner_obj.steps.append({"concurrency": concurrency,
+                                     "iterations": concurrency,
+                                     "throughput": float(concurrency),
+                                     "success": success})
+            return success
+
+        runner_obj._run_step = mock.Mock(side_effect=run_step)
+        return runner_obj
+
+    @ddt.data(
+        {"type": "adaptive_concurrency", "sla": {"failure_rate": {"max": 0}},
+         "max_concurrency": 10},
+        {"type": "adaptive_concurrency",
+         "sla": {"max_avg_duration": 2.5, "failure_rate": {"max": 1}},
+         "start_concurrency": 4, "max_concurrency": 100,
+         "step_duration": 30, "factor": 1.5, "precision": 2,
+         "max_cpu_count": 2, "results_batch_size": 10,
+         "results_batch_interval": 0.5})
+    def test_validate(self, config):
+        adaptive.AdaptiveConcurrencyScenarioRunner.validate(config)
+
+    @ddt.data(
+        {"type": "adaptive_concurrency", "max_concurrency": 10},
+        {"type": "adaptive_concurrency", "sla": {"max_avg_duration": 1}},
+        {"type": "adaptive_concurrency", "sla": {}, "max_concurrency": 10},
+        {"type": "adaptive_concurrency", "sla": {"max_avg_duration": 1},
+         "max_concurrency": 0},
+        {"type": "adaptive_concurrency", "sla": {"max_avg_duration": 1},
+         "max_concurrency": 10, "factor": 1},
+        {"type": "adaptive_concurrency", "sla": {"max_avg_duration": 1},
+         "max_concurrency": 10, "step_duration": 0},
+        {"type": "adaptive_concurrency", "sla": {"max_avg_duration": 1},
+         "max_concurrency": 10, "times": 10})
+    def test_validate_failed(self, config):
+        self.assertRaises(jsonschema.ValidationError,
+                          adaptive.AdaptiveConcurrencyScenarioRunner.validate,
+                          config)
+
+    @ddt.data(
+        # Concurrency grows until the SLA fails, then it is bisected
+        ({"passed_up_to": 10}, [1, 2, 4, 8, 16, 12, 10, 11], 10),
+        ({"passed_up_to": 10, "precision": 4}, [1, 2, 4, 8, 16, 12], 8),
+        ({"passed_up_to": 5, "start_concurrency": 3, "factor": 3},
+         [3, 9, 6, 4, 5], 5),
+        ({"passed_up_to": 100}, [1, 2, 4, 8, 16, 32], 32),
+        ({"passed_up_to": 100, "max_concurrency": 20},
+         [1, 2, 4, 8, 16, 20], 20),
+        ({"passed_up_to": 1, "factor": 1.1}, [1, 2], 1),
+        ({"passed_up_to": 2, "start_concurrency": 8}, [8, 4, 2, 3], 2),
+        ({"passed_up_to": None, "start_concurrency": 4}, [4, 2, 1], None))
+    @ddt.unpack
+    def test__run_scenario(self, config, expected_steps, expected_best):
+        runner_obj = self._get_runner(**config)
+
+        runner_obj._run_scenario(fakes.FakeScenario, "do_it",
+                                 self.context, {})
+
+        self.assertEqual(expected_steps,
+                         [step["concurrency"] for step in runner_obj.steps])
+        best = runner_obj._get_max_sustainable_step()
+        self.assertEqual(expected_best, best and best["concurrency"])
+
+    def test__run_scenario_aborted(self):
+        runner_obj = self._get_runner(passed_up_to=100)
+        runner_obj._run_step.side_effect = lambda *args: runner_obj.abort()
+
+        runner_obj._run_scenario(fakes.FakeScenario, "do_it",
+                                 self.context, {})
+
+        runner_obj._run_step.assert_called_once_with(
+            1, fakes.FakeScenario, "do_it", self.context, {})
+
+    def test__run_scenario_invalid_sla(self):
+        runner_obj = self._get_runner(sla={"unknown_sla": 1})
+
+        self.assertRaises(jsonschema.ValidationError,
+                          runner_obj._run_scenario, fakes.FakeScenario,
+                          "do_it", self.context, {})
+        self.assertFalse(runner_obj._run_step.called)
+
+    def test__get_max_sustainable_step(self):
+        runner_obj = adaptive.AdaptiveConcurrencyScenarioRunner(self.task,
+                                                                self.config)
+        self.assertIsNone(runner_obj._get_max_sustainable_step())
+
+        runner_obj.steps = [
+            {"concurrency": 1, "throughput": 1.0, "success": True},
+            {"concurrency": 4, "throughput": 3.0, "success": True},
+            {"concurrency": 8, "throughput": 5.0, "success": False},
+            {"concurrency": 6, "throughput": 2.5, "success": True}]
+        self.assertEqual(runner_obj.steps[1],
+                         runner_obj._get_max_sustainable_step())
+
+    def test_get_info(self):
+        runner_obj = adaptive.AdaptiveConcurrencyScenarioRunner(self.task,
+                                                                self.config)
+        self.assertEqual({"steps": [], "max_sustainable": None},
+                         runner_obj.get_info())
+
+        runner_obj.steps = [
+            {"concurrency": 1, "throughput": 1.0, "success": True},
+            {"concurrency": 2, "throughput": 1.5, "success": False}]
+        self.assertEqual({"steps": runner_obj.steps,
+                          "max_sustainable": runner_obj.steps[0]},
+                         runner_obj.get_info())
+
+    @ddt.data(("do_it", True), ("something_went_wrong", False))
+    @ddt.unpack
+    def test__run_step(self, method_name, expected_success):
+        self.config.update({"sla": {"failure_rate": {"max": 0}},
+                            "step_duration": 0.2})
+        runner_obj = adaptive.AdaptiveConcurrencyScenarioRunner(self.task,
+                                                                self.config)
+        runner_obj.steps.append({"concurrency": 1, "iterations": 1,
+                                 "throughput": 1.0, "success": True})
+
+        success = runner_obj._run_step(2, fakes.FakeScenario, method_name,
+                                       self.context, {})
+
+        self.assertEqual(expected_success, success)
+        step = runner_obj.steps[-1]
+        self.assertEqual(2, step["concurrency"])
+        self.assertEqual(len(runner_obj.result_queue), step["iterations"])
+        self.assertTrue(step["iterations"] > 0)
+        self.assertEqual(expected_success, step["throughput"] > 0)
+        for result in runner_obj.result_queue:
+            self.assertIsNotNone(runner.ScenarioRunnerResult(result))
+            self.assertEqual(1, result["stage"])
@@ -13,9 +13,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
+import time
+
 import jsonschema
 import mock
 
+from rally import exceptions
 from rally.plugins.common.runners import constant
 from rally.task import runner
 from tests.unit import fakes
@@ -47,21 +51,18 @@ class ConstantScenarioRunnerTestCase(test.TestCase):
                           runner.ScenarioRunner.validate,
                           self.config)
 
-    @mock.patch(RUNNERS + "constant.time")
     @mock.patch(RUNNERS + "constant.threading.Thread")
     @mock.patch(RUNNERS + "constant.multiprocessing.Queue")
     @mock.patch(RUNNERS + "constant.runner")
-    def test__worker_process(self, mock_runner, mock_queue, mock_thread,
-                             mock_time):
-
-        mock_thread_instance = mock.MagicMock(
-            isAlive=mock.MagicMock(return_value=False))
+    def test__worker_process(self, mock_runner, mock_queue, mock_thread):
+        mock_thread_instance = mock.MagicMock()
         mock_thread.return_value = mock_thread_instance
 
         mock_event = mock.MagicMock(
             is_set=mock.MagicMock(return_value=False))
 
         times = 4
+        concurrency = 2
 
         fake_ram_int = iter(range(10))
 
@@ -69,22 +70,50 @@ class ConstantScenarioRunnerTestCase(test.TestCase):
                               "id": "uuid1"}]}
         info = {"processes_to_start": 1, "processes_counter": 1}
 
-        constant._worker_process(mock_queue, fake_ram_int, 1, 2, times,
-                                 context, "Dummy", "dummy", (), mock_event,
-                                 info)
+        constant._worker_process(mock_queue, fake_ram_int, 1, concurrency,
+                                 times, context, "Dummy", "dummy", (),
+                                 mock_event, info)
+
+        self.assertEqual(concurrency, mock_thread.call_count)
+        self.assertEqual(concurrency, mock_thread_instance.start.call_count)
+        self.assertEqual(concurrency, mock_thread_instance.join.call_count)
+        call = mock.call(args=(mock_queue, fake_ram_int, times, context,
+                               "Dummy", "dummy", (), mock_event, []),
+                         target=constant._worker_thread)
+        self.assertIn(call, mock_thread.mock_calls)
+
+    @mock.patch(RUNNERS + "constant.runner")
+    def test__worker_thread_loop(self, mock_runner):
+        mock_runner._run_scenario_once.return_value = {"duration": 0,
+                                                       "idle_duration": 0}
+        mock_queue = mock.MagicMock()
+        mock_event = mock.MagicMock(
+            is_set=mock.MagicMock(return_value=False))
+        overhead = []
 
-        self.assertEqual(times, mock_thread.call_count)
-        self.assertEqual(times, mock_thread_instance.start.call_count)
-        self.assertEqual(times, mock_thread_instance.join.call_count)
-        self.assertEqual(times, mock_runner._get_scenario_context.call_count)
+        constant._worker_thread(mock_queue, iter(range(10)), 4, "context",
+                                "Dummy", "dummy", (), mock_event, overhead)
 
-        for i in range(times):
-            scenario_context = mock_runner._get_scenario_context(context)
-            call = mock.call(args=(mock_queue,
-                                   (i, "Dummy", "dummy",
-                                    scenario_context, ())),
-                             target=mock_runner._worker_thread)
-            self.assertIn(call, mock_thread.mock_calls)
+        self.assertEqual(4, mock_queue.put.call_count)
+        self.assertEqual(
+            [mock.call((i, "Dummy", "dummy",
+                        mock_runner._get_scenario_context.return_value, ()))
+             for i in range(4)],
+            mock_runner._run_scenario_once.mock_calls)
+        self.assertEqual(1, len(overhead))
+        self.assertEqual(4, overhead[0][0])
+
+    @mock.patch(RUNNERS + "constant.runner")
+    def test__worker_thread_loop_aborted(self, mock_runner):
+        mock_queue = mock.MagicMock()
+        mock_event = mock.MagicMock(is_set=mock.MagicMock(return_value=True))
+        overhead = []
+
+        constant._worker_thread(mock_queue, iter(range(10)), 4, "context",
+                                "Dummy", "dummy", (), mock_event, overhead)
+
+        self.assertFalse(mock_queue.put.called)
+        self.assertEqual([(0, 0.0)], overhead)
 
     @mock.patch(RUNNERS_BASE + "_run_scenario_once")
     def test__worker_thread(self, mock__run_scenario_once):
@@ -229,15 +258,88 @@ class ConstantScenarioRunnerTestCase(test.TestCase):
         self.assertTrue(runner_obj.aborted.is_set())
 
 
+class ConstantAsyncScenarioRunnerTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ConstantAsyncScenarioRunnerTestCase, self).setUp()
+        self.config = {"times": 4, "concurrency": 2,
+                       "type": "constant_async", "max_cpu_count": 2}
+        self.context = fakes.FakeUserContext({"task":
+                                             {"uuid": "uuid"}}).context
+        self.args = {"a": 1}
+        self.task = mock.MagicMock()
+
+    def test_validate(self):
+        constant.ConstantAsyncScenarioRunner.validate(self.config)
+
+    @mock.patch(RUNNERS + "constant.runner")
+    def test__async_worker_process(self, mock_runner):
+        mock_eventlet = mock.MagicMock()
+        mock_queue = mock.MagicMock()
+        mock_event = mock.MagicMock()
+        fake_ram_int = iter(range(10))
+        info = {"processes_to_start": 1, "processes_counter": 1}
+
+        with mock.patch.dict("sys.modules", {"eventlet": mock_eventlet}):
+            constant._async_worker_process(
+                mock_queue, fake_ram_int, 1, 3, 2, self.context, "Dummy",
+                "dummy", (), mock_event, info)
+
+        mock_eventlet.monkey_patch.assert_called_once_with(os=False,
+                                                           thread=False)
+        mock_eventlet.GreenPool.assert_called_once_with(2)
+        mock_pool = mock_eventlet.GreenPool.return_value
+        self.assertEqual(
+            [mock.call(constant._worker_thread, mock_queue, fake_ram_int, 2,
+                       self.context, "Dummy", "dummy", (), mock_event, [])
+             ] * 2,
+            mock_pool.spawn_n.mock_calls)
+        mock_pool.waitall.assert_called_once_with()
+
+    @mock.patch(RUNNERS + "constant.multiprocessing.Queue")
+    @mock.patch(RUNNERS + "constant.ConstantScenarioRunner._join_processes")
+    @mock.patch(RUNNERS +
+                "constant.ConstantScenarioRunner._create_process_pool")
+    def test__run_scenario(
+            self, mock_constant_scenario_runner__create_process_pool,
+            mock_constant_scenario_runner__join_processes,
+            mock_multiprocessing_queue):
+        runner_obj = constant.ConstantAsyncScenarioRunner(self.task,
+                                                          self.config)
+
+        with mock.patch.dict("sys.modules", {"eventlet": mock.MagicMock()}):
+            runner_obj._run_scenario(fakes.FakeScenario, "do_it",
+                                     self.context, self.args)
+
+        mock_create_process_pool = (
+            mock_constant_scenario_runner__create_process_pool)
+        args, kwargs = mock_create_process_pool.call_args
+        self.assertIn(constant._async_worker_process, args)
+        mock_constant_scenario_runner__join_processes.assert_called_once_with(
+            mock_create_process_pool.return_value,
+            mock_multiprocessing_queue.return_value)
+
+    def test__run_scenario_without_eventlet(self):
+        runner_obj = constant.ConstantAsyncScenarioRunner(self.task,
+                                                          self.config)
+
+        with mock.patch.dict("sys.modules", {"eventlet": None}):
+            self.assertRaises(exceptions.RallyException,
+                              runner_obj._run_scenario, fakes.FakeScenario,
+                              "do_it", self.context, self.args)
+
+
 class ConstantForDurationScenarioRunnerTestCase(test.TestCase):
 
     def setUp(self):
         super(ConstantForDurationScenarioRunnerTestCase, self).setUp()
-        self.config = {"duration": 0, "concurrency": 2,
-                       "timeout": 2, "type": "constant_for_duration"}
+        self.config = {"duration": 0.1, "concurrency": 2,
+                       "timeout": 2, "type": "constant_for_duration",
+                       "max_cpu_count": 2}
         self.context = fakes.FakeUserContext({"task":
                                              {"uuid": "uuid"}}).context
         self.args = {"a": 1}
+        self.task = mock.MagicMock()
 
     def test_validate(self):
         constant.ConstantForDurationScenarioRunner.validate(self.config)
@@ -248,46 +350,167 @@ class ConstantForDurationScenarioRunnerTestCase(test.TestCase):
                           runner.ScenarioRunner.validate,
                           self.config)
 
+    @mock.patch(RUNNERS + "constant.runner._run_scenario_once")
+    def test__run_scenario_once_with_timeout(self, mock__run_scenario_once):
+        mock__run_scenario_once.return_value = {"duration": 1}
+
+        self.assertEqual(({"duration": 1}, None),
+                         constant._run_scenario_once_with_timeout(
+                             (1, "cls", "method", {}, {}), 2))
+        self.assertEqual(({"duration": 1}, None),
+                         constant._run_scenario_once_with_timeout(
+                             (2, "cls", "method", {}, {}), 0))
+        self.assertEqual(
+            [mock.call((1, "cls", "method", {}, {})),
+             mock.call((2, "cls", "method", {}, {}))],
+            mock__run_scenario_once.mock_calls)
+
+    @mock.patch(RUNNERS + "constant.threading.Thread")
+    @mock.patch(RUNNERS + "constant.runner._run_scenario_once")
+    def test__run_scenario_once_without_timeout(self, mock__run_scenario_once,
+                                                mock_thread):
+        constant._run_scenario_once_with_timeout(
+            (1, "cls", "method", {}, {}), 0)
+
+        mock__run_scenario_once.assert_called_once_with(
+            (1, "cls", "method", {}, {}))
+        self.assertFalse(mock_thread.called)
+
+    @mock.patch(RUNNERS + "constant.runner._run_scenario_once")
+    def test__run_scenario_once_with_timeout_expired(
+            self, mock__run_scenario_once):
+        finished = threading.Event()
+        self.addCleanup(finished.set)
+        mock__run_scenario_once.side_effect = lambda args: finished.wait()
+
+        result, thread = constant._run_scenario_once_with_timeout(
+            (1, "cls", "method", {}, {}), 0.05)
+
+        self.assertTrue(thread.is_alive())
+        self.assertTrue(thread.daemon)
+        self.assertEqual(0.05, result["duration"])
+        self.assertEqual("TimeoutError", result["error"][0])
+        self.assertIn("timestamp", result)
+        self.assertIsNotNone(runner.ScenarioRunnerResult(result))
+
+    @mock.patch(RUNNERS + "constant.time")
+    @mock.patch(RUNNERS + "constant._run_scenario_once_with_timeout")
+    def test__duration_worker_thread(
+            self, mock__run_scenario_once_with_timeout, mock_time):
+        mock_time.time.side_effect = [1, 2, 3, 4]
+        mock__run_scenario_once_with_timeout.return_value = ({}, None)
+        mock_queue = mock.MagicMock()
+        mock_event = mock.MagicMock(
+            is_set=mock.MagicMock(return_value=False))
+
+        constant._duration_worker_thread(mock_queue, iter(range(10)), 4, 5,
+                                         {}, "Dummy", "dummy", (), mock_event)
+
+        self.assertEqual(
+            [mock.call((i, "Dummy", "dummy", {}, ()), 5) for i in range(3)],
+            mock__run_scenario_once_with_timeout.mock_calls)
+        self.assertEqual(3, mock_queue.put.call_count)
+
+    @mock.patch(RUNNERS + "constant.time")
+    @mock.patch(RUNNERS + "constant._run_scenario_once_with_timeout")
+    def test__duration_worker_thread_waits_for_timed_out_iteration(
+            self, mock__run_scenario_once_with_timeout, mock_time):
+        mock_time.time.side_effect = [1, 1.5, 2, 10]
+        timed_out_thread = mock.MagicMock()
+        mock__run_scenario_once_with_timeout.side_effect = [
+            ({"error": ["TimeoutError"]}, timed_out_thread), ({}, None)]
+        mock_queue = mock.MagicMock()
+        mock_event = mock.MagicMock(
+            is_set=mock.MagicMock(return_value=False))
+
+        constant._duration_worker_thread(mock_queue, iter(range(10)), 4, 5,
+                                         {}, "Dummy", "dummy", (), mock_event)
+
+        # The next iteration isn't started before the timed out one ends,
+        # but it isn't waited for after the deadline
+        timed_out_thread.join.assert_called_once_with(2.5)
+        self.assertEqual(2, mock__run_scenario_once_with_timeout.call_count)
+        self.assertEqual(2, mock_queue.put.call_count)
+
+    @mock.patch(RUNNERS + "constant.threading.Thread")
+    def test__duration_worker_process(self, mock_thread):
+        mock_queue = mock.MagicMock()
+        info = {"processes_to_start": 1, "processes_counter": 1}
+
+        constant._duration_worker_process(
+            mock_queue, "iteration_gen", 5, 3, 100, "context", "Dummy",
+            "dummy", (), "aborted", info)
+
+        self.assertEqual(
+            [mock.call(target=constant._duration_worker_thread,
+                       args=(mock_queue, "iteration_gen", 100, 5,
+                             "context", "Dummy", "dummy", (), "aborted"))] * 3,
+            mock_thread.call_args_list)
+        self.assertEqual(3, mock_thread.return_value.join.call_count)
+        mock_queue.flush.assert_called_once_with()
+
     def test_run_scenario_constantly_for_duration(self):
         runner_obj = constant.ConstantForDurationScenarioRunner(
-            None, self.config)
+            self.task, self.config)
+        deadline = time.time() + self.config["duration"]
 
         runner_obj._run_scenario(fakes.FakeScenario, "do_it",
                                  self.context, self.args)
-        # NOTE(mmorais): when duration is 0, scenario executes exactly 1 time
-        expected_times = 1
-        self.assertEqual(len(runner_obj.result_queue), expected_times)
+        self.assertTrue(len(runner_obj.result_queue) > 0)
         for result in runner_obj.result_queue:
             self.assertIsNotNone(runner.ScenarioRunnerResult(result))
+            # No iterations are started after the duration is over
+            self.assertTrue(result["timestamp"] <= deadline + 0.01)
+
+    @mock.patch(RUNNERS + "constant.ConstantForDurationScenarioRunner."
+                "_join_processes")
+    @mock.patch(RUNNERS + "constant.ConstantForDurationScenarioRunner."
+                "_create_process_pool")
+    def test_run_scenario_constantly_for_duration_default_timeout(
+            self, mock__create_process_pool, mock__join_processes):
+        runner_obj = constant.ConstantForDurationScenarioRunner(
+            self.task, {"type": "constant_for_duration", "duration": 1})
+
+        runner_obj._run_scenario(fakes.FakeScenario, "do_it",
+                                 self.context, self.args)
+
+        worker_args_gen = mock__create_process_pool.call_args[0][2]
+        # The timeout goes after the batcher and the iteration generator
+        self.assertEqual(600, next(worker_args_gen)[2])
+
+    def test_run_scenario_constantly_for_duration_stops_at_duration(self):
+        self.config["duration"] = 0
+        runner_obj = constant.ConstantForDurationScenarioRunner(
+            self.task, self.config)
+
+        runner_obj._run_scenario(fakes.FakeScenario, "do_it",
+                                 self.context, self.args)
+        self.assertEqual(0, len(runner_obj.result_queue))
 
     def test_run_scenario_constantly_for_duration_exception(self):
         runner_obj = constant.ConstantForDurationScenarioRunner(
-            None, self.config)
+            self.task, self.config)
 
         runner_obj._run_scenario(fakes.FakeScenario, "something_went_wrong",
                                  self.context, self.args)
-        # NOTE(mmorais): when duration is 0, scenario executes exactly 1 time
-        expected_times = 1
-        self.assertEqual(len(runner_obj.result_queue), expected_times)
+        self.assertTrue(len(runner_obj.result_queue) > 0)
         for result in runner_obj.result_queue:
             self.assertIsNotNone(runner.ScenarioRunnerResult(result))
-        self.assertIn("error", runner_obj.result_queue[0])
+            self.assertIn("error", result)
 
     def test_run_scenario_constantly_for_duration_timeout(self):
         runner_obj = constant.ConstantForDurationScenarioRunner(
-            None, self.config)
+            self.task, self.config)
 
         runner_obj._run_scenario(fakes.FakeScenario, "raise_timeout",
                                  self.context, self.args)
-        # NOTE(mmorais): when duration is 0, scenario executes exactly 1 time
-        expected_times = 1
-        self.assertEqual(len(runner_obj.result_queue), expected_times)
+        self.assertTrue(len(runner_obj.result_queue) > 0)
         for result in runner_obj.result_queue:
             self.assertIsNotNone(runner.ScenarioRunnerResult(result))
-        self.assertIn("error", runner_obj.result_queue[0])
+            self.assertIn("error", result)
 
     def test__run_scenario_constantly_aborted(self):
-        runner_obj = constant.ConstantForDurationScenarioRunner(None,
+        runner_obj = constant.ConstantForDurationScenarioRunner(self.task,
                                                                 self.config)
 
         runner_obj.abort()
@@ -296,7 +519,7 @@ class ConstantForDurationScenarioRunnerTestCase(test.TestCase):
         self.assertEqual(len(runner_obj.result_queue), 0)
 
     def test_abort(self):
-        runner_obj = constant.ConstantForDurationScenarioRunner(None,
+        runner_obj = constant.ConstantForDurationScenarioRunner(self.task,
                                                                 self.config)
         self.assertFalse(runner_obj.aborted.is_set())
         runner_obj.abort()
@@ -0,0 +1,305 @@
+# Copyright 2015: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import multiprocessing
+
+import ddt
+import jsonschema
+import mock
+from oslo_config import cfg
+
+from rally import exceptions
+from rally.plugins.common.runners import distributed
+from rally.plugins.common.runners import load_profile
+from rally.task import agent
+from rally.task import runner
+from tests.unit import fakes
+from tests.unit import test
+
+
+RUNNERS = "rally.plugins.common.runners."
+CONF = cfg.CONF
+
+
+class FakeAgent(object):
+
+    def __init__(self, results, running=1, error=None):
+        self.results = list(results)
+        self.running = running
+        self.error = error
+        self.start = mock.Mock()
+        self.abort = mock.Mock()
+
+    def is_running(self):
+        self.running -= 1
+        return self.running >= 0
+
+    def get_results(self):
+        if self.results:
+            return [self.results.pop(0)]
+        return []
+
+    def get_error(self):
+        return self.error
+
+
+@ddt.ddt
+class DistributedScenarioRunnerTestCase(test.TestCase):
+
+    def setUp(self):
+        super(DistributedScenarioRunnerTestCase, self).setUp()
+        self.task = {"uuid": "fake_uuid"}
+        self.context = fakes.FakeUserContext({}).context
+        self.config = {"type": "distributed",
+                       "agents": ["a:1", "b:2", "c:3"],
+                       "runner": {"type": "constant", "times": 10,
+                                  "concurrency": 4}}
+
+    def test_validate(self):
+        distributed.DistributedScenarioRunner.validate(self.config)
+        distributed.DistributedScenarioRunner.validate(
+            {"type": "distributed", "runner": {"type": "rps", "rps": 10}})
+
+    @ddt.data(
+        {"type": "distributed"},
+        {"type": "distributed", "runner": {"times": 10}},
+        {"type": "distributed", "runner": {"type": "constant"},
+         "agents": []},
+        {"type": "distributed", "runner": {"type": "constant"},
+         "agents": ["a:1", "a:1"]},
+        {"type": "distributed", "runner": {"type": "constant"},
+         "times": 10},
+        {"type": "distributed",
+         "runner": {"type": "adaptive_concurrency",
+                    "sla": {"failure_rate": {"max": 0}}}},
+        {"type": "distributed", "runner": {"type": "distributed",
+                                           "runner": {"type": "serial"}}})
+    def test_validate_failed(self, config):
+        self.assertRaises(jsonschema.ValidationError,
+                          distributed.DistributedScenarioRunner.validate,
+                          config)
+
+    @ddt.data(
+        ({"type": "constant", "times": 10, "concurrency": 4}, 3,
+         [{"type": "constant", "times": 4, "concurrency": 2},
+          {"type": "constant", "times": 3, "concurrency": 1},
+          {"type": "constant", "times": 3, "concurrency": 1}]),
+        ({"type": "constant", "times": 2, "concurrency": 2}, 3,
+         [{"type": "constant", "times": 1, "concurrency": 1},
+          {"type": "constant", "times": 1, "concurrency": 1}]),
+        ({"type": "rps", "times": 4, "rps": 5.0, "max_concurrency": 2}, 2,
+         [{"type": "rps", "times": 2, "rps": 2.5, "max_concurrency": 1},
+          {"type": "rps", "times": 2, "rps": 2.5, "max_concurrency": 1}]),
+        ({"type": "rps", "times": 4, "rps": 5.0, "max_concurrency": 1}, 2,
+         [{"type": "rps", "times": 4, "rps": 5.0, "max_concurrency": 1}]),
+        ({"type": "constant_for_duration", "duration": 10,
+          "concurrency": 3}, 2,
+         [{"type": "constant_for_duration", "duration": 10,
+           "concurrency": 2},
+          {"type": "constant_for_duration", "duration": 10,
+           "concurrency": 1}]),
+        ({"type": "load_profile", "stages": [[10, 5], [20, 0], [5, 2]]}, 2,
+         [{"type": "load_profile", "stages": [[10, 3], [20, 0], [5, 1]]},
+          {"type": "load_profile", "stages": [[10, 2], [20, 0], [5, 1]]}]),
+        ({"type": "load_profile", "stages": [[10, 2]]}, 3,
+         [{"type": "load_profile", "stages": [[10, 1]]},
+          {"type": "load_profile", "stages": [[10, 1]]}]),
+        ({"type": "load_profile", "load_type": "rps",
+          "ramp": {"start": 2, "end": 6, "duration": 20, "steps": 3},
+          "max_concurrency": 4}, 2,
+         [{"type": "load_profile", "load_type": "rps",
+           "stages": [[20.0 / 3, 1.0], [20.0 / 3, 2.0], [20.0 / 3, 3.0]],
+           "max_concurrency": 2},
+          {"type": "load_profile", "load_type": "rps",
+           "stages": [[20.0 / 3, 1.0], [20.0 / 3, 2.0], [20.0 / 3, 3.0]],
+           "max_concurrency": 2}]))
+    @ddt.unpack
+    def test__split_config(self, config, agents_count, expected):
+        self.assertEqual(
+            expected,
+            distributed.DistributedScenarioRunner._split_config(
+                config, agents_count))
+
+    @ddt.data(
+        {"type": "constant", "times": 100, "concurrency": 2},
+        {"type": "constant_for_duration", "duration": 10, "concurrency": 3},
+        {"type": "rps", "times": 50, "rps": 2, "max_concurrency": 20},
+        {"type": "rps", "times": 50, "rps": 2.5, "max_concurrency": 4},
+        {"type": "rps", "times": 3, "rps": 100})
+    def test__split_config_keeps_total_load(self, config):
+        configs = distributed.DistributedScenarioRunner._split_config(
+            config, 5)
+
+        for key in distributed.DistributedScenarioRunner.SPLIT_KEYS:
+            if key in config:
+                self.assertAlmostEqual(config[key],
+                                       sum(c[key] for c in configs))
+
+    @ddt.data(
+        {"type": "load_profile", "stages": [[10, 7], [5, 1], [5, 0]]},
+        {"type": "load_profile", "load_type": "rps",
+         "stages": [[10, 7.5], [5, 1]]},
+        {"type": "load_profile", "ramp": {"start": 1, "end": 12,
+                                          "duration": 60, "steps": 4}})
+    def test__split_config_keeps_total_load_of_stages(self, config):
+        stages = load_profile.LoadProfileScenarioRunner._get_stages(
+            config)
+
+        configs = distributed.DistributedScenarioRunner._split_config(
+            config, 5)
+
+        for agent_config in configs:
+            self.assertNotIn("ramp", agent_config)
+            runner.ScenarioRunner.validate(agent_config)
+        for i, (duration, load) in enumerate(stages):
+            self.assertEqual([duration] * len(configs),
+                             [c["stages"][i][0] for c in configs])
+            self.assertAlmostEqual(
+                load, sum(c["stages"][i][1] for c in configs))
+
+    @mock.patch(RUNNERS + "distributed.agent_lib.connect")
+    def test__run_scenario(self, mock_connect):
+        agents = {"a:1": FakeAgent([{"duration": 1}]),
+                  "b:2": FakeAgent([{"duration": 2}, {"duration": 3}], 3),
+                  "c:3": FakeAgent([])}
+        mock_connect.side_effect = lambda address: agents[address]
+        runner_obj = distributed.DistributedScenarioRunner(self.task,
+                                                           self.config)
+
+        runner_obj._run_scenario(fakes.FakeScenario, "do_it",
+                                 self.context, {"a": 1})
+
+        self.assertEqual(
+            [4, 3, 3],
+            [agents[address].start.call_args[0][1]["times"]
+             for address in ("a:1", "b:2", "c:3")])
+        call_args = agents["a:1"].start.call_args[0]
+        self.assertEqual(self.task, call_args[0])
+        self.assertEqual(self.task, call_args[4]["task"])
+        self.assertEqual((fakes.FakeScenario, "do_it"), call_args[2:4])
+        self.assertEqual({"a": 1}, call_args[5])
+        self.assertEqual(3, len(runner_obj.result_queue))
+        self.assertFalse(any(a.abort.called for a in agents.values()))
+
+    @mock.patch(RUNNERS + "distributed.agent_lib.get_active_agents")
+    @mock.patch(RUNNERS + "distributed.agent_lib.connect")
+    def test__run_scenario_active_agents(self, mock_connect,
+                                         mock_get_active_agents):
+        mock_get_active_agents.return_value = ["a:1"]
+        fake_agent = FakeAgent([{"duration": 1}])
+        mock_connect.return_value = fake_agent
+        del self.config["agents"]
+        runner_obj = distributed.DistributedScenarioRunner(self.task,
+                                                           self.config)
+
+        runner_obj._run_scenario(fakes.FakeScenario, "do_it",
+                                 self.context, {})
+
+        mock_connect.assert_called_once_with("a:1")
+        self.assertEqual(10, fake_agent.start.call_args[0][1]["times"])
+        self.assertEqual(1, len(runner_obj.result_queue))
+
+    @mock.patch(RUNNERS + "distributed.agent_lib.get_active_agents")
+    def test__run_scenario_no_agents(self, mock_get_active_agents):
+        mock_get_active_agents.return_value = []
+        del self.config["agents"]
+        runner_obj = distributed.DistributedScenarioRunner(self.task,
+                                                           self.config)
+
+        self.assertRaises(exceptions.RallyException,
+                          runner_obj._run_scenario, fakes.FakeScenario,
+                          "do_it", self.context, {})
+
+    @ddt.data({"type": "distributed", "runner": {"type": "serial"}},
+              {"type": "adaptive_concurrency",
+               "sla": {"failure_rate": {"max": 0}}})
+    def test__run_scenario_not_splittable(self, runner_config):
+        self.config["runner"] = runner_config
+        runner_obj = distributed.DistributedScenarioRunner(self.task,
+                                                           self.config)
+
+        self.assertRaises(exceptions.InvalidConfigException,
+                          runner_obj._run_scenario, fakes.FakeScenario,
+                          "do_it", self.context, {})
+
+    @mock.patch(RUNNERS + "distributed.agent_lib.connect")
+    def test__run_scenario_start_failed(self, mock_connect):
+        agents = [FakeAgent([]), FakeAgent([])]
+        agents[1].start.side_effect = IOError("connection refused")
+        mock_connect.side_effect = agents
+        runner_obj = distributed.DistributedScenarioRunner(self.task,
+                                                           self.config)
+
+        self.assertRaises(IOError, runner_obj._run_scenario,
+                          fakes.FakeScenario, "do_it", self.context, {})
+        agents[0].abort.assert_called_once_with()
+
+    @mock.patch(RUNNERS + "distributed.agent_lib.connect")
+    def test__run_scenario_agent_failed(self, mock_connect):
+        mock_connect.side_effect = [FakeAgent([]),
+                                    FakeAgent([], error="ValueError: a"),
+                                    FakeAgent([])]
+        runner_obj = distributed.DistributedScenarioRunner(self.task,
+                                                           self.config)
+
+        self.assertRaises(exceptions.RallyException,
+                          runner_obj._run_scenario, fakes.FakeScenario,
+                          "do_it", self.context, {})
+
+    @mock.patch(RUNNERS + "distributed.agent_lib.connect")
+    def test__run_scenario_aborted(self, mock_connect):
+        agents = [FakeAgent([], 3), FakeAgent([], 3), FakeAgent([], 3)]
+        mock_connect.side_effect = agents
+        runner_obj = distributed.DistributedScenarioRunner(self.task,
+                                                           self.config)
+        runner_obj.abort()
+
+        runner_obj._run_scenario(fakes.FakeScenario, "do_it",
+                                 self.context, {})
+
+        for fake_agent in agents:
+            fake_agent.abort.assert_called_once_with()
+
+    @mock.patch("rally.task.agent.db")
+    def test__run_scenario_with_local_agents(self, mock_db):
+        CONF.set_override("agent_authkey", "secret", group="benchmark")
+        self.addCleanup(CONF.clear_override, "agent_authkey",
+                        group="benchmark")
+        addresses = multiprocessing.Queue()
+        for i in range(2):
+            process = multiprocessing.Process(target=_serve_agent,
+                                              args=(addresses,))
+            process.start()
+            self.addCleanup(process.terminate)
+
+        self.config["agents"] = [addresses.get(timeout=10) for i in range(2)]
+        self.config["runner"] = {"type": "serial", "times": 10}
+        runner_obj = distributed.DistributedScenarioRunner(self.task,
+                                                           self.config)
+
+        runner_obj._run_scenario(fakes.FakeScenario, "do_it",
+                                 self.context, {})
+
+        self.assertEqual(10, len(runner_obj.result_queue))
+        for result in runner_obj.result_queue:
+            self.assertIsNotNone(runner.ScenarioRunnerResult(result))
+
+
+def _serve_agent(addresses):
+    # The agent is created in its own process, so its socket isn't kept
+    # open by the test process after the agent is terminated.
+    agent_obj = agent.Agent("127.0.0.1", 0)
+    addresses.put(agent_obj.address)
+    agent_obj.serve()
@@ -0,0 +1,270 @@
+# Copyright 2015: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import ddt
+import jsonschema
+import mock
+
+from rally.plugins.common.runners import load_profile
+from rally.task import runner
+from tests.unit import fakes
+from tests.unit import test
+
+
+RUNNERS = "rally.plugins.common.runners."
+
+
+@ddt.ddt
+class LoadProfileScenarioRunnerTestCase(test.TestCase):
+
+    def setUp(self):
+        super(LoadProfileScenarioRunnerTestCase, self).setUp()
+        self.task = mock.MagicMock()
+        self.context = fakes.FakeUserContext({}).context
+        self.context["task"] = {"uuid": "fake_uuid"}
+
+    @ddt.data(
+        {"type": "load_profile", "stages": [[10, 1], [5, 0], [2.5, 20]]},
+        {"type": "load_profile", "load_type": "rps", "stages": [[1, 0.5]],
+         "max_concurrency": 10, "max_cpu_count": 2,
+         "results_batch_size": 10, "results_batch_interval": 0.5},
+        {"type": "load_profile", "load_type": "concurrency",
+         "ramp": {"start": 1, "end": 10, "duration": 60, "steps": 10}},
+        {"type": "load_profile", "ramp": {"start": 10, "end": 0,
+                                          "duration": 60}})
+    def test_validate(self, config):
+        load_profile.LoadProfileScenarioRunner.validate(config)
+
+    @ddt.data(
+        {"type": "load_profile"},
+        {"type": "load_profile", "stages": []},
+        {"type": "load_profile", "stages": [[0, 1]]},
+        {"type": "load_profile", "stages": [[1, -1]]},
+        {"type": "load_profile", "stages": [[1, 1, 1]]},
+        {"type": "load_profile", "stages": [[1, 1]],
+         "ramp": {"start": 1, "end": 10, "duration": 60}},
+        {"type": "load_profile", "ramp": {"start": 1, "end": 10}},
+        {"type": "load_profile", "stages": [[1, 1]], "load_type": "times"},
+        {"type": "load_profile", "stages": [[1, 1]], "times": 1})
+    def test_validate_failed(self, config):
+        self.assertRaises(jsonschema.ValidationError,
+                          load_profile.LoadProfileScenarioRunner.validate,
+                          config)
+
+    @ddt.data(
+        ({"stages": [[10, 1], [5, 2.4]]}, [(10, 1), (5, 2)]),
+        ({"stages": [[10, 1], [5, 2.4]], "load_type": "rps"},
+         [(10, 1), (5, 2.4)]),
+        ({"ramp": {"start": 0, "end": 20, "duration": 30, "steps": 3}},
+         [(10.0, 0), (10.0, 10), (10.0, 20)]),
+        ({"ramp": {"start": 20, "end": 10, "duration": 30, "steps": 3},
+          "load_type": "rps"},
+         [(10.0, 20.0), (10.0, 15.0), (10.0, 10.0)]),
+        ({"ramp": {"start": 1, "end": 5, "duration": 30, "steps": 1}},
+         [(30.0, 5)]),
+        ({"ramp": {"start": 0, "end": 9, "duration": 10}},
+         [(1.0, i) for i in range(10)]))
+    @ddt.unpack
+    def test__get_stages(self, config, expected):
+        self.assertEqual(
+            expected,
+            load_profile.LoadProfileScenarioRunner._get_stages(config))
+
+    @ddt.data(
+        ((5, 2, 0, "concurrency"), 3),
+        ((5, 2, 1, "concurrency"), 2),
+        ((1, 2, 1, "concurrency"), 0),
+        ((5, 2, 1, "rps"), 2.5))
+    @ddt.unpack
+    def test__split_load(self, args, expected):
+        self.assertEqual(
+            expected,
+            load_profile.LoadProfileScenarioRunner._split_load(*args))
+
+    @mock.patch(RUNNERS + "load_profile.runner._run_scenario_once")
+    def test__worker_thread(self, mock__run_scenario_once):
+        mock__run_scenario_once.side_effect = (
+            lambda args: {"duration": 1})
+        mock_queue = mock.MagicMock()
+
+        load_profile._worker_thread(mock_queue, ("some_args",), 2)
+        load_profile._worker_thread(mock_queue, ("some_args",), 3, 42.0)
+
+        self.assertEqual(
+            [mock.call({"duration": 1, "stage": 2}),
+             mock.call({"duration": 1, "stage": 3,
+                        "intended_timestamp": 42.0})],
+            mock_queue.put.call_args_list)
+
+    @mock.patch(RUNNERS + "load_profile._worker_thread")
+    def test__rps_worker_thread(self, mock__worker_thread):
+        mock__worker_thread.side_effect = Exception
+        mock_slots = mock.MagicMock()
+
+        self.assertRaises(Exception, load_profile._rps_worker_thread,
+                          "queue", ("some_args",), 2, 42.0, mock_slots)
+
+        mock__worker_thread.assert_called_once_with(
+            "queue", ("some_args",), 2, 42.0)
+        mock_slots.release.assert_called_once_with()
+
+    @mock.patch(RUNNERS + "load_profile.threading.Semaphore")
+    @mock.patch(RUNNERS + "load_profile.threading.Thread")
+    @mock.patch(RUNNERS + "load_profile.time")
+    def test__run_rps_stages(self, mock_time, mock_thread, mock_semaphore):
+        mock_time.time.return_value = 100
+        mock_aborted = mock.MagicMock()
+        mock_aborted.is_set.return_value = False
+        stages = [(100, 102, 2.0), (102, 103, 0), (103, 104, 4.0)]
+
+        load_profile._run_rps_stages(
+            "queue", iter(range(100)), stages, None, {}, "cls", "method",
+            "args", mock_aborted, 0.5)
+
+        intended = [(c[1]["args"][2], c[1]["args"][3])
+                    for c in mock_thread.call_args_list]
+        self.assertEqual([(0, 100.25), (0, 100.75), (0, 101.25),
+                          (0, 101.75), (2, 103.125), (2, 103.375),
+                          (2, 103.625), (2, 103.875)], intended)
+        self.assertEqual(8, mock_thread.return_value.start.call_count)
+        mock_semaphore.assert_called_once_with(0)
+        # Without the limit slots are taken only to wait for the threads
+        self.assertEqual(8, mock_semaphore.return_value.acquire.call_count)
+
+    @mock.patch(RUNNERS + "load_profile.threading.BoundedSemaphore")
+    @mock.patch(RUNNERS + "load_profile.threading.Thread")
+    @mock.patch(RUNNERS + "load_profile.time")
+    def test__run_rps_stages_max_concurrent(self, mock_time, mock_thread,
+                                            mock_bounded_semaphore):
+        mock_time.time.return_value = 100
+        mock_aborted = mock.MagicMock()
+        mock_aborted.is_set.return_value = False
+
+        load_profile._run_rps_stages(
+            "queue", iter(range(100)), [(100, 101, 4.0)], 2, {}, "cls",
+            "method", "args", mock_aborted, 0)
+
+        self.assertEqual(4, mock_thread.call_count)
+        slots = mock_bounded_semaphore.return_value
+        mock_bounded_semaphore.assert_called_once_with(2)
+        for call in mock_thread.call_args_list:
+            self.assertEqual(load_profile._rps_worker_thread,
+                             call[1]["target"])
+            self.assertEqual(slots, call[1]["args"][4])
+        # A slot is taken for every thread and all the slots at the end
+        self.assertEqual(6, slots.acquire.call_count)
+
+    @mock.patch(RUNNERS + "load_profile.runner._run_scenario_once")
+    def test__run_rps_stages_waits_for_threads(self,
+                                               mock__run_scenario_once):
+        mock__run_scenario_once.side_effect = (
+            lambda args: {"duration": 0, "iteration": args[0]})
+        mock_queue = mock.MagicMock()
+        aborted = mock.MagicMock()
+        aborted.is_set.return_value = False
+        # Stages are already over, so iterations are started at once
+        stages = [(0, 0.01, 1000.0)]
+
+        for max_concurrent in (None, 3):
+            mock_queue.reset_mock()
+            load_profile._run_rps_stages(
+                mock_queue, iter(range(100)), stages, max_concurrent, {},
+                "cls", "method", "args", aborted, 0)
+
+            self.assertEqual(10, mock_queue.put.call_count)
+
+    @mock.patch(RUNNERS + "load_profile.threading.Thread")
+    @mock.patch(RUNNERS + "load_profile.time")
+    def test__run_rps_stages_aborted(self, mock_time, mock_thread):
+        mock_time.time.return_value = 100
+        mock_aborted = mock.MagicMock()
+        mock_aborted.is_set.return_value = True
+
+        load_profile._run_rps_stages(
+            "queue", iter(range(100)), [(100, 101, 4.0)], None, {}, "cls",
+            "method", "args", mock_aborted, 0)
+
+        self.assertFalse(mock_thread.called)
+
+    @mock.patch(RUNNERS + "load_profile.runner._run_scenario_once")
+    def test__run_concurrency_stages(self, mock__run_scenario_once):
+        mock__run_scenario_once.side_effect = (
+            lambda args: {"duration": 0, "iteration": args[0]})
+        mock_queue = mock.MagicMock()
+        aborted = mock.MagicMock()
+        aborted.is_set.return_value = False
+        # Stages are already over, so each of them lets threads start
+        # some iterations before the next one is switched on.
+        stages = [(0, 0, 1), (0, 0, 3), (0, 0, 0)]
+
+        load_profile._run_concurrency_stages(
+            mock_queue, iter(range(100000)), stages, None, {}, "cls",
+            "method", "args", aborted)
+
+        results = [c[0][0] for c in mock_queue.put.call_args_list]
+        self.assertEqual(sorted(r["iteration"] for r in results),
+                         list(range(len(results))))
+        self.assertTrue(all(r["stage"] in (0, 1) for r in results))
+
+    @mock.patch(RUNNERS + "load_profile._run_concurrency_stages")
+    @mock.patch(RUNNERS + "load_profile._run_rps_stages")
+    def test__worker_process(self, mock__run_rps_stages,
+                             mock__run_concurrency_stages):
+        mock_queue = mock.MagicMock()
+        info = {"processes_to_start": 4, "processes_counter": 1}
+
+        load_profile._worker_process(
+            mock_queue, "iteration_gen", 100, [(10, 2), (5, 4)], "rps", 10,
+            "context", "cls", "method", "args", "aborted", info)
+        load_profile._worker_process(
+            mock_queue, "iteration_gen", 100, [(10, 2)], "concurrency",
+            None, "context", "cls", "method", "args", "aborted", info)
+
+        mock__run_rps_stages.assert_called_once_with(
+            mock_queue, "iteration_gen", [(100, 110, 2), (110, 115, 4)], 10,
+            "context", "cls", "method", "args", "aborted", 0.25)
+        mock__run_concurrency_stages.assert_called_once_with(
+            mock_queue, "iteration_gen", [(100, 110, 2)], None,
+            "context", "cls", "method", "args", "aborted")
+        self.assertEqual(2, mock_queue.flush.call_count)
+
+    @ddt.data("concurrency", "rps")
+    def test__run_scenario(self, load_type):
+        config = {"type": "load_profile", "load_type": load_type,
+                  "stages": [[0.2, 2], [0.2, 0], [0.2, 4]],
+                  "max_concurrency": 4}
+        runner_obj = load_profile.LoadProfileScenarioRunner(self.task,
+                                                            config)
+
+        runner_obj._run_scenario(fakes.FakeScenario, "do_it",
+                                 self.context, {})
+
+        self.assertTrue(runner_obj.result_queue)
+        stages = set()
+        for result in runner_obj.result_queue:
+            self.assertIsNotNone(runner.ScenarioRunnerResult(result))
+            stages.add(result["stage"])
+        self.assertEqual(set([0, 2]), stages)
+
+    def test__run_scenario_aborted(self):
+        config = {"type": "load_profile", "stages": [[10, 2]]}
+        runner_obj = load_profile.LoadProfileScenarioRunner(self.task,
+                                                            config)
+
+        runner_obj.abort()
+        runner_obj._run_scenario(fakes.FakeScenario, "do_it",
+                                 self.context, {})
+
+        self.assertEqual(0, len(runner_obj.result_queue))
@@ -13,6 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
+import time
+
 import jsonschema
 import mock
 
@@ -39,7 +42,8 @@ class RPSScenarioRunnerTestCase(test.TestCase):
             "rps": 100,
             "max_concurrency": 50,
             "max_cpu_count": 8,
-            "timeout": 1
+            "timeout": 1,
+            "open_loop": True
         }
         rps.RPSScenarioRunner.validate(config)
 
@@ -145,6 +149,119 @@ class RPSScenarioRunnerTestCase(test.TestCase):
         for result in runner_obj.result_queue:
             self.assertIsNotNone(runner.ScenarioRunnerResult(result))
 
+    @mock.patch(RUNNERS + "rps.time")
+    @mock.patch(RUNNERS + "rps.threading.BoundedSemaphore")
+    @mock.patch(RUNNERS + "rps.threading.Thread")
+    @mock.patch(RUNNERS + "rps.runner")
+    def test__open_loop_worker_process(self, mock_runner, mock_thread,
+                                       mock_bounded_semaphore, mock_time):
+        mock_time.time.side_effect = [100, 100, 101, 102.5, 104]
+        mock_thread_instance = mock.MagicMock()
+        mock_thread.return_value = mock_thread_instance
+        mock_event = mock.MagicMock(
+            is_set=mock.MagicMock(return_value=False))
+        mock_queue = mock.MagicMock()
+        fake_ram_int = iter(range(10))
+        info = {"processes_to_start": 2, "processes_counter": 1}
+
+        rps._open_loop_worker_process(mock_queue, fake_ram_int, 1, 1, 4, 2,
+                                      "context", "Dummy", "dummy", (),
+                                      mock_event, info)
+
+        # Start of the second worker process is shifted by 0.5 sec.
+        self.assertEqual([mock.call(0.5), mock.call(0.5)],
+                         mock_time.sleep.mock_calls)
+        self.assertEqual(4, mock_thread_instance.start.call_count)
+        slots = mock_bounded_semaphore.return_value
+        mock_bounded_semaphore.assert_called_once_with(2)
+        # A slot is taken for every thread and all the slots at the end.
+        self.assertEqual(6, slots.acquire.call_count)
+        for i, intended_timestamp in enumerate([100.5, 101.5, 102.5, 103.5]):
+            call = mock.call(
+                args=(mock_queue,
+                      (i, "Dummy", "dummy",
+                       mock_runner._get_scenario_context.return_value, ()),
+                      intended_timestamp, slots),
+                target=rps._open_loop_worker_thread)
+            self.assertIn(call, mock_thread.mock_calls)
+        mock_queue.flush.assert_called_once_with()
+
+    @mock.patch(RUNNERS + "rps.runner._run_scenario_once")
+    def test__open_loop_worker_process_waits_for_any_thread(
+            self, mock__run_scenario_once):
+        third_started = threading.Event()
+        first_waited = []
+
+        def run_scenario_once(args):
+            if args[0] == 0:
+                # The first iteration lasts until the third one is started
+                first_waited.append(third_started.wait(5))
+            elif args[0] == 1:
+                # The second one is still running when the third one is due
+                time.sleep(0.1)
+            elif args[0] == 2:
+                third_started.set()
+            return {"duration": 0}
+
+        mock__run_scenario_once.side_effect = run_scenario_once
+        mock_queue = mock.MagicMock()
+        mock_event = mock.MagicMock(
+            is_set=mock.MagicMock(return_value=False))
+        info = {"processes_to_start": 1, "processes_counter": 0}
+
+        rps._open_loop_worker_process(mock_queue, iter(range(3)), 1, 1000, 3,
+                                      2, {}, "Dummy", "dummy", (),
+                                      mock_event, info)
+
+        # The second iteration has freed the slot for the third one
+        self.assertEqual([True], first_waited)
+        self.assertEqual(3, mock_queue.put.call_count)
+        mock_queue.flush.assert_called_once_with()
+
+    @mock.patch(RUNNERS + "rps.time")
+    @mock.patch(RUNNERS + "rps.threading.Thread")
+    @mock.patch(RUNNERS + "rps.runner")
+    def test__open_loop_worker_process_aborted(self, mock_runner,
+                                               mock_thread, mock_time):
+        mock_time.time.return_value = 100
+        mock_event = mock.MagicMock(is_set=mock.MagicMock(return_value=True))
+        info = {"processes_to_start": 1, "processes_counter": 0}
+
+        rps._open_loop_worker_process(mock.MagicMock(), iter(range(10)), 1,
+                                      1, 4, 2, "context", "Dummy", "dummy",
+                                      (), mock_event, info)
+
+        self.assertFalse(mock_thread.called)
+
+    @mock.patch(RUNNERS + "rps.runner._run_scenario_once")
+    def test__open_loop_worker_thread(self, mock__run_scenario_once):
+        mock__run_scenario_once.return_value = {"duration": 1}
+        mock_queue = mock.MagicMock()
+        slots = mock.MagicMock()
+
+        rps._open_loop_worker_thread(mock_queue, ("some_args",), 42.0, slots)
+
+        mock__run_scenario_once.assert_called_once_with(("some_args",))
+        mock_queue.put.assert_called_once_with(
+            {"duration": 1, "intended_timestamp": 42.0})
+        slots.release.assert_called_once_with()
+
+    @mock.patch(RUNNERS + "rps.time.sleep")
+    def test__run_scenario_open_loop(self, mock_sleep):
+        context = fakes.FakeUserContext({}).context
+        context["task"] = {"uuid": "fake_uuid"}
+
+        config = {"times": 20, "rps": 20, "max_concurrency": 15,
+                  "open_loop": True}
+        runner_obj = rps.RPSScenarioRunner(self.task, config)
+
+        runner_obj._run_scenario(fakes.FakeScenario, "do_it", context, {})
+
+        self.assertEqual(len(runner_obj.result_queue), config["times"])
+        for result in runner_obj.result_queue:
+            self.assertIsNotNone(runner.ScenarioRunnerResult(result))
+            self.assertIn("intended_timestamp", result)
+
     @mock.patch(RUNNERS + "rps.time.sleep")
     def test__run_scenario_exception(self, mock_sleep):
         context = fakes.FakeUserContext({}).context
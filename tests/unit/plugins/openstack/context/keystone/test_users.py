@@ -192,6 +192,23 @@ class UserGeneratorTestCase(test.TestCase):
         id, tenant = tenants.popitem()
         self.assertIn("name", tenant)
 
+    @mock.patch("%s.broker.time.sleep" % CTX)
+    @mock.patch("%s.keystone" % CTX)
+    def test__create_tenants_of_parallel_subtasks(self, mock_keystone,
+                                                  mock_sleep):
+        create_project = mock_keystone.wrap.return_value.create_project
+        names = []
+        for subtask_id in (0, 1):
+            context = self.context
+            context["subtask_id"] = subtask_id
+            user_generator = users.UserGenerator(context)
+            user_generator.config["tenants"] = 1
+            user_generator._create_tenants()
+            names.append(create_project.call_args[0][0])
+
+        self.assertEqual(["ctx_rally_task_id_0_tenant_0",
+                          "ctx_rally_task_id_1_tenant_0"], names)
+
     @mock.patch("%s.broker.time.sleep" % CTX)
     @mock.patch("%s.keystone" % CTX)
     def test__create_users(self, mock_keystone, mock_sleep):
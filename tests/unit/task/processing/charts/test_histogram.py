@@ -0,0 +1,106 @@
+# Copyright 2015: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import random
+
+import ddt
+import mock
+
+from rally.task.processing.charts import histogram
+from tests.unit import test
+
+
+def _linear_y_axis(data, x_axis):
+    y_axis = [0] * len(x_axis)
+    for data_point in data:
+        for i, bin in enumerate(x_axis):
+            if data_point <= bin:
+                y_axis[i] += 1
+                break
+    return y_axis
+
+
+@ddt.ddt
+class HistogramTestCase(test.TestCase):
+
+    def _patch_numpy(self, use_numpy):
+        if use_numpy and not histogram.numpy:
+            self.skipTest("numpy is not installed")
+        return mock.patch.object(histogram, "numpy",
+                                 histogram.numpy if use_numpy else None)
+
+    @ddt.data(True, False)
+    def test_histogram(self, use_numpy):
+        with self._patch_numpy(use_numpy):
+            hist = histogram.Histogram([1.0, 2.5, 4.0, 3.0, 1.0], 3,
+                                       "foo", "bar")
+        self.assertEqual("foo", hist.method)
+        self.assertEqual("bar", hist.key)
+        self.assertEqual([2.0, 3.0, 4.0], hist.x_axis)
+        self.assertEqual([2, 2, 1], hist.y_axis)
+
+    @ddt.data(True, False)
+    def test_histogram_equal_values(self, use_numpy):
+        with self._patch_numpy(use_numpy):
+            hist = histogram.Histogram([2.0, 2.0, 2.0], 2)
+        self.assertEqual([2.0, 2.0], hist.x_axis)
+        self.assertEqual([3, 0], hist.y_axis)
+
+    @ddt.data(True, False)
+    def test_histogram_matches_linear_scan(self, use_numpy):
+        rand = random.Random(42)
+        data = [rand.expovariate(0.5) for i in range(1000)]
+        with self._patch_numpy(use_numpy):
+            for variety in histogram.hvariety(data):
+                hist = histogram.Histogram(data, variety["number_of_bins"])
+                self.assertEqual(_linear_y_axis(data, hist.x_axis),
+                                 hist.y_axis)
+
+    def test_histogram_sorted_data(self):
+        hist = histogram.Histogram([3, 1, 2], 2, sorted_data=[1, 2, 3])
+        self.assertEqual([1, 2, 3], hist.sorted_data)
+        self.assertEqual([2, 1], hist.y_axis)
+
+    @ddt.data(True, False)
+    def test_get_histograms(self, use_numpy):
+        data = [4.0, 1.0, 3.0, 2.0]
+        with self._patch_numpy(use_numpy):
+            with mock.patch.object(histogram, "sort_data",
+                                   side_effect=histogram.sort_data) as m:
+                histograms = histogram.get_histograms(data, "foo")
+        m.assert_called_once_with(data)
+        self.assertEqual(
+            [(variety["method"], variety["number_of_bins"])
+             for variety in histogram.hvariety(data)],
+            [(hist.method, hist.number_of_bins) for hist in histograms])
+        for hist in histograms:
+            self.assertEqual("foo", hist.key)
+            self.assertIs(histograms[0].sorted_data, hist.sorted_data)
+            self.assertEqual(_linear_y_axis(data, hist.x_axis), hist.y_axis)
+
+    def test_hvariety_empty(self):
+        self.assertRaises(ValueError, histogram.hvariety, [])
+
+    @ddt.data(True, False)
+    def test_get_histograms_matches_linear_scan(self, use_numpy):
+        # Repeated values fall on the bin edges
+        rand = random.Random(42)
+        data = [float(rand.randint(0, 20)) for i in range(200)]
+        with self._patch_numpy(use_numpy):
+            histograms = histogram.get_histograms(data)
+        self.assertEqual(100, histograms[-1].number_of_bins)
+        for hist in histograms:
+            self.assertEqual(_linear_y_axis(data, hist.x_axis), hist.y_axis)
+            self.assertEqual(len(data), sum(hist.y_axis))
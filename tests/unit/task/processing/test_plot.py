@@ -13,13 +13,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
 import json
 import sys
 
 import mock
 import testtools
 
+from rally.common import costilius
 from rally.task.processing import plot
+from rally.task.processing import utils
 from tests.unit import test
 
 PLOT = "rally.task.processing.plot."
@@ -78,6 +81,7 @@ class PlotTestCase(test.TestCase):
         mock__prepare_data.side_effect = lambda i: {"errors": "errors_list",
                                                     "output": [],
                                                     "output_errors": [],
+                                                    "summary": "summary",
                                                     "sla": i["sla"],
                                                     "load_duration": 1234.5,
                                                     "full_duration": 6789.1}
@@ -92,6 +96,10 @@ class PlotTestCase(test.TestCase):
         mock_dumps.assert_called_with(source_dict, indent=2,
                                       sort_keys=True)
         self.assertEqual(source, "JSON")
+        mock__get_atomic_action_durations.assert_has_calls(
+            [mock.call("summary")] * len(results))
+        mock__process_main_duration.assert_has_calls(
+            [mock.call(mock__prepare_data.side_effect(r)) for r in results])
 
         results = sorted(results, key=lambda r: "%s%s" % (r["key"]["name"],
                                                           r["key"]["pos"]))
@@ -122,6 +130,46 @@ class PlotTestCase(test.TestCase):
                 "full_duration": 6789.1
             })
 
+    def test__get_atomic_action_durations_stages(self):
+        raw = [
+            {"error": [], "duration": 1, "atomic_actions": {}, "stage": 0},
+            {"error": [], "duration": 3, "atomic_actions": {}, "stage": 1},
+            {"error": ["error"], "duration": 5, "atomic_actions": {},
+             "stage": 1}
+        ]
+
+        table = plot._get_atomic_action_durations(
+            utils.get_results_summary(raw))
+
+        self.assertEqual(
+            [["total", 1, 2.0, 2.8, 2.9, 3, 2.0, "66.7%", 3],
+             ["total (stage 1)", 1, 1, 1, 1, 1, 1.0, "100.0%", 1],
+             ["total (stage 2)", 3, 3, 3, 3, 3, 3.0, "50.0%", 2]],
+            table)
+
+    def test__get_atomic_action_durations_summary(self):
+        summary = {
+            "atomic": [
+                {"name": "foo", "success": 0, "count": 2, "min": None,
+                 "median": None, "90%ile": None, "95%ile": None,
+                 "max": None, "avg": None},
+                {"name": "total", "success": 1, "count": 2, "min": 1.2345,
+                 "median": 1.2345, "90%ile": 1.2345, "95%ile": 1.2345,
+                 "max": 1.2345, "avg": 1.2345}],
+            "stages": [
+                {"name": 0, "success": 1, "count": 1, "min": 2,
+                 "median": 2, "90%ile": 2, "95%ile": 2, "max": 2,
+                 "avg": 2}],
+            "output": []}
+
+        table = plot._get_atomic_action_durations(summary)
+
+        self.assertEqual(
+            [["foo", None, None, None, None, None, None, 0, 2],
+             ["total", 1.234, 1.234, 1.234, 1.234, 1.234, 1.234, "50.0%", 2],
+             ["total (stage 1)", 2, 2, 2, 2, 2, 2, "100.0%", 1]],
+            table)
+
     @testtools.skipIf(sys.version_info > (2, 9), "Problems with floating data")
     def test__process_main_time(self):
         result = {
@@ -153,8 +201,7 @@ class PlotTestCase(test.TestCase):
             "full_duration": 6789.1
         }
 
-        output = plot._process_main_duration(result,
-                                             plot._prepare_data(result))
+        output = plot._process_main_duration(plot._prepare_data(result))
 
         self.assertEqual({
             "pie": [
@@ -198,41 +245,15 @@ class PlotTestCase(test.TestCase):
 
     @testtools.skipIf(sys.version_info > (2, 9), "Problems with floating data")
     def test__process_atomic_time(self):
-        result = {
-            "result": [
-                {
-                    "error": [],
-                    "atomic_actions": {
-                        "action1": 1,
-                        "action2": 2
-                    },
-                    "scenario_output": {"errors": [], "data": {}}
-                },
-                {
-                    "error": ["some", "error", "occurred"],
-                    "atomic_actions": {
-                        "action1": 1,
-                        "action2": 2
-                    },
-                    "scenario_output": {"errors": [], "data": {}}
-                },
-                {
-                    "error": [],
-                    "atomic_actions": {
-                        "action1": 3,
-                        "action2": 4
-                    },
-                    "scenario_output": {"errors": [], "data": {}}
-                }
-            ]
-        }
-
         data = {
-            "atomic_durations": {
-                "action1": [(1, 1.0), (2, 0.0), (3, 3.0)],
-                "action2": [(1, 2.0), (2, 0.0), (3, 4.0)]}}
+            "atomic_durations": costilius.OrderedDict([
+                ("action1", [(1, 1.0), (2, 0.0), (3, 3.0)]),
+                ("action2", [(1, 2.0), (2, 0.0), (3, 4.0)])]),
+            "atomic_histogram_data": costilius.OrderedDict([
+                ("action1", [1, 3]),
+                ("action2", [2, 4])])}
 
-        output = plot._process_atomic(result, data)
+        output = plot._process_atomic(data)
 
         self.assertEqual({
             "histogram": [
@@ -327,7 +348,7 @@ class PlotTestCase(test.TestCase):
                 "error": [],
                 "atomic_actions": atomic_actions,
                 "scenario_output": {"errors": ["err"],
-                                    "data": {"out_key": "out_value"}}
+                                    "data": {"out_key": 42}}
             }
             data.append(row)
 
@@ -342,6 +363,7 @@ class PlotTestCase(test.TestCase):
         values_idle = [i * 0.2 for i in range(rows_num)]
         values_idle[42] = 0
         values_idle[52] = 0
+        success = [i for i in range(rows_num) if i not in (42, 52)]
 
         prepared_data = plot._prepare_data({"result": data,
                                             "load_duration": load_duration,
@@ -357,14 +379,20 @@ class PlotTestCase(test.TestCase):
         mock_compress.assert_has_calls(calls)
 
         expected_output = [{"key": "out_key",
-                            "values": ["out_value"] * rows_num}]
+                            "values": [42] * rows_num}]
         expected_output_errors = [(i, [e])
                                   for i, e in enumerate(["err"] * rows_num)]
+        self.assertEqual(utils.get_results_summary(data),
+                         prepared_data.pop("summary"))
         self.assertEqual({
             "total_durations": {"duration": values_duration,
                                 "idle_duration": values_idle},
             "atomic_durations": {"a1": values_atomic_a1,
                                  "a2": values_atomic_a2},
+            "histogram_data": [values_duration[i] for i in success],
+            "atomic_histogram_data": {
+                "a1": [values_atomic_a1[i] for i in success],
+                "a2": [values_atomic_a2[i] for i in success]},
             "errors": [{"iteration": 42,
                         "message": "bar",
                         "traceback": "spam",
@@ -379,3 +407,62 @@ class PlotTestCase(test.TestCase):
             "full_duration": full_duration,
             "sla": sla,
         }, prepared_data)
+
+    @mock.patch("rally.task.processing.utils.compress")
+    def test__prepare_data_missing_values(self, mock_compress):
+        mock_compress.side_effect = lambda i, **kv: i
+        data = {
+            "result": [
+                {"duration": 1, "idle_duration": 0, "error": [],
+                 "atomic_actions": {"a1": 1},
+                 "scenario_output": {"errors": "", "data": {}}},
+                {"duration": 2, "idle_duration": 0,
+                 "error": ["foo", "bar", "spam"],
+                 "atomic_actions": {"a2": 2},
+                 "scenario_output": {"errors": "", "data": {"o": 5}}},
+                {"duration": 3, "idle_duration": 0, "error": [],
+                 "atomic_actions": {"a2": None, "a3": 3},
+                 "scenario_output": {"errors": "", "data": {}}}],
+            "summary": "summary",
+            "sla": [],
+            "load_duration": 1,
+            "full_duration": 2}
+        result = copy.deepcopy(data["result"])
+
+        prepared_data = plot._prepare_data(data)
+
+        self.assertEqual(result, data["result"])
+        self.assertEqual("summary", prepared_data["summary"])
+        self.assertEqual([1, 0, 3],
+                         prepared_data["total_durations"]["duration"])
+        self.assertEqual(
+            [("a1", [1, 0, 0]), ("a2", [0, 2, None]), ("a3", [0, 0, 3])],
+            list(prepared_data["atomic_durations"].items()))
+        self.assertEqual([1, 3], prepared_data["histogram_data"])
+        self.assertEqual(
+            [("a1", [1, 0]), ("a2", [0, None]), ("a3", [0, 3])],
+            list(prepared_data["atomic_histogram_data"].items()))
+        self.assertEqual([{"key": "o", "values": [0, 5, 0]}],
+                         prepared_data["output"])
+
+    def test__process_atomic(self):
+        data = {
+            "atomic_durations": costilius.OrderedDict([
+                ("a1", [(1, 1.234), (2, 0.0)]),
+                ("a2", [(1, 0.0), (2, 2.0)])]),
+            "atomic_histogram_data": costilius.OrderedDict([
+                ("a1", [1.0, 3.0]),
+                ("a2", [None, 2.0]),
+                ("a3", [])])}
+
+        output = plot._process_atomic(data)
+
+        self.assertEqual([{"key": "a1", "value": 2.0},
+                          {"key": "a2", "value": 1.0}], output["pie"])
+        self.assertEqual([{"key": "a1", "values": [(1, 1.23), (2, 0.0)]},
+                          {"key": "a2", "values": [(1, 0.0), (2, 2.0)]}],
+                         output["iter"])
+        self.assertEqual(
+            [[("a1", 0, 2)] * 4, [("a2", 1, 2)] * 4],
+            [[(h["key"], h["disabled"], sum(v["y"] for v in h["values"]))
+              for h in histograms] for histograms in output["histogram"]])
@@ -13,15 +13,26 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import random
+
 import ddt
+import mock
 
+from rally.common import costilius
 from rally import exceptions
 from rally.task.processing import utils
 from tests.unit import test
 
 
+@ddt.ddt
 class MathTestCase(test.TestCase):
 
+    def _patch_numpy(self, use_numpy):
+        if use_numpy and not utils.numpy:
+            self.skipTest("numpy is not installed")
+        return mock.patch.object(utils, "numpy",
+                                 utils.numpy if use_numpy else None)
+
     def test_percentile(self):
         lst = list(range(1, 101))
         result = utils.percentile(lst, 0.1)
@@ -70,6 +81,31 @@ class MathTestCase(test.TestCase):
         self.assertRaises(ValueError,
                           utils.median, lst)
 
+    @ddt.data(True, False)
+    def test_percentiles(self, use_numpy):
+        lst = list(range(100, 0, -1))
+        with self._patch_numpy(use_numpy):
+            result = utils.percentiles(lst, [0.1, 0.5, 1])
+        self.assertEqual([10.9, 50.5, 100], result)
+        self.assertEqual(list(range(100, 0, -1)), lst)
+
+    @ddt.data(True, False)
+    def test_percentiles_empty(self, use_numpy):
+        with self._patch_numpy(use_numpy):
+            self.assertEqual([None, None], utils.percentiles([], [0.5, 0.9]))
+
+    @ddt.data(True, False)
+    def test_percentiles_match_percentile(self, use_numpy):
+        rand = random.Random(42)
+        percents = [0, 0.1, 0.5, 0.9, 0.95, 0.999, 1]
+        for size in (1, 2, 5, 100, 1001):
+            lst = [rand.uniform(0, 100) for i in range(size)]
+            with self._patch_numpy(use_numpy):
+                result = utils.percentiles(lst, percents)
+            self.assertEqual([utils.percentile(lst, p) for p in percents],
+                             result)
+            self.assertEqual(utils.median(lst), result[2])
+
     def _compare_items_lists(self, list1, list2):
         """Items lists comparison, compatible with Python 2.6/2.7.
 
@@ -164,6 +200,145 @@ class AtomicActionsDataTestCase(test.TestCase):
         output = utils.get_atomic_actions_data(raw_data)
         self.assertEqual(output, atomic_actions_data)
 
+    def test_get_atomic_actions_data_corrected(self):
+        raw_data = [
+            {"error": [], "duration": 3, "atomic_actions": {},
+             "timestamp": 10, "intended_timestamp": 8},
+            {"error": ["error"], "duration": 1.9, "atomic_actions": {},
+             "timestamp": 11, "intended_timestamp": 9},
+            {"error": [], "duration": 8, "atomic_actions": {},
+             "timestamp": 12, "intended_timestamp": 12.5}
+        ]
+
+        output = utils.get_atomic_actions_data(raw_data)
+
+        self.assertEqual(["total", utils.CORRECTED_TOTAL], list(output))
+        self.assertEqual([3, 8], output["total"])
+        self.assertEqual([5, 8], output[utils.CORRECTED_TOTAL])
+
+    def test_get_stages_data(self):
+        raw_data = [
+            {"error": [], "duration": 3, "stage": 1},
+            {"error": [], "duration": 1, "stage": 0},
+            {"error": ["error"], "duration": 2, "stage": 1},
+            {"error": [], "duration": 4, "stage": 1},
+            {"error": ["error"], "duration": 5, "stage": 2}
+        ]
+
+        output = utils.get_stages_data(raw_data)
+
+        self.assertEqual([0, 1, 2], list(output))
+        self.assertEqual(([1], 1), output[0])
+        self.assertEqual(([3, 4], 3), output[1])
+        self.assertEqual(([], 1), output[2])
+
+    def test_get_stages_data_no_stages(self):
+        raw_data = [{"error": [], "duration": 3}]
+        self.assertEqual({}, utils.get_stages_data(raw_data))
+
+
+@ddt.ddt
+class DurationStatsTestCase(test.TestCase):
+
+    @ddt.data(True, False)
+    def test_result(self, use_numpy):
+        if use_numpy and not utils.numpy:
+            self.skipTest("numpy is not installed")
+        stats = utils.DurationStats()
+        for value in (4, 1, 3, 2, 5):
+            stats.add(value)
+
+        with mock.patch.object(utils, "numpy",
+                               utils.numpy if use_numpy else None):
+            result = stats.result("foo", 10)
+        self.assertEqual({"name": "foo", "success": 5, "count": 10,
+                          "min": 1, "median": 3, "90%ile": 4.6,
+                          "95%ile": 4.8, "max": 5, "avg": 3}, result)
+
+    def test_result_empty(self):
+        self.assertEqual({"name": "foo", "success": 0, "count": 3,
+                          "min": None, "median": None, "90%ile": None,
+                          "95%ile": None, "max": None, "avg": None},
+                         utils.DurationStats().result("foo", 3))
+
+
+class ResultsSummaryTestCase(test.TestCase):
+
+    def _get_rows(self, rows):
+        return [(row["name"], row["success"], row["count"], row["min"],
+                 row["max"]) for row in rows]
+
+    def test_result(self):
+        raw_data = [
+            {"error": ["error"], "duration": 1.9,
+             "atomic_actions": {"action2": 1.4}},
+            {"error": [], "duration": 3,
+             "atomic_actions": costilius.OrderedDict([("action2", 2),
+                                                      ("action1", 1)]),
+             "scenario_output": {"data": {"b": 1, "a": "2"}, "errors": ""}},
+            {"error": [], "duration": 8,
+             "atomic_actions": {"action1": 4, "action2": None},
+             "scenario_output": {"data": {"a": 4}, "errors": ""}}
+        ]
+        summary = utils.ResultsSummary()
+        for result in raw_data:
+            summary.add(result)
+
+        result = summary.result()
+
+        self.assertEqual([("action2", 2, 3, 1.4, 2),
+                          ("action1", 2, 3, 1, 4),
+                          ("total", 2, 3, 3, 8)],
+                         self._get_rows(result["atomic"]))
+        self.assertEqual([], result["stages"])
+        self.assertEqual([("a", 2, 3, 2.0, 4.0), ("b", 1, 3, 1.0, 1.0)],
+                         self._get_rows(result["output"]))
+
+    def test_result_corrected_and_stages(self):
+        raw_data = [
+            {"error": [], "duration": 3, "atomic_actions": {},
+             "timestamp": 10, "intended_timestamp": 8, "stage": 1},
+            {"error": ["error"], "duration": 1.9, "atomic_actions": {},
+             "timestamp": 11, "intended_timestamp": 9, "stage": 0},
+            {"error": [], "duration": 8, "atomic_actions": {},
+             "timestamp": 12, "intended_timestamp": 12.5, "stage": 1}
+        ]
+
+        result = utils.get_results_summary(raw_data)
+
+        self.assertEqual([("total", 2, 3, 3, 8),
+                          (utils.CORRECTED_TOTAL, 2, 3, 5, 8)],
+                         self._get_rows(result["atomic"]))
+        self.assertEqual([(0, 0, 1, None, None), (1, 2, 2, 3, 8)],
+                         self._get_rows(result["stages"]))
+
+    def test_result_matches_raw_data(self):
+        raw_data = [
+            {"error": [], "duration": d, "atomic_actions": {"a": d / 2.0},
+             "stage": d % 3}
+            for d in range(1, 50)]
+
+        result = utils.get_results_summary(raw_data)
+
+        actions_data = utils.get_atomic_actions_data(raw_data)
+        for row in result["atomic"]:
+            durations = actions_data[row["name"]]
+            self.assertEqual(utils.median(durations), row["median"])
+            self.assertEqual(utils.percentile(durations, 0.95),
+                             row["95%ile"])
+            self.assertAlmostEqual(utils.mean(durations), row["avg"])
+        stages_data = utils.get_stages_data(raw_data)
+        for row in result["stages"]:
+            durations, count = stages_data[row["name"]]
+            self.assertEqual(count, row["count"])
+            self.assertEqual(utils.percentile(durations, 0.90),
+                             row["90%ile"])
+
+    def test_result_empty(self):
+        self.assertEqual([("total", 0, 0, None, None)],
+                         self._get_rows(utils.get_results_summary(
+                             [])["atomic"]))
+
 
 @ddt.ddt
 class GraphZipperTestCase(test.TestCase):
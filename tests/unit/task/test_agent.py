@@ -0,0 +1,237 @@
+# Copyright 2015: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import datetime
+
+import ddt
+import mock
+from oslo_config import cfg
+
+from rally import exceptions
+from rally.task import agent
+from rally.task import runner
+from tests.unit import fakes
+from tests.unit import test
+
+
+CONF = cfg.CONF
+
+
+@ddt.ddt
+class AgentUtilsTestCase(test.TestCase):
+
+    def test_get_authkey(self):
+        CONF.set_override("agent_authkey", "secret", group="benchmark")
+        self.addCleanup(CONF.clear_override, "agent_authkey",
+                        group="benchmark")
+        self.assertEqual(b"secret", agent.get_authkey())
+
+    def test_get_authkey_not_set(self):
+        self.assertRaises(exceptions.RallyException, agent.get_authkey)
+
+    @mock.patch("rally.task.agent.timeutils.utcnow")
+    @mock.patch("rally.task.agent.db.get_workers")
+    def test_get_active_agents(self, mock_get_workers, mock_utcnow):
+        mock_utcnow.return_value = datetime.datetime(2015, 1, 1, 0, 1)
+        mock_get_workers.return_value = [{"hostname": "a:1"},
+                                         {"hostname": "b:2"}]
+
+        self.assertEqual(["a:1", "b:2"], agent.get_active_agents())
+        mock_get_workers.assert_called_once_with(
+            updated_since=datetime.datetime(2015, 1, 1, 0, 0))
+
+    @ddt.data(("localhost:5000", ("localhost", 5000)),
+              ("10.0.0.1:1", ("10.0.0.1", 1)),
+              ("::1:5000", ("::1", 5000)))
+    @ddt.unpack
+    def test_parse_address(self, address, expected):
+        self.assertEqual(expected, agent.parse_address(address))
+
+    @ddt.data("localhost", "localhost:", "localhost:port")
+    def test_parse_address_invalid(self, address):
+        self.assertRaises(exceptions.InvalidArgumentsException,
+                          agent.parse_address, address)
+
+
+class AgentServiceTestCase(test.TestCase):
+
+    def setUp(self):
+        super(AgentServiceTestCase, self).setUp()
+        self.service = agent.AgentService()
+
+    @mock.patch("rally.task.agent.runner.ScenarioRunner.get")
+    def test_start(self, mock_scenario_runner_get):
+        runner_obj = mock_scenario_runner_get.return_value.return_value
+        runner_obj.result_queue = collections.deque()
+        runner_obj._run_scenario.side_effect = (
+            lambda *args: runner_obj.result_queue.extend(
+                [{"duration": 1}, {"duration": 2}]))
+
+        self.service.start({"uuid": "task"}, {"type": "constant"}, "cls",
+                           "method", "context", "args")
+        self.service._thread.join()
+
+        mock_scenario_runner_get.assert_called_once_with("constant")
+        mock_scenario_runner_get.return_value.assert_called_once_with(
+            {"uuid": "task"}, {"type": "constant"})
+        runner_obj._run_scenario.assert_called_once_with(
+            "cls", "method", "context", "args")
+        self.assertFalse(self.service.is_running())
+        self.assertIsNone(self.service.get_error())
+        self.assertEqual([{"duration": 1}, {"duration": 2}],
+                         self.service.get_results())
+        self.assertEqual([], self.service.get_results())
+
+    @mock.patch("rally.task.agent.runner.ScenarioRunner.get")
+    def test_start_failed(self, mock_scenario_runner_get):
+        runner_obj = mock_scenario_runner_get.return_value.return_value
+        runner_obj._run_scenario.side_effect = ValueError("oops")
+
+        self.service.start({"uuid": "task"}, {"type": "constant"}, "cls",
+                           "method", "context", "args")
+        self.service._thread.join()
+
+        self.assertEqual("ValueError: oops", self.service.get_error())
+
+    def test_start_busy(self):
+        self.service._thread = mock.Mock()
+        self.service._thread.is_alive.return_value = True
+
+        self.assertRaises(exceptions.RallyException, self.service.start,
+                          {"uuid": "task"}, {"type": "constant"}, "cls",
+                          "method", "context", "args")
+
+    def test_get_results_not_started(self):
+        self.assertEqual([], self.service.get_results())
+        self.assertFalse(self.service.is_running())
+
+    @mock.patch("rally.task.agent.time.time", return_value=1000)
+    def test__watch_coordinator_lost(self, mock_time):
+        runner_obj = mock.Mock(result_queue=runner.ResultQueue(maxsize=1))
+        runner_obj.result_queue.append({"duration": 1})
+        thread = mock.Mock()
+        thread.is_alive.side_effect = [True, True, False]
+        self.service._polled_at = (
+            1000 - CONF.benchmark.agent_coordinator_timeout - 1)
+
+        self.service._watch(runner_obj, thread)
+
+        runner_obj.abort.assert_called_once_with()
+        self.assertFalse(runner_obj.result_queue._is_full())
+        self.assertEqual(0, len(runner_obj.result_queue))
+        thread.join.assert_called_once_with(1)
+
+    @mock.patch("rally.task.agent.time.time", return_value=1000)
+    def test__watch(self, mock_time):
+        runner_obj = mock.Mock(result_queue=runner.ResultQueue(maxsize=1))
+        runner_obj.result_queue.append({"duration": 1})
+        thread = mock.Mock()
+        thread.is_alive.side_effect = [True, True, False]
+        self.service._polled_at = 1000
+
+        self.service._watch(runner_obj, thread)
+
+        self.assertFalse(runner_obj.abort.called)
+        self.assertTrue(runner_obj.result_queue._is_full())
+        self.assertEqual(2, thread.join.call_count)
+
+    @mock.patch("rally.task.agent.time.time", return_value=1000)
+    def test_get_results_marks_poll(self, mock_time):
+        self.service.get_results()
+        self.assertEqual(1000, self.service._polled_at)
+
+    def test_abort(self):
+        self.service.abort()
+        self.service._runner = mock.Mock()
+        self.service.abort()
+        self.service._runner.abort.assert_called_once_with()
+
+
+class AgentTestCase(test.TestCase):
+
+    def setUp(self):
+        super(AgentTestCase, self).setUp()
+        CONF.set_override("agent_authkey", "secret", group="benchmark")
+        self.addCleanup(CONF.clear_override, "agent_authkey",
+                        group="benchmark")
+
+    def test___init__(self):
+        agent_obj = agent.Agent("127.0.0.1", 0)
+        port = agent_obj._server.address[1]
+        self.assertEqual("127.0.0.1:%d" % port, agent_obj.address)
+
+        agent_obj = agent.Agent("127.0.0.1", 0, name="example.com")
+        port = agent_obj._server.address[1]
+        self.assertEqual("example.com:%d" % port, agent_obj.address)
+
+    @mock.patch("rally.task.agent.socket.gethostname",
+                return_value="agent.example.com")
+    def test___init___all_interfaces(self, mock_gethostname):
+        agent_obj = agent.Agent("0.0.0.0", 0)
+        port = agent_obj._server.address[1]
+        self.assertEqual("agent.example.com:%d" % port, agent_obj.address)
+
+        agent_obj = agent.Agent("0.0.0.0", 0, name="example.com")
+        port = agent_obj._server.address[1]
+        self.assertEqual("example.com:%d" % port, agent_obj.address)
+        mock_gethostname.assert_called_once_with()
+
+    @mock.patch("rally.task.agent.db")
+    def test_serve(self, mock_db):
+        agent_obj = agent.Agent("127.0.0.1", 0)
+        agent_obj._server = mock.Mock()
+        agent_obj.service = mock.Mock()
+
+        agent_obj.serve()
+
+        mock_db.register_worker.assert_called_once_with(
+            {"hostname": agent_obj.address})
+        agent_obj._server.serve_forever.assert_called_once_with()
+        agent_obj.service.abort.assert_called_once_with()
+        mock_db.unregister_worker.assert_called_once_with(agent_obj.address)
+        self.assertTrue(agent_obj._stopped.is_set())
+
+    @mock.patch("rally.task.agent.db")
+    def test__heartbeat(self, mock_db):
+        CONF.set_override("agent_heartbeat_interval", 0, group="benchmark")
+        self.addCleanup(CONF.clear_override, "agent_heartbeat_interval",
+                        group="benchmark")
+        agent_obj = agent.Agent("127.0.0.1", 0)
+        mock_db.update_worker.side_effect = (
+            lambda address: agent_obj._stopped.set())
+
+        agent_obj._heartbeat()
+
+        mock_db.update_worker.assert_called_once_with(agent_obj.address)
+
+    @mock.patch("rally.task.agent.runner.ScenarioRunner.get")
+    def test_connect(self, mock_scenario_runner_get):
+        # The server is started in a thread of this process, so the
+        # service is shared with the test.
+        agent_obj = agent.Agent("127.0.0.1", 0)
+        server = agent_obj._server
+        thread = agent.threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        proxy = agent.connect(agent_obj.address)
+        proxy.start({"uuid": "task"}, {"type": "constant"},
+                    fakes.FakeScenario, "do_it", {}, {})
+        agent_obj.service._thread.join()
+
+        self.assertFalse(proxy.is_running())
+        self.assertIsNone(proxy.get_error())
+        mock_scenario_runner_get.assert_called_once_with("constant")
@@ -15,21 +15,30 @@
 
 """Tests for the Test engine."""
 
-import collections
 import copy
+import threading
+import time
 
 import jsonschema
 import mock
 
+from rally.common import costilius
 from rally import consts
 from rally import exceptions
 from rally.task import engine
+from rally.task import runner as task_runner
 from tests.unit import fakes
 from tests.unit import test
 
 
 class BenchmarkEngineTestCase(test.TestCase):
 
+    def _get_result_queue(self, *results):
+        queue = task_runner.ResultQueue()
+        for result in results:
+            queue.append(result)
+        return queue
+
     def test_init(self):
         config = mock.MagicMock()
         task = mock.MagicMock()
@@ -257,6 +266,173 @@ class BenchmarkEngineTestCase(test.TestCase):
             mock.call(consts.TaskStatus.FINISHED)
         ])
 
+    @mock.patch("rally.task.engine.BenchmarkEngine.consume_results")
+    @mock.patch("rally.task.engine.base_scenario.Scenario")
+    @mock.patch("rally.task.engine.runner.ScenarioRunner")
+    @mock.patch("rally.task.engine.context.ContextManager.cleanup")
+    @mock.patch("rally.task.engine.context.ContextManager.setup")
+    def test_run__saves_results_when_scenarios_finish(
+            self, mock_context_manager_setup, mock_context_manager_cleanup,
+            mock_scenario_runner, mock_scenario, mock_consume_results):
+        config = costilius.OrderedDict([("a.benchmark", [{}, {}]),
+                                        ("b.benchmark", [{}])])
+        task = mock.MagicMock()
+        eng = engine.BenchmarkEngine(config, task)
+        saved = []
+
+        def consume_results(key, *args):
+            saved.append(len(task.append_results.mock_calls))
+            eng.results.append({"key": key, "data": {}})
+            eng._save_results()
+
+        mock_consume_results.side_effect = consume_results
+
+        eng.run()
+
+        self.assertEqual([0, 1, 2], saved)
+        self.assertEqual(
+            [("a.benchmark", 0), ("a.benchmark", 1), ("b.benchmark", 0)],
+            [(c[1][0]["name"], c[1][0]["pos"])
+             for c in task.append_results.mock_calls])
+        self.assertEqual([], eng.results)
+        self.assertFalse(task.extend_results.called)
+
+    @mock.patch("rally.task.engine.BenchmarkEngine.consume_results")
+    @mock.patch("rally.task.engine.base_scenario.Scenario")
+    @mock.patch("rally.task.engine.runner.ScenarioRunner")
+    @mock.patch("rally.task.engine.context.ContextManager.cleanup")
+    @mock.patch("rally.task.engine.context.ContextManager.setup")
+    def test_run__passes_durations(
+            self, mock_context_manager_setup, mock_context_manager_cleanup,
+            mock_scenario_runner, mock_scenario, mock_consume_results):
+        runner_obj = mock_scenario_runner.get.return_value.return_value
+        runner_obj.run.return_value = 10
+        eng = engine.BenchmarkEngine({"a.benchmark": [{}]}, mock.MagicMock())
+
+        eng.run()
+
+        durations = mock_consume_results.call_args[0][5]
+        self.assertEqual(10, durations["load_duration"])
+        self.assertIsInstance(durations["full_duration"], float)
+
+    @mock.patch("rally.task.engine.base_scenario.Scenario")
+    @mock.patch("rally.task.engine.runner.ScenarioRunner")
+    @mock.patch("rally.task.engine.context.ContextManager.cleanup")
+    @mock.patch("rally.task.engine.context.ContextManager.setup")
+    def test_run__unexpected_failure(
+            self, mock_context_manager_setup, mock_context_manager_cleanup,
+            mock_scenario_runner, mock_scenario):
+        runner_obj = mock_scenario_runner.get.return_value.return_value
+        runner_obj.result_queue = task_runner.ResultQueue()
+        runner_obj.run.side_effect = RuntimeError("boom")
+        task = mock.MagicMock()
+        eng = engine.BenchmarkEngine({"a.benchmark": [{}]}, task)
+
+        eng.run()
+
+        task.append_results.assert_called_once_with(
+            {"name": "a.benchmark", "pos": 0, "kw": {}}, mock.ANY)
+        self.assertEqual(
+            [{"criterion": "something_went_wrong", "success": False,
+              "detail": "Unexpected error: boom"}],
+            task.append_results.call_args[0][1]["sla"])
+
+    @mock.patch("rally.task.engine.BenchmarkEngine._run_subtask")
+    def test__run_scenarios_parallel(self, mock__run_subtask):
+        config = costilius.OrderedDict([
+            ("a.benchmark", [{"parallel": True}, {"parallel": True}, {},
+                             {"parallel": True}]),
+            ("b.benchmark", [{"parallel": True}, {"parallel": True}]),
+            ("c.benchmark", [{}])])
+        eng = engine.BenchmarkEngine(config, mock.MagicMock(),
+                                     max_parallel_subtasks=2)
+        lock = threading.Lock()
+        running = []
+        groups = []
+
+        def run_subtask(key, subtask_id=None):
+            subtask = (key["name"], key["pos"])
+            with lock:
+                if not running:
+                    groups.append([])
+                running.append(subtask)
+                groups[-1].append((subtask, len(running)))
+            time.sleep(0.05)
+            with lock:
+                running.remove(subtask)
+
+        mock__run_subtask.side_effect = run_subtask
+
+        eng._run_scenarios()
+
+        self.assertEqual(
+            [[("a.benchmark", 0), ("a.benchmark", 1)],
+             [("a.benchmark", 2)],
+             [("a.benchmark", 3), ("b.benchmark", 0), ("b.benchmark", 1)],
+             [("c.benchmark", 0)]],
+            [sorted(subtask for subtask, running_count in group)
+             for group in groups])
+        # Not more than max_parallel_subtasks subtasks are run at once
+        self.assertEqual(
+            [2, 1, 2, 1],
+            [max(running_count for subtask, running_count in group)
+             for group in groups])
+
+    def test_max_parallel_subtasks_default(self):
+        eng = engine.BenchmarkEngine({}, mock.MagicMock())
+        self.assertEqual(4, eng.max_parallel_subtasks)
+
+    def test_max_parallel_subtasks_invalid(self):
+        for value in (0, -1):
+            self.assertRaises(exceptions.InvalidArgumentsException,
+                              engine.BenchmarkEngine, {}, mock.MagicMock(),
+                              max_parallel_subtasks=value)
+
+    @mock.patch("rally.task.engine.LOG")
+    @mock.patch("rally.task.engine.BenchmarkEngine._run_subtask")
+    def test__run_parallel_failure(self, mock__run_subtask, mock_log):
+        keys = [{"name": "a.benchmark", "pos": i} for i in range(4)]
+        eng = engine.BenchmarkEngine({}, mock.MagicMock(),
+                                     max_parallel_subtasks=1)
+        error = RuntimeError("foo")
+        mock__run_subtask.side_effect = [error, None, None, None]
+
+        e = self.assertRaises(RuntimeError, eng._run_parallel, keys)
+
+        self.assertIs(error, e)
+        self.assertTrue(mock_log.exception.called)
+        # Subtasks which are not started yet are skipped
+        mock__run_subtask.assert_called_once_with(keys[0], 0)
+
+    def test__save_results(self):
+        task = mock.MagicMock()
+        eng = engine.BenchmarkEngine({}, task)
+        eng.results.append({"key": "a", "data": {"b": 1}})
+
+        eng._save_results()
+
+        task.append_results.assert_called_once_with("a", {"b": 1})
+        self.assertFalse(task.extend_results.called)
+        self.assertEqual([], eng.results)
+
+    def test__save_results_several(self):
+        task = mock.MagicMock()
+        eng = engine.BenchmarkEngine({}, task)
+        results = [{"key": "a", "data": {}}, {"key": "b", "data": {}}]
+        eng.results.extend(results)
+
+        eng._save_results()
+
+        task.extend_results.assert_called_once_with(results)
+        self.assertFalse(task.append_results.called)
+        self.assertEqual([], eng.results)
+
+    def test__save_results_nothing_to_save(self):
+        task = mock.MagicMock()
+        engine.BenchmarkEngine({}, task)._save_results()
+        self.assertFalse(task.append_results.called)
+        self.assertFalse(task.extend_results.called)
+
     @mock.patch("rally.task.engine.BenchmarkEngine.consume_results")
     @mock.patch("rally.task.engine.base_scenario.Scenario")
     @mock.patch("rally.task.engine.runner.ScenarioRunner")
@@ -354,6 +530,27 @@ class BenchmarkEngineTestCase(test.TestCase):
         self.assertEqual(result, expected_result)
         mock_scenario_meta.assert_called_once_with(name, "context")
 
+    @mock.patch("rally.task.engine.base_scenario.Scenario.meta")
+    def test__prepare_context_of_parallel_subtask(self, mock_scenario_meta):
+        mock_scenario_meta.return_value = {}
+        eng = engine.BenchmarkEngine({}, mock.MagicMock())
+
+        result = eng._prepare_context({}, "a.benchmark", mock.MagicMock(),
+                                      subtask_id=3)
+
+        self.assertEqual(3, result["subtask_id"])
+
+    @mock.patch("rally.task.engine.BenchmarkEngine._run_subtask")
+    def test__run_parallel_subtask_ids(self, mock__run_subtask):
+        keys = [{"name": "a.benchmark", "pos": i} for i in range(3)]
+        eng = engine.BenchmarkEngine({}, mock.MagicMock())
+
+        eng._run_parallel(keys)
+
+        self.assertEqual([mock.call(keys[i], i) for i in range(3)],
+                         sorted(mock__run_subtask.mock_calls,
+                                key=lambda c: c[1][1]))
+
     @mock.patch("rally.task.engine.base_scenario.Scenario.meta")
     def test__prepare_context_with_existing_users(self, mock_scenario_meta):
         mock_scenario_meta.return_value = {}
@@ -378,8 +575,9 @@ class BenchmarkEngineTestCase(test.TestCase):
         self.assertEqual(result, expected_result)
         mock_scenario_meta.assert_called_once_with(name, "context")
 
+    @mock.patch("rally.task.engine.putils.ResultsSummary")
     @mock.patch("rally.task.sla.SLAChecker")
-    def test_consume_results(self, mock_sla_checker):
+    def test_consume_results(self, mock_sla_checker, mock_results_summary):
         mock_sla_instance = mock.MagicMock()
         mock_sla_checker.return_value = mock_sla_instance
         key = {"kw": {"fake": 2}, "name": "fake", "pos": 0}
@@ -388,20 +586,21 @@ class BenchmarkEngineTestCase(test.TestCase):
             "a.benchmark": [{"context": {"context_a": {"a": 1}}}],
         }
         runner = mock.MagicMock()
-        runner.result_queue = collections.deque([1, 2])
+        runner.result_queue = self._get_result_queue(1, 2)
         is_done = mock.MagicMock()
         is_done.isSet.side_effect = [False, False, True]
         eng = engine.BenchmarkEngine(config, task)
-        eng.duration = 123
-        eng.full_duration = 456
-        eng.consume_results(key, task, is_done, {}, runner)
+        durations = {"load_duration": 123, "full_duration": 456}
+        eng.consume_results(key, task, is_done, {}, runner, durations)
         mock_sla_checker.assert_called_once_with({"fake": 2})
         expected_iteration_calls = [mock.call(1), mock.call(2)]
         self.assertEqual(expected_iteration_calls,
                          mock_sla_instance.add_iteration.mock_calls)
 
+    @mock.patch("rally.task.engine.putils.ResultsSummary")
     @mock.patch("rally.task.sla.SLAChecker")
-    def test_consume_results_sla_failure_abort(self, mock_sla_checker):
+    def test_consume_results_sla_failure_abort(self, mock_sla_checker,
+                                               mock_results_summary):
         mock_sla_instance = mock.MagicMock()
         mock_sla_checker.return_value = mock_sla_instance
         mock_sla_instance.add_iteration.side_effect = [True, True, False,
@@ -412,18 +611,19 @@ class BenchmarkEngineTestCase(test.TestCase):
             "a.benchmark": [{"context": {"context_a": {"a": 1}}}],
         }
         runner = mock.MagicMock()
-        runner.result_queue = collections.deque([1, 2, 3, 4])
+        runner.result_queue = self._get_result_queue(1, 2, 3, 4)
         is_done = mock.MagicMock()
-        is_done.isSet.side_effect = [False, False, False, False, True]
+        is_done.isSet.return_value = True
         eng = engine.BenchmarkEngine(config, task, abort_on_sla_failure=True)
-        eng.duration = 123
-        eng.full_duration = 456
-        eng.consume_results(key, task, is_done, {}, runner)
+        durations = {"load_duration": 123, "full_duration": 456}
+        eng.consume_results(key, task, is_done, {}, runner, durations)
         mock_sla_checker.assert_called_once_with({"fake": 2})
         self.assertTrue(runner.abort.called)
 
+    @mock.patch("rally.task.engine.putils.ResultsSummary")
     @mock.patch("rally.task.sla.SLAChecker")
-    def test_consume_results_sla_failure_continue(self, mock_sla_checker):
+    def test_consume_results_sla_failure_continue(self, mock_sla_checker,
+                                                  mock_results_summary):
         mock_sla_instance = mock.MagicMock()
         mock_sla_checker.return_value = mock_sla_instance
         mock_sla_instance.add_iteration.side_effect = [True, True, False,
@@ -434,12 +634,164 @@ class BenchmarkEngineTestCase(test.TestCase):
             "a.benchmark": [{"context": {"context_a": {"a": 1}}}],
         }
         runner = mock.MagicMock()
-        runner.result_queue = collections.deque([1, 2, 3, 4])
+        runner.result_queue = self._get_result_queue(1, 2, 3, 4)
         is_done = mock.MagicMock()
-        is_done.isSet.side_effect = [False, False, False, False, True]
+        is_done.isSet.return_value = True
         eng = engine.BenchmarkEngine(config, task, abort_on_sla_failure=False)
-        eng.duration = 123
-        eng.full_duration = 456
-        eng.consume_results(key, task, is_done, {}, runner)
+        durations = {"load_duration": 123, "full_duration": 456}
+        eng.consume_results(key, task, is_done, {}, runner, durations)
         mock_sla_checker.assert_called_once_with({"fake": 2})
         self.assertEqual(0, runner.abort.call_count)
+
+    @mock.patch("rally.task.engine.putils.ResultsSummary")
+    @mock.patch("rally.task.sla.SLAChecker")
+    def test_consume_results_in_chunks(self, mock_sla_checker,
+                                       mock_results_summary):
+        engine.CONF.set_override("results_chunk_size", 2, "benchmark")
+        self.addCleanup(engine.CONF.clear_override, "results_chunk_size",
+                        "benchmark")
+        key = {"kw": {"fake": 2}, "name": "fake", "pos": 0}
+        task = mock.MagicMock()
+        runner = mock.MagicMock()
+        runner.result_queue = self._get_result_queue(1, 2, 3, 4, 5)
+        runner.get_info.return_value = {}
+        is_done = mock.MagicMock()
+        is_done.isSet.return_value = True
+        eng = engine.BenchmarkEngine({}, task)
+        durations = {"load_duration": 123, "full_duration": 456}
+
+        eng.consume_results(key, task, is_done, {}, runner, durations)
+
+        self.assertEqual([mock.call(key, [1, 2]), mock.call(key, [3, 4]),
+                          mock.call(key, [5])],
+                         task.append_results_chunk.mock_calls)
+        self.assertEqual([mock.call(i) for i in range(1, 6)],
+                         mock_results_summary.return_value.add.mock_calls)
+        self.assertEqual(
+            [{"key": key,
+              "data": {
+                  "load_duration": 123, "full_duration": 456,
+                  "sla": mock_sla_checker.return_value.results.return_value,
+                  "summary":
+                      mock_results_summary.return_value.result.return_value}}],
+            [{"key": c[1][0], "data": c[1][1]}
+             for c in task.append_results.mock_calls])
+        self.assertEqual([], eng.results)
+
+    @mock.patch("rally.task.engine.putils.ResultsSummary")
+    @mock.patch("rally.task.sla.SLAChecker")
+    def test_consume_results_saves_runner_info(self, mock_sla_checker,
+                                               mock_results_summary):
+        key = {"kw": {"fake": 2}, "name": "fake", "pos": 0}
+        task = mock.MagicMock()
+        runner = mock.MagicMock()
+        runner.result_queue = self._get_result_queue(1)
+        runner.get_info.return_value = {"max_sustainable": None}
+        is_done = mock.MagicMock()
+        is_done.isSet.return_value = True
+        eng = engine.BenchmarkEngine({}, task)
+        durations = {"load_duration": 123, "full_duration": 456}
+
+        eng.consume_results(key, task, is_done, {}, runner, durations)
+
+        data = task.append_results.call_args[0][1]
+        self.assertEqual({"max_sustainable": None}, data["runner"])
+
+    @mock.patch("rally.task.engine.time")
+    @mock.patch("rally.task.engine.putils.ResultsSummary")
+    @mock.patch("rally.task.sla.SLAChecker")
+    def test_consume_results_in_chunks_by_interval(
+            self, mock_sla_checker, mock_results_summary, mock_time):
+        engine.CONF.set_override("results_chunk_interval", 10, "benchmark")
+        self.addCleanup(engine.CONF.clear_override,
+                        "results_chunk_interval", "benchmark")
+        # The first result is taken at 1, the chunk is saved at 11
+        mock_time.time.side_effect = [0, 1, 2, 11, 12, 13]
+        key = {"kw": {"fake": 2}, "name": "fake", "pos": 0}
+        task = mock.MagicMock()
+        runner = mock.MagicMock()
+        runner.result_queue = self._get_result_queue(1, 2, 3)
+        is_done = mock.MagicMock()
+        is_done.isSet.return_value = True
+        eng = engine.BenchmarkEngine({}, task)
+        durations = {"load_duration": 123, "full_duration": 456}
+
+        eng.consume_results(key, task, is_done, {}, runner, durations)
+
+        self.assertEqual([mock.call(key, [1, 2]), mock.call(key, [3])],
+                         task.append_results_chunk.mock_calls)
+
+    @mock.patch("rally.task.engine.putils.ResultsSummary")
+    @mock.patch("rally.task.sla.SLAChecker")
+    def test_consume_results_aborts_at_once(self, mock_sla_checker,
+                                            mock_results_summary):
+        mock_sla_checker.return_value.add_iteration.return_value = False
+        key = {"kw": {"fake": 2}, "name": "fake", "pos": 0}
+        task = mock.MagicMock()
+        runner = mock.MagicMock()
+        runner.result_queue = self._get_result_queue()
+        aborted = threading.Event()
+        runner.abort.side_effect = aborted.set
+        is_done = threading.Event()
+        eng = engine.BenchmarkEngine({}, task, abort_on_sla_failure=True)
+        # The consumer is woken up by the result, not by the timeout
+        eng.RESULT_WAIT_TIMEOUT = 60
+        durations = {"load_duration": 0, "full_duration": 0}
+        consumer = threading.Thread(target=eng.consume_results,
+                                    args=(key, task, is_done, {}, runner,
+                                          durations))
+        consumer.start()
+
+        runner.result_queue.append(1)
+        self.assertTrue(aborted.wait(5))
+
+        is_done.set()
+        # Wake up the consumer to let it see that the runner is done
+        runner.result_queue.close()
+        consumer.join(5)
+        self.assertFalse(consumer.is_alive())
+
+    @mock.patch("rally.task.engine.putils.ResultsSummary")
+    @mock.patch("rally.task.sla.SLAChecker")
+    def test_consume_results_closes_queue_on_failure(self, mock_sla_checker,
+                                                     mock_results_summary):
+        mock_sla_checker.return_value.add_iteration.side_effect = (
+            RuntimeError)
+        key = {"kw": {"fake": 2}, "name": "fake", "pos": 0}
+        task = mock.MagicMock()
+        runner = mock.MagicMock()
+        runner.result_queue = self._get_result_queue(1)
+        runner.result_queue.maxsize = 1
+        eng = engine.BenchmarkEngine({}, task)
+
+        self.assertRaises(RuntimeError, eng.consume_results, key, task,
+                          mock.MagicMock(), {}, runner, {})
+
+        # The runner is not blocked by the full queue anymore
+        runner.result_queue.append(2)
+        runner.result_queue.append(3)
+        self.assertEqual([2, 3], list(runner.result_queue))
+
+    @mock.patch("rally.task.sla.SLAChecker")
+    def test_consume_results_no_results(self, mock_sla_checker):
+        key = {"kw": {"fake": 2}, "name": "fake", "pos": 0}
+        task = mock.MagicMock()
+        runner = mock.MagicMock()
+        runner.result_queue = self._get_result_queue()
+        is_done = mock.MagicMock()
+        is_done.isSet.return_value = True
+        eng = engine.BenchmarkEngine({}, task)
+        durations = {"load_duration": 123, "full_duration": 456}
+
+        eng.consume_results(key, task, is_done, {}, runner, durations)
+
+        self.assertFalse(task.append_results_chunk.called)
+        task.append_results.assert_called_once_with(key, mock.ANY)
+        data = task.append_results.call_args[0][1]
+        self.assertEqual([], data["raw"])
+        self.assertEqual(
+            {"atomic": [{"name": "total", "success": 0, "count": 0,
+                         "min": None, "median": None, "90%ile": None,
+                         "95%ile": None, "max": None, "avg": None}],
+             "stages": [], "output": []},
+            data["summary"])
@@ -15,10 +15,14 @@
 
 import collections
 import multiprocessing
+import threading
 
+import ddt
 import jsonschema
 import mock
+from six import moves
 
+from rally.common import utils as rutils
 from rally.plugins.common.runners import serial
 from rally.task import runner
 from rally.task.scenarios import base as scenario_base
@@ -148,6 +152,7 @@ class ScenarioHelpersTestCase(test.TestCase):
                          ["Exception", "Something went wrong"])
 
 
+@ddt.ddt
 class ScenarioRunnerResultTestCase(test.TestCase):
 
     def test_validate(self):
@@ -182,6 +187,70 @@ class ScenarioRunnerResultTestCase(test.TestCase):
         self.assertRaises(jsonschema.ValidationError,
                           runner.ScenarioRunnerResult, config)
 
+    @ddt.data(
+        {},
+        {"duration": 1, "timestamp": 2.5, "idle_duration": 0, "error": [],
+         "scenario_output": {"data": {}, "errors": ""},
+         "atomic_actions": {"foo": 1.0, "bar": None}},
+        {"scenario_output": {"data": {"foo": 1}}},
+        {"timestamp": 2.5, "intended_timestamp": 2},
+        {"intended_timestamp": "2"},
+        {"stage": 0},
+        {"stage": 3},
+        {"stage": -1},
+        {"stage": 1.0},
+        {"stage": True},
+        {"error": ["foo", u"bar", "baz"]},
+        {"a": 10},
+        [],
+        None,
+        {"duration": "1"},
+        {"duration": True},
+        {"timestamp": None},
+        {"idle_duration": [1]},
+        {"scenario_output": []},
+        {"scenario_output": {"foo": {}}},
+        {"scenario_output": {"data": []}},
+        {"scenario_output": {"data": {"foo": "bar"}}},
+        {"scenario_output": {"data": {"foo": None}}},
+        {"scenario_output": {"errors": 1}},
+        {"atomic_actions": []},
+        {"atomic_actions": {"foo": "1"}},
+        {"atomic_actions": {"foo": False}},
+        {"error": "foo"},
+        {"error": [1]},
+        {"error": [None]}
+    )
+    def test__is_valid_result(self, result):
+        try:
+            jsonschema.validate(result,
+                                runner.ScenarioRunnerResult.RESULT_SCHEMA)
+            expected = True
+        except jsonschema.ValidationError:
+            expected = False
+        self.assertEqual(expected, runner._is_valid_result(result))
+
+    @mock.patch(BASE + "jsonschema.validate")
+    def test_validate_fast_path(self, mock_validate):
+        runner.ScenarioRunnerResult({"duration": 1.0})
+        self.assertFalse(mock_validate.called)
+
+        runner.ScenarioRunnerResult({"duration": "1.0"})
+        mock_validate.assert_called_once_with(
+            {"duration": "1.0"}, runner.ScenarioRunnerResult.RESULT_SCHEMA)
+
+    @mock.patch(BASE + "jsonschema.validate")
+    def test_validate_strict(self, mock_validate):
+        runner.CONF.set_override("strict_result_validation", True,
+                                 "benchmark")
+        self.addCleanup(runner.CONF.clear_override,
+                        "strict_result_validation", "benchmark")
+
+        runner.ScenarioRunnerResult({"duration": 1.0})
+
+        mock_validate.assert_called_once_with(
+            {"duration": 1.0}, runner.ScenarioRunnerResult.RESULT_SCHEMA)
+
 
 class ScenarioRunnerTestCase(test.TestCase):
 
@@ -251,13 +320,46 @@ class ScenarioRunnerTestCase(test.TestCase):
         for process in process_pool:
             self.assertIsInstance(process, multiprocessing.Process)
 
+    @mock.patch(BASE + "multiprocessing.Process")
+    @mock.patch(BASE + "logging.lock_handlers")
+    def test__create_process_pool_locks_handlers(self, mock_lock_handlers,
+                                                 mock_process):
+        runner_obj = serial.SerialScenarioRunner(mock.MagicMock(),
+                                                 mock.MagicMock())
+        worker_process = mock.MagicMock()
+        mock_process.return_value.start.side_effect = (
+            lambda: self.assertTrue(
+                mock_lock_handlers.return_value.__enter__.called))
+
+        runner_obj._create_process_pool(1, worker_process,
+                                        iter([("a", "b")]))
+
+        mock_process.assert_called_once_with(
+            target=runner._run_worker_process,
+            args=(worker_process, "a", "b"),
+            kwargs={"info": {"processes_to_start": 1,
+                             "processes_counter": 0}})
+        mock_process.return_value.start.assert_called_once_with()
+        mock_lock_handlers.return_value.__exit__.assert_called_once_with(
+            None, None, None)
+
+    @mock.patch(BASE + "logging.recreate_handler_locks")
+    def test__run_worker_process(self, mock_recreate_handler_locks):
+        worker_process = mock.MagicMock()
+
+        runner._run_worker_process(worker_process, "a", info="info")
+
+        mock_recreate_handler_locks.assert_called_once_with()
+        worker_process.assert_called_once_with("a", info="info")
+
     @mock.patch(BASE + "ScenarioRunner._send_result")
     def test__join_processes(self, mock_scenario_runner__send_result):
         process = mock.MagicMock(is_alive=mock.MagicMock(return_value=False))
         processes = 10
         process_pool = collections.deque([process] * processes)
         mock_result_queue = mock.MagicMock(
-            empty=mock.MagicMock(return_value=True))
+            empty=mock.MagicMock(return_value=True),
+            get=mock.MagicMock(side_effect=moves.queue.Empty))
 
         runner_obj = serial.SerialScenarioRunner(
             mock.MagicMock(),
@@ -266,4 +368,194 @@ class ScenarioRunnerTestCase(test.TestCase):
         runner_obj._join_processes(process_pool, mock_result_queue)
 
         self.assertEqual(processes, process.join.call_count)
+        mock_result_queue.get.assert_called_once_with(
+            timeout=runner_obj.JOIN_TIMEOUT)
+        self.assertFalse(mock_scenario_runner__send_result.called)
         mock_result_queue.close.assert_called_once_with()
+
+    @mock.patch(BASE + "ScenarioRunner._send_result")
+    def test__join_processes_with_batches(self,
+                                          mock_scenario_runner__send_result):
+        process = mock.MagicMock(
+            is_alive=mock.MagicMock(side_effect=[True, False]))
+        process_pool = collections.deque([process])
+        results = collections.deque([[(i,)] for i in range(3)] +
+                                    [[(3,), (4,)]])
+
+        def get(timeout=None):
+            if not results:
+                raise moves.queue.Empty()
+            return results.popleft()
+
+        result_queue = mock.MagicMock(
+            get=mock.MagicMock(side_effect=get),
+            empty=mock.MagicMock(side_effect=lambda: not results))
+
+        runner_obj = serial.SerialScenarioRunner(
+            mock.MagicMock(),
+            mock.MagicMock())
+
+        runner_obj._join_processes(process_pool, result_queue)
+
+        self.assertEqual([mock.call({"duration": i}) for i in range(5)],
+                         mock_scenario_runner__send_result.mock_calls)
+        process.join.assert_called_once_with()
+        result_queue.close.assert_called_once_with()
+
+    def test__create_result_batcher(self):
+        runner_obj = serial.SerialScenarioRunner(
+            mock.MagicMock(),
+            {"results_batch_size": 10, "results_batch_interval": 0.5})
+
+        batcher = runner_obj._create_result_batcher("queue")
+
+        self.assertEqual("queue", batcher.queue)
+        self.assertEqual(10, batcher.batch_size)
+        self.assertEqual(0.5, batcher.batch_interval)
+
+    def test__create_result_batcher_default(self):
+        runner_obj = serial.SerialScenarioRunner(mock.MagicMock(), {})
+
+        batcher = runner_obj._create_result_batcher("queue")
+
+        self.assertEqual(1, batcher.batch_size)
+        self.assertEqual(1.0, batcher.batch_interval)
+
+
+class ResultTransportTestCase(test.TestCase):
+
+    def test_pack_unpack_result(self):
+        result = {"duration": 1.0, "timestamp": 2.0, "idle_duration": 0,
+                  "error": [], "scenario_output": {"errors": "", "data": {}},
+                  "atomic_actions": {"foo": None}}
+
+        packed = runner.pack_result(result)
+
+        self.assertIsInstance(packed, tuple)
+        self.assertEqual(result, runner.unpack_result(packed))
+
+    def test_pack_unpack_result_on_timeout(self):
+        result = runner.format_result_on_timeout(Exception("foo"), 10)
+
+        self.assertEqual(result,
+                         runner.unpack_result(runner.pack_result(result)))
+
+    def test_pack_result_unexpected_keys(self):
+        result = {"duration": 1.0, "foo": "bar"}
+
+        self.assertEqual(result, runner.pack_result(result))
+        self.assertEqual(result, runner.unpack_result(result))
+
+    def test_result_batcher_by_size(self):
+        mock_queue = mock.MagicMock()
+        batcher = runner.ResultBatcher(mock_queue, batch_size=2,
+                                       batch_interval=100)
+
+        for i in range(5):
+            batcher.put({"duration": i})
+        self.assertEqual([mock.call([runner.pack_result({"duration": 0}),
+                                     runner.pack_result({"duration": 1})]),
+                          mock.call([runner.pack_result({"duration": 2}),
+                                     runner.pack_result({"duration": 3})])],
+                         mock_queue.put.mock_calls)
+
+        batcher.flush()
+        mock_queue.put.assert_called_with(
+            [runner.pack_result({"duration": 4})])
+        self.assertIsNone(batcher._timer)
+
+        batcher.flush()
+        self.assertEqual(3, mock_queue.put.call_count)
+
+    @mock.patch(BASE + "threading.Timer")
+    def test_result_batcher_by_interval(self, mock_timer):
+        mock_queue = mock.MagicMock()
+        batcher = runner.ResultBatcher(mock_queue, batch_size=10,
+                                       batch_interval=0.5)
+
+        batcher.put({"duration": 1})
+        batcher.put({"duration": 2})
+
+        mock_timer.assert_called_once_with(0.5, batcher.flush)
+        mock_timer.return_value.start.assert_called_once_with()
+        self.assertFalse(mock_queue.put.called)
+
+        batcher.flush()
+        mock_timer.return_value.cancel.assert_called_once_with()
+        mock_queue.put.assert_called_once_with(
+            [runner.pack_result({"duration": 1}),
+             runner.pack_result({"duration": 2})])
+
+
+class ResultQueueTestCase(test.TestCase):
+
+    def test_deque_methods(self):
+        queue = runner.ResultQueue()
+        self.assertFalse(queue)
+        self.assertRaises(IndexError, queue.popleft)
+
+        for i in range(3):
+            queue.append(i)
+
+        self.assertTrue(queue)
+        self.assertEqual(3, len(queue))
+        self.assertEqual([0, 1, 2], list(queue))
+        self.assertEqual(0, queue[0])
+        self.assertEqual(0, queue.popleft())
+        self.assertEqual(1, queue.get())
+        self.assertEqual([2], list(queue))
+
+    def test_get_timeout(self):
+        queue = runner.ResultQueue()
+        self.assertIsNone(queue.get(timeout=0.01))
+
+    def test_get_wakes_up_on_append(self):
+        queue = runner.ResultQueue()
+        timer = threading.Timer(0.05, queue.append, args=("result",))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        with rutils.Timer() as waited:
+            self.assertEqual("result", queue.get(timeout=10))
+        self.assertLess(waited.duration(), 5)
+
+    def test_append_waits_while_full(self):
+        queue = runner.ResultQueue(maxsize=2)
+        queue.append(1)
+        queue.append(2)
+        producer = threading.Thread(target=queue.append, args=(3,))
+        producer.start()
+
+        producer.join(0.05)
+        self.assertTrue(producer.is_alive())
+        self.assertEqual([1, 2], list(queue))
+
+        self.assertEqual(1, queue.get())
+        producer.join(5)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual([2, 3], list(queue))
+
+        stats = queue.stats()
+        self.assertEqual({"total": 3, "maxsize": 2, "max_depth": 2,
+                          "waits": 1},
+                         dict((k, v) for k, v in stats.items()
+                              if k != "wait_duration"))
+        self.assertGreater(stats["wait_duration"], 0)
+
+    def test_close(self):
+        queue = runner.ResultQueue(maxsize=1)
+        queue.append(1)
+        producer = threading.Thread(target=queue.append, args=(2,))
+        producer.start()
+
+        queue.close()
+        producer.join(5)
+
+        self.assertFalse(producer.is_alive())
+        self.assertEqual([1, 2], list(queue))
+        queue.append(3)
+        self.assertEqual(3, queue.stats()["max_depth"])
+
+    def test_default_size(self):
+        runner_obj = serial.SerialScenarioRunner(mock.MagicMock(), {})
+        self.assertEqual(10000, runner_obj.result_queue.maxsize)
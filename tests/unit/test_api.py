@@ -125,7 +125,8 @@ class TaskAPITestCase(test.TestCase):
         mock_benchmark_engine.assert_has_calls([
             mock.call("config", mock_task.return_value,
                       admin=mock_deployment_get.return_value["admin"],
-                      users=[], abort_on_sla_failure=False),
+                      users=[], abort_on_sla_failure=False,
+                      max_parallel_subtasks=None),
             mock.call().validate(),
             mock.call().run()
         ])
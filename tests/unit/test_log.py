@@ -14,8 +14,10 @@
 #    under the License.
 
 import logging
+import threading
 
 import mock
+import six
 
 from rally.common import log
 from tests.unit import test
@@ -64,6 +66,46 @@ class LogTestCase(test.TestCase):
         self.assertEqual(mock_oslogging._loggers[name], returned_logger)
 
 
+class LockHandlersTestCase(test.TestCase):
+
+    def setUp(self):
+        super(LockHandlersTestCase, self).setUp()
+        self.handler = logging.StreamHandler(six.StringIO())
+        logger = logging.getLogger("rally.test_lock_handlers")
+        logger.addHandler(self.handler)
+        self.addCleanup(logger.removeHandler, self.handler)
+
+    def _is_locked(self):
+        lock = self.handler.lock
+        locked = []
+
+        def try_lock():
+            if lock.acquire(False):
+                lock.release()
+                locked.append(False)
+            else:
+                locked.append(True)
+
+        # The lock is checked by another thread, since it is reentrant
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+        return locked[0]
+
+    def test_lock_handlers(self):
+        with log.lock_handlers():
+            self.assertTrue(self._is_locked())
+        self.assertFalse(self._is_locked())
+
+    def test_recreate_handler_locks(self):
+        # The lock is held like in a process forked within lock_handlers()
+        self.handler.acquire()
+
+        log.recreate_handler_locks()
+
+        self.assertFalse(self._is_locked())
+
+
 class LogRallyContaxtAdapter(test.TestCase):
 
     @mock.patch("rally.common.log.logging")